@@ -0,0 +1,138 @@
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from typing import Dict
+from config import ADMISSION_MAX_CONCURRENT, ADMISSION_MAX_QUEUE, ADMISSION_MAX_PER_USER, ADMISSION_TIMEOUT
+
+# Prioridades (menor valor passa primeiro)
+INTERACTIVE = 0  # cliques e comandos do usuário
+BULK = 1         # categoria completa, aquecimento do catálogo
+BACKGROUND = 2   # pré-carregamento
+
+PRIORITY_NAMES = {INTERACTIVE: 'interativa', BULK: 'lote', BACKGROUND: 'segundo plano'}
+
+
+class _Ticket:
+    __slots__ = ('granted',)
+
+    def __init__(self):
+        self.granted = False
+
+
+class _ServerGate:
+    """Vagas de um servidor e as filas de espera por prioridade e usuário"""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.active = 0
+        # prioridade -> usuário -> tickets; a ordem dos usuários faz o rodízio
+        self.queues: Dict[int, 'OrderedDict[str, deque]'] = {p: OrderedDict() for p in PRIORITY_NAMES}
+        self.stats = {'admitted': 0, 'queued': 0, 'rejected': 0, 'timeouts': 0}
+
+    def depth(self, user=None) -> int:
+        if user is None:
+            return sum(len(tickets) for queue in self.queues.values() for tickets in queue.values())
+        return sum(len(queue.get(user, ())) for queue in self.queues.values())
+
+    def grant_next(self):
+        """Entrega vagas livres: prioridade mais alta, revezando entre usuários"""
+        while self.active < self.capacity:
+            queue = next((queue for priority, queue in sorted(self.queues.items()) if queue), None)
+            if queue is None:
+                return
+            user, tickets = next(iter(queue.items()))
+            ticket = tickets.popleft()
+            if tickets:
+                queue.move_to_end(user)
+            else:
+                del queue[user]
+            ticket.granted = True
+            self.active += 1
+
+    def withdraw(self, user: str, priority: int, ticket: _Ticket):
+        tickets = self.queues[priority].get(user)
+        if tickets is not None and ticket in tickets:
+            tickets.remove(ticket)
+            if not tickets:
+                del self.queues[priority][user]
+
+
+class AdmissionController:
+    """Controle de admissão das requisições ao painel, por servidor.
+
+    No máximo ``ADMISSION_MAX_CONCURRENT`` requisições simultâneas por
+    servidor; as demais esperam em fila. A fila é dividida por prioridade
+    (interativa > lote > segundo plano) e, dentro de cada uma, os usuários
+    são atendidos em rodízio, para que quem pede muito não passe na frente
+    de todos. Fila cheia, usuário com fila demais ou espera acima de
+    ``ADMISSION_TIMEOUT`` recusam na hora. Pré-carregamento nunca espera:
+    só entra se houver vaga livre e ninguém na fila. A espera bloqueia a
+    thread; com ``wait=False`` vale a mesma regra do pré-carregamento."""
+
+    def __init__(self, capacity: int = ADMISSION_MAX_CONCURRENT, max_queue: int = ADMISSION_MAX_QUEUE,
+                 max_per_user: int = ADMISSION_MAX_PER_USER, timeout: float = ADMISSION_TIMEOUT):
+        self.capacity = capacity
+        self.max_queue = max_queue
+        self.max_per_user = max_per_user
+        self.timeout = timeout
+        self.gates: Dict[str, _ServerGate] = {}
+        self.cond = threading.Condition()
+
+    def _gate(self, server: str) -> _ServerGate:
+        gate = self.gates.get(server)
+        if gate is None:
+            gate = self.gates[server] = _ServerGate(self.capacity)
+        return gate
+
+    def acquire(self, server: str, user: str, priority: int = INTERACTIVE, wait: bool = True) -> bool:
+        """Ocupa uma vaga do servidor (espera na fila se preciso e ``wait``); False se recusado"""
+        with self.cond:
+            gate = self._gate(server)
+            if gate.active < gate.capacity and not gate.depth():
+                gate.active += 1
+                gate.stats['admitted'] += 1
+                return True
+
+            if (priority == BACKGROUND or not wait or gate.depth() >= self.max_queue
+                    or gate.depth(user) >= self.max_per_user):
+                gate.stats['rejected'] += 1
+                return False
+
+            ticket = _Ticket()
+            gate.queues[priority].setdefault(user, deque()).append(ticket)
+            gate.stats['queued'] += 1
+            deadline = time.monotonic() + self.timeout
+            while not ticket.granted:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    gate.withdraw(user, priority, ticket)
+                    gate.stats['timeouts'] += 1
+                    return False
+                self.cond.wait(remaining)
+            gate.stats['admitted'] += 1
+            return True
+
+    def release(self, server: str):
+        with self.cond:
+            gate = self._gate(server)
+            gate.active -= 1
+            gate.grant_next()
+            self.cond.notify_all()
+
+    @contextmanager
+    def slot(self, server: str, user: str, priority: int = INTERACTIVE, wait: bool = True):
+        """``with admission.slot(...) as admitted:``; a vaga é devolvida ao sair"""
+        admitted = self.acquire(server, user, priority, wait)
+        try:
+            yield admitted
+        finally:
+            if admitted:
+                self.release(server)
+
+    def get_stats(self) -> Dict:
+        with self.cond:
+            return {
+                server: dict(gate.stats, active=gate.active, waiting=gate.depth())
+                for server, gate in self.gates.items()
+            }
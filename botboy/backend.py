@@ -1,9 +1,27 @@
+import asyncio
 import requests
 import json
 import os
+import threading
 import time
+from collections import defaultdict
 from typing import Dict, List, Optional, Any
-from config import OWNER_ID, CACHE_TTL, RATE_LIMIT_TIME, RATE_LIMIT_MAX
+from config import OWNER_ID, CACHE_TTL, NEGATIVE_CACHE_TTL, REQUEST_TIMEOUT_MAX
+from admission import AdmissionController, INTERACTIVE, BULK, BACKGROUND
+from catalog_store import CatalogStore
+from health import ServerHealth, CircuitOpenError
+from mirrors import mirrors
+from policy import RequestPolicy
+from ratelimit import TokenBucketLimiter
+
+
+def on_event_loop() -> bool:
+    """Se a chamada está na thread do loop asyncio (onde nada pode esperar)"""
+    try:
+        asyncio.get_running_loop()
+        return True
+    except RuntimeError:
+        return False
 
 
 class Backend:
@@ -17,148 +35,284 @@ class Backend:
             'cache_hits': 0,
             'active_users': 0,
             'selections': 0,
+            'negative_hits': 0,
+            'fast_failures': 0,
+            'rejected': 0,
+            'loop_misses': 0,
             'uptime': time.time()
         }
-        self.rate_limits = {}
-        self.rate_limit_time = RATE_LIMIT_TIME
-        self.rate_limit_max = RATE_LIMIT_MAX
+        self.rate_limiter = TokenBucketLimiter()
         self.user_context = {}
+        self.catalog_listeners = []
+        self.in_flight = defaultdict(int)  # Requisições interativas em andamento por servidor
+        self.negative_cache = {}  # (servidor, chave) -> falha ou resposta vazia recente
+        self.health = ServerHealth()
+        self.policy = RequestPolicy()
+        self.admission = AdmissionController()
+        self.store = CatalogStore()  # Conteúdo das respostas, compartilhado entre contas
+        # cache, cache negativo, in_flight e stats são usados pelas threads de
+        # load, pré-carregamento, aquecimento e hedge ao mesmo tempo
+        self.lock = threading.RLock()
 
     def is_owner(self, user_id: int) -> bool:
         """Verifica se é o dono do bot"""
         return user_id == self.owner_id
 
-    def check_rate_limit(self, user_id: int) -> bool:
-        """Verifica e aplica rate limiting"""
-        now = time.time()
-
+    def check_rate_limit(self, user_id: int, cost_class: str = 'cheap') -> bool:
+        """Verifica e aplica rate limiting (classes 'cheap' e 'expensive')"""
         if self.is_owner(user_id):
             return True
-
-        if user_id not in self.rate_limits:
-            self.rate_limits[user_id] = {'count': 0, 'last_request': now}
-
-        user_limit = self.rate_limits[user_id]
-
-        if now - user_limit['last_request'] > self.rate_limit_time:
-            user_limit['count'] = 0
-
-        user_limit['count'] += 1
-        user_limit['last_request'] = now
-
-        if user_limit['count'] > self.rate_limit_max:
-            return False
-
-        return True
+        return self.rate_limiter.allow(user_id, cost_class)
 
     def get_stats(self) -> Dict:
         """Retorna estatísticas do sistema"""
-        self.stats['cache_size'] = len(self.cache)
-        self.stats['active_users'] = len(self.user_selections)
-        self.stats['selections'] = sum(
-            len(v['channels']) + len(v['movies']) + len(v['series'])
-            for v in self.user_selections.values()
-        )
-        return self.stats
+        with self.lock:
+            self.stats['cache_size'] = len(self.cache)
+            self.stats['active_users'] = len(self.user_selections)
+            self.stats['selections'] = sum(
+                len(v['channels']) + len(v['movies']) + len(v['series'])
+                for v in self.user_selections.values()
+            )
+            return dict(self.stats)
+
+    def _count(self, name: str):
+        with self.lock:
+            self.stats[name] += 1
 
     def clear_cache(self) -> int:
         """Limpa o cache e retorna o número de itens removidos"""
-        removed = len(self.cache)
-        self.cache = {}
+        with self.lock:
+            removed = len(self.cache)
+            self.cache = {}
+            self.negative_cache = {}
+            self.store.clear()
         return removed
 
-    def make_api_request(self, config: Dict, params: Dict) -> Optional[Any]:
-        """Faz requisição para a API do servidor IPTV"""
-        self.stats['total_requests'] += 1
-
-        cache_key = hash(json.dumps(params, sort_keys=True))
+    def _cache_key(self, server: str, params: Dict) -> int:
+        # As credenciais estão nos params: cada conta só acessa as próprias entradas
+        return hash(json.dumps([server, params], sort_keys=True))
+
+    def cached_at(self, server: str, params: Dict) -> Optional[float]:
+        """Momento em que a resposta de ``params`` entrou no cache (None se ausente ou expirada)"""
+        cache_key = self._cache_key(server, params)
+        with self.lock:
+            entry = self.cache.get(cache_key)
+        if entry and (time.time() - entry['time']) < self.cache_time:
+            return entry['time']
+        return None
+
+    def digest_of(self, server: str, params: Dict) -> Optional[str]:
+        """Resumo do conteúdo guardado para ``params`` (None se ausente ou expirado)"""
+        cache_key = self._cache_key(server, params)
+        with self.lock:
+            entry = self.cache.get(cache_key)
+        if entry and (time.time() - entry['time']) < self.cache_time:
+            return entry.get('digest')
+        return None
+
+    def add_catalog_listener(self, listener):
+        """Registra ``listener(config, params, data)``, chamado a cada resposta nova do painel"""
+        self.catalog_listeners.append(listener)
+
+    def _put(self, cache_key: int, data: Any, digest: Optional[str] = None, size: int = 0) -> Any:
+        """Entrada da conta apontando para o conteúdo compartilhado (solta a anterior)"""
+        with self.lock:
+            if digest is not None:
+                data = self.store.put(digest, data, size)
+            self._drop(cache_key)
+            self.cache[cache_key] = {'time': time.time(), 'data': data, 'digest': digest}
+        return data
+
+    def _drop(self, cache_key: int):
+        with self.lock:
+            entry = self.cache.pop(cache_key, None)
+            if entry and entry.get('digest'):
+                self.store.release(entry['digest'])
+
+    def _store(self, cache_key: int, config: Dict, params: Dict, data: Any, digest: Optional[str] = None,
+               size: int = 0) -> Any:
+        data = self._put(cache_key, data, digest, size)
+        for listener in self.catalog_listeners:
+            try:
+                listener(config, params, data)
+            except Exception as e:
+                print(f"Catalog listener error: {e}")
+        return data
+
+    def seed_cache(self, server: str, params: Dict, data: Any, digest: Optional[str] = None):
+        """Guarda uma resposta derivada de outra já recebida (sem avisar os ouvintes)"""
+        self._put(self._cache_key(server, params), data, digest)
+
+    def make_api_request(self, config: Dict, params: Dict, background: bool = False, cached: bool = True,
+                         priority: Optional[int] = None) -> Optional[Any]:
+        """Faz requisição para a API do servidor IPTV
+
+        ``background``: pré-carregamento, não conta como interativa.
+        ``cached=False``: sempre vai ao painel e não guarda a resposta.
+        ``priority``: fila de admissão (padrão: interativa, ou segundo plano se ``background``).
+        Na thread do loop nada vai à rede: os handlers usam ``load`` antes, e
+        uma resposta que ainda falte vira None enquanto é buscada em thread."""
+        server = config.get('server')
+        cache_key = self._cache_key(server, params) if cached else None
+
+        with self.lock:
+            self.stats['total_requests'] += 1
+            entry = self.cache.get(cache_key) if cached else None
+            if entry and (time.time() - entry['time']) < self.cache_time:
+                self.stats['cache_hits'] += 1
+                return entry['data']
+
+            negative = self.negative_cache.get((server, cache_key)) if cached else None
+            if negative and (time.time() - negative['time']) < NEGATIVE_CACHE_TTL:
+                self.stats['negative_hits'] += 1
+                return negative['data']
+
+        # Servidor fora do ar (todos os espelhos): falha na hora em vez de esperar o timeout
+        if self.is_down(config):
+            self._count('fast_failures')
+            return None
 
-        if cache_key in self.cache and (time.time() - self.cache[cache_key]['time']) < self.cache_time:
-            self.stats['cache_hits'] += 1
-            return self.cache[cache_key]['data']
+        if on_event_loop():
+            self._count('loop_misses')
+            if cached:
+                asyncio.get_running_loop().run_in_executor(None, self._load, config, [params])
+            return None
 
+        if priority is None:
+            priority = BACKGROUND if background else INTERACTIVE
+        if not background:
+            with self.lock:
+                self.in_flight[server] += 1
         try:
-            # Tenta GET primeiro
-            response = requests.get(config['api_url'], params=params, timeout=15)
-
-            if response.status_code == 200:
-                try:
-                    data = response.json()
-                    self.cache[cache_key] = {'time': time.time(), 'data': data}
-                    return data
-                except json.JSONDecodeError:
-                    if response.text.strip():
-                        return {'status': 'ok', 'raw_data': response.text}
+            with self.admission.slot(server, config.get('username'), priority) as admitted:
+                if not admitted:
+                    self._count('rejected')
                     return None
-            else:
-                # Fallback para POST
-                response = requests.post(config['api_url'], data=params, timeout=15)
-                if response.status_code == 200:
-                    try:
-                        data = response.json()
-                        self.cache[cache_key] = {'time': time.time(), 'data': data}
-                        return data
-                    except json.JSONDecodeError:
-                        return {'status': 'ok', 'raw_data': response.text}
-                return None
-
-        except requests.exceptions.Timeout:
-            print("Request timeout")
+                return self._fetch(cache_key, config, params)
+        except CircuitOpenError:
+            # Nada foi enviado: não vai para o cache negativo
+            self._count('fast_failures')
             return None
-        except requests.exceptions.ConnectionError as e:
-            print(f"Connection error: {e}")
-            return None
-        except Exception as e:
-            print(f"General API error: {e}")
+        finally:
+            if not background:
+                with self.lock:
+                    self.in_flight[server] -= 1
+                    if not self.in_flight[server]:
+                        del self.in_flight[server]
+
+    async def load(self, config: Dict, sources: List[Dict]):
+        """Traz para o cache, numa thread, as respostas de ``sources`` que faltam.
+
+        Os handlers chamam antes de montar a tela: a montagem (síncrona) só
+        lê o cache, e fila de admissão, novas tentativas e hedge esperam
+        fora do loop."""
+        server = config.get('server')
+        missing = [params for params in sources if self.cached_at(server, params) is None]
+        if missing:
+            await asyncio.get_running_loop().run_in_executor(None, self._load, config, missing)
+
+    def _load(self, config: Dict, sources: List[Dict]):
+        for params in sources:
+            self.make_api_request(config, params)
+
+    def _keep(self, cache_key: Optional[int], config: Dict, params: Dict, data: Any, digest: Optional[str] = None,
+              size: int = 0) -> Any:
+        """Respostas vazias ficam só no cache negativo (validade curta)"""
+        if cache_key is None:
+            return data
+        if data:
+            return self._store(cache_key, config, params, data, digest, size)
+        with self.lock:
+            self.negative_cache[(config.get('server'), cache_key)] = {'time': time.time(), 'data': data}
+        return data
+
+    def _request(self, config: Dict, params: Dict):
+        """Resposta do primeiro espelho que atender (falhas de rede passam para o próximo).
+
+        Levanta CircuitOpenError se nenhum espelho pôde ser tentado."""
+        started = time.monotonic()
+        response = None
+        attempted = False
+        for host in mirrors.candidates(config):
+            if not self.health.allow(host):
+                continue
+            attempted = True
+            try:
+                response = self.policy.request(mirrors.api_url(host), params, host)
+            except requests.exceptions.Timeout:
+                print(f"Request timeout ({host})")
+                response = None
+            except requests.exceptions.ConnectionError as e:
+                print(f"Connection error ({host}): {e}")
+                response = None
+            except Exception as e:
+                print(f"General API error ({host}): {e}")
+                response = None
+
+            if response is not None and response.status_code < 500:
+                # Qualquer resposta abaixo de 500 mostra que o servidor está no ar
+                self.health.success(host)
+                mirrors.report(config, host, True)
+                return response
+
+            self.health.failure(host)
+            mirrors.report(config, host, False)
+            if time.monotonic() - started >= REQUEST_TIMEOUT_MAX:
+                break
+        if not attempted:
+            raise CircuitOpenError(config['server'])
+        return response
+
+    def _fetch(self, cache_key: Optional[int], config: Dict, params: Dict) -> Optional[Any]:
+        response = self._request(config, params)
+        if response is None or response.status_code != 200:
+            self._keep(cache_key, config, params, None)
             return None
 
-    def get_server_info(self, config: Dict) -> Optional[Dict]:
-        """Obtém informações do servidor"""
-        try:
-            params = {
-                'username': config['username'],
-                'password': config['password'],
-                'action': 'get_account_info'
-            }
-
-            data = self.make_api_request(config, params)
-
-            if data:
-                user_info = data.get('user_info', {}) if isinstance(data, dict) else {}
-                server_info = data.get('server_info', {}) if isinstance(data, dict) else {}
-
-                return {
-                    'server': config['server'],
-                    'username': config['username'],
-                    'status': user_info.get('status', 'Active') if user_info else 'Online',
-                    'exp_date': user_info.get('exp_date', 'N/A') if user_info else 'N/A',
-                    'active_cons': user_info.get('active_cons', '0') if user_info else '0',
-                    'max_connections': user_info.get('max_connections', '1') if user_info else '1',
-                    'available_channels': server_info.get('available_channels', '0') if server_info else '0',
-                    'available_movies': server_info.get('available_movies', '0') if server_info else '0',
-                    'available_series': server_info.get('available_series', '0') if server_info else '0',
-                }
+        # Mesmo corpo que outra conta já recebeu: reaproveita o objeto sem decodificar de novo
+        digest = self.store.digest(response.content) if cache_key is not None else None
+        data = self.store.lookup(digest) if digest else None
+        if data is None:
+            try:
+                data = response.json()
+            except json.JSONDecodeError:
+                if response.text.strip():
+                    return {'status': 'ok', 'raw_data': response.text}
+                data = None
+        return self._keep(cache_key, config, params, data, digest, len(response.content))
+
+    def is_down(self, config: Dict) -> bool:
+        """Se todos os espelhos do painel estão recusando requisições agora"""
+        return all(self.health.is_down(host) for host in mirrors.candidates(config))
+
+    def retry_in(self, config: Dict) -> float:
+        """Segundos até algum espelho do painel voltar a ser testado"""
+        return min(self.health.retry_in(host) for host in mirrors.candidates(config))
+
+    def clean_negative_cache(self):
+        """Remove falhas e respostas vazias expiradas"""
+        now = time.time()
+        with self.lock:
+            expired = [key for key, entry in self.negative_cache.items() if now - entry['time'] >= NEGATIVE_CACHE_TTL]
+            for key in expired:
+                del self.negative_cache[key]
 
-            return {
-                'server': config['server'],
-                'username': config['username'],
-                'status': 'Connected',
-                'exp_date': 'N/A',
-                'active_cons': '0',
-                'max_connections': '1',
-                'available_channels': 'N/A',
-                'available_movies': 'N/A',
-                'available_series': 'N/A'
-            }
+    def clean_expired_cache(self):
+        """Remove respostas expiradas e solta o conteúdo que ninguém mais usa"""
+        now = time.time()
+        with self.lock:
+            expired = [key for key, entry in self.cache.items() if now - entry['time'] >= self.cache_time]
+            for key in expired:
+                self._drop(key)
 
-        except Exception as e:
-            print(f"Error getting server info: {e}")
-            return None
+    def collect_full_category(self, config, category_type, category_id, custom_name,
+                              progress_callback=None) -> List[tuple]:
+        """Itens de uma categoria completa como ``(tipo, dados)`` (progress_callback(feitos, total) a cada item).
 
-    def add_full_category(self, user_id, config, category_type, category_id, custom_name):
-        """Adiciona uma categoria completa ao M3U"""
+        Só lê o painel, então roda em thread; as seleções são alteradas
+        depois, na thread do loop, por ``add_selections``."""
         try:
-            added_count = 0
+            collected = []
 
             if category_type == 'channels':
                 params = {
@@ -167,10 +321,10 @@ class Backend:
                     'action': 'get_live_streams',
                     'category_id': category_id
                 }
-                response = self.make_api_request(config, params)
+                response = self.make_api_request(config, params, priority=BULK)
                 items = response if isinstance(response, list) else []
 
-                for item in items:
+                for index, item in enumerate(items, start=1):
                     channel_data = {
                         'id': item.get('stream_id', item.get('id')),
                         'name': item.get('name', 'Canal sem nome'),
@@ -178,8 +332,9 @@ class Backend:
                         'container': item.get('container_extension', 'ts'),
                         'category': custom_name
                     }
-                    if self.add_to_selection(user_id, 'channels', channel_data):
-                        added_count += 1
+                    collected.append(('channels', channel_data))
+                    if progress_callback:
+                        progress_callback(index, len(items))
 
             elif category_type == 'movies':
                 params = {
@@ -188,10 +343,10 @@ class Backend:
                     'action': 'get_vod_streams',
                     'category_id': category_id
                 }
-                response = self.make_api_request(config, params)
+                response = self.make_api_request(config, params, priority=BULK)
                 items = response if isinstance(response, list) else []
 
-                for item in items:
+                for index, item in enumerate(items, start=1):
                     movie_data = {
                         'id': item.get('stream_id', item.get('id')),
                         'name': item.get('name', 'Filme sem nome'),
@@ -199,8 +354,9 @@ class Backend:
                         'container': item.get('container_extension', 'mp4'),
                         'category': custom_name
                     }
-                    if self.add_to_selection(user_id, 'movies', movie_data):
-                        added_count += 1
+                    collected.append(('movies', movie_data))
+                    if progress_callback:
+                        progress_callback(index, len(items))
 
             elif category_type == 'series':
                 params = {
@@ -209,17 +365,17 @@ class Backend:
                     'action': 'get_series',
                     'category_id': category_id
                 }
-                response = self.make_api_request(config, params)
+                response = self.make_api_request(config, params, priority=BULK)
                 items = response if isinstance(response, list) else []
 
-                for item in items:
+                for index, item in enumerate(items, start=1):
                     series_params = {
                         'username': config['username'],
                         'password': config['password'],
                         'action': 'get_series_info',
                         'series_id': item.get('series_id', item.get('id'))
                     }
-                    series_info = self.make_api_request(config, series_params)
+                    series_info = self.make_api_request(config, series_params, priority=BULK)
 
                     if series_info and isinstance(series_info, dict) and 'episodes' in series_info:
                         for season_num, episodes in series_info['episodes'].items():
@@ -234,14 +390,19 @@ class Backend:
                                     'season': season_num,
                                     'episode': episode.get('episode_num', '?')
                                 }
-                                if self.add_to_selection(user_id, 'series', episode_data):
-                                    added_count += 1
+                                collected.append(('series', episode_data))
+                    if progress_callback:
+                        progress_callback(index, len(items))
 
-            return added_count
+            return collected
 
         except Exception as e:
             print(f"Error adding full category: {e}")
-            return 0
+            return []
+
+    def add_selections(self, user_id: int, items: List[tuple]) -> int:
+        """Adiciona os ``(tipo, dados)`` às seleções do usuário e retorna quantos eram novos"""
+        return sum(1 for item_type, item_data in items if self.add_to_selection(user_id, item_type, item_data))
 
     def get_user_selections(self, user_id: int) -> Dict:
         """Retorna as seleções do usuário"""
@@ -294,17 +455,17 @@ class Backend:
                 f.write("#EXTM3U\n")
 
                 for channel in selections['channels']:
-                    channel_url = f"{config['server']}/live/{config['username']}/{config['password']}/{channel['id']}.{channel['container']}"
+                    channel_url = mirrors.stream_url(config, 'live', channel['id'], channel['container'])
                     f.write(f'#EXTINF:-1 tvg-id="{channel["id"]}" tvg-name="{channel["name"]}" tvg-logo="{channel["logo"]}" group-title="{channel["category"]}",{channel["name"]}\n')
                     f.write(f"{channel_url}\n")
 
                 for movie in selections['movies']:
-                    movie_url = f"{config['server']}/movie/{config['username']}/{config['password']}/{movie['id']}.{movie['container']}"
+                    movie_url = mirrors.stream_url(config, 'movie', movie['id'], movie['container'])
                     f.write(f'#EXTINF:-1 tvg-id="{movie["id"]}" tvg-name="{movie["name"]}" tvg-logo="{movie["logo"]}" group-title="{movie["category"]}",{movie["name"]}\n')
                     f.write(f"{movie_url}\n")
 
                 for serie in selections['series']:
-                    serie_url = f"{config['server']}/series/{config['username']}/{config['password']}/{serie['id']}.{serie['container']}"
+                    serie_url = mirrors.stream_url(config, 'series', serie['id'], serie['container'])
                     f.write(f'#EXTINF:-1 tvg-id="{serie["id"]}" tvg-name="{serie["name"]}" tvg-logo="{serie["logo"]}" group-title="{serie["category"]}",{serie["name"]}\n')
                     f.write(f"{serie_url}\n")
 
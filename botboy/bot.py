@@ -16,25 +16,36 @@ Convertido para Telethon (asyncio) com melhorias de performance.
 """
 
 import asyncio
+import functools
 import time
 import os
-import requests
-import json
+import re
 from urllib.parse import urlparse, parse_qs
 
 from telethon import TelegramClient, events, Button
 from config import BOT_TOKEN, API_ID, API_HASH, OWNER_ID, CLEANUP_INTERVAL
 
 from backend import backend
+from conta import account_state
+from mirrors import mirrors
+from outbound import outbound
+from progress import ProgressReporter
+from render_cache import render_cache
+from prefetch import prefetcher
+from warmup import warmup
 from frontend import IPTVFrontend
 from canais import CanalManager
 from filmes import FilmeManager
 from series import SerieManager
 from comandos import ComandoManager
 from download import DownloadManager
+from busca import BuscaManager
+from search import search_engine
+from router import router, CallbackContext, ExpiredCallbackError
 
 # ===== CLIENTE TELETHON =====
 client = TelegramClient('iptv_bot', API_ID, API_HASH).start(bot_token=BOT_TOKEN)
+outbound.bind(client)
 
 # ===== INICIALIZAÇÃO DOS MANAGERS =====
 frontend = IPTVFrontend(client)
@@ -43,6 +54,10 @@ canal_manager = CanalManager(client, backend, frontend)
 filme_manager = FilmeManager(client, backend, frontend)
 serie_manager = SerieManager(client, backend, frontend)
 download_manager = DownloadManager(client, backend)
+busca_manager = BuscaManager(client, backend, frontend, canal_manager, filme_manager, serie_manager)
+
+# Índice de busca alimentado por cada lista nova que chega do painel
+backend.add_catalog_listener(search_engine.on_catalog)
 
 # Dados dos usuários (config de playlist por chat_id)
 user_data = {}
@@ -50,10 +65,15 @@ user_data = {}
 
 # ===== FUNÇÕES UTILITÁRIAS =====
 
-def extract_playlist_info(url: str) -> dict:
-    """Extrai informações da playlist IPTV a partir da URL"""
+def extract_playlist_info(text: str) -> dict:
+    """Extrai informações da playlist IPTV a partir da URL
+
+    Outras URLs na mesma mensagem viram espelhos do painel só para esta
+    conta (os de PANEL_MIRRORS o seletor acrescenta); as credenciais vêm
+    da primeira."""
     try:
-        parsed = urlparse(url)
+        urls = [part for part in re.split(r'[\s,;]+', text) if part.startswith('http')]
+        parsed = urlparse(urls[0])
         server = f"{parsed.scheme}://{parsed.netloc}"
         query_params = parse_qs(parsed.query)
 
@@ -61,11 +81,18 @@ def extract_playlist_info(url: str) -> dict:
         password = query_params.get('password', [None])[0]
 
         if username and password:
+            hosts = []
+            for extra in urls[1:]:
+                extra = urlparse(extra)
+                host = f"{extra.scheme}://{extra.netloc}"
+                if extra.netloc and host != server and host not in hosts:
+                    hosts.append(host)
             return {
                 'server': server,
                 'username': username,
                 'password': password,
-                'api_url': f"{server}/player_api.php"
+                'api_url': f"{server}/player_api.php",
+                'mirrors': hosts
             }
         return None
     except Exception as e:
@@ -73,31 +100,19 @@ def extract_playlist_info(url: str) -> dict:
         return None
 
 
-def test_connection(config: dict) -> bool:
-    """Testa a conexão com o servidor IPTV"""
-    try:
-        params = {
-            'username': config['username'],
-            'password': config['password'],
-            'action': 'get_account_info'
-        }
-        response = requests.get(config['api_url'], params=params, timeout=10)
-        if response.status_code == 200:
-            try:
-                data = response.json()
-                if isinstance(data, dict) and ('user_info' in data or not data.get('error')):
-                    return True
-                return False
-            except json.JSONDecodeError:
-                return True
-        return False
-    except Exception:
-        return False
-
-
 # ===== HANDLER: /start =====
-@client.on(events.NewMessage(pattern='/start'))
+@client.on(events.NewMessage(pattern=r'^/start(?:@\w+)?(?:\s+(\S+))?$'))
 async def start_handler(event):
+    payload = event.pattern_match.group(1)
+    if payload and payload != "start":
+        # Deep link de um resultado do modo inline (📥 Adicionar ao M3U)
+        try:
+            await busca_manager.handle_start_payload(event, payload, user_data.get(event.chat_id))
+        except Exception as e:
+            print(f"Start payload error: {e}")
+            await outbound.send_message(event.chat_id, "❌ Erro ao adicionar. Tente novamente.")
+        return
+
     welcome_text = """🎬 **Bem-vindo ao IPTV Bot Profissional v3.0!** 📺
 
 🚀 **O bot mais avançado para IPTV no Telegram!**
@@ -112,6 +127,8 @@ async def start_handler(event):
 • 💾 Download de filmes e episódios (apenas dono)
 • 📤 Envio para grupos (apenas dono)
 • 🏷️ Renomeação de categorias personalizadas
+• 🔎 Busca instantânea no catálogo com /buscar
+• ⚡ Busca em qualquer chat digitando @ do bot + nome do título
 
 **🎯 Como usar:**
 1️⃣ Envie a URL da sua playlist IPTV
@@ -123,10 +140,12 @@ async def start_handler(event):
 **📝 Formato da URL:**
 `http://servidor.com/get.php?username=user&password=pass`
 
+**🌐 Seu provedor tem outros endereços?** Envie as URLs na mesma mensagem (uma por linha) e o bot usa sempre o mais rápido que estiver no ar.
+
 **🔥 Pronto para uma experiência incrível?**
 Envie sua URL de playlist para começar!"""
 
-    await event.respond(welcome_text, parse_mode='md')
+    await outbound.send_message(event.chat_id, welcome_text, parse_mode='md')
 
 
 # ===== HANDLER: /admin =====
@@ -134,7 +153,7 @@ Envie sua URL de playlist para começar!"""
 async def admin_handler(event):
     if backend.is_owner(event.sender_id):
         buttons = comando_manager.create_admin_buttons()
-        await event.respond("""👑 **PAINEL ADMINISTRATIVO**
+        await outbound.send_message(event.chat_id, """👑 **PAINEL ADMINISTRATIVO**
 
 Bem-vindo, Administrador!
 
@@ -151,14 +170,14 @@ Bem-vindo, Administrador!
 • ✅ Sem rate limiting
 • ✅ Acesso total ao sistema""", buttons=buttons, parse_mode='md')
     else:
-        await event.respond("❌ Comando disponível apenas para o administrador.")
+        await outbound.send_message(event.chat_id, "❌ Comando disponível apenas para o administrador.")
 
 
 # ===== HANDLER: /stats =====
 @client.on(events.NewMessage(pattern='/stats'))
 async def stats_handler(event):
     stats = backend.get_stats()
-    await event.respond(f"""📊 **Estatísticas do Bot**
+    await outbound.send_message(event.chat_id, f"""📊 **Estatísticas do Bot**
 
 👥 Usuários ativos: {stats['active_users']}
 💾 Items no cache: {stats['cache_size']}
@@ -169,6 +188,53 @@ async def stats_handler(event):
 **🚀 Bot IPTV Profissional v3.0 (Telethon)**""", parse_mode='md')
 
 
+# ===== HANDLER: /buscar =====
+@client.on(events.NewMessage(pattern=r'^/buscar(?:@\w+)?(?:\s+(.+))?$'))
+async def search_handler(event):
+    chat_id = event.chat_id
+    config = user_data.get(chat_id)
+    if not config:
+        await outbound.send_message(chat_id, "❌ Configure uma playlist primeiro!")
+        return
+
+    query = (event.pattern_match.group(1) or '').strip()
+    if not query:
+        await outbound.send_message(chat_id, """🔎 **Busca no catálogo**
+
+**Uso:** `/buscar nome do título`
+
+**Exemplos:**
+• `/buscar matrix`
+• `/buscar globo news`
+• `/buscar acao` (acentos são ignorados)""", parse_mode='md')
+        return
+
+    if not backend.check_rate_limit(chat_id):
+        await outbound.send_message(chat_id, "⚠️ Muitas solicitações! Aguarde alguns segundos.")
+        return
+
+    try:
+        status = None
+        if search_engine.missing_kinds(config):
+            status = await outbound.send_message(
+                chat_id, "🔎 **Indexando o catálogo...**\n\nIsso só acontece na primeira busca.", parse_mode='md'
+            )
+            await busca_manager.ensure_index(config)
+        await busca_manager.show_results(chat_id, status, config, query)
+    except Exception as e:
+        print(f"Search error: {e}")
+        await outbound.send_message(chat_id, "❌ Erro na busca. Tente novamente.")
+
+
+# ===== HANDLER: MODO INLINE =====
+@client.on(events.InlineQuery)
+async def inline_handler(event):
+    try:
+        await busca_manager.handle_inline(event, user_data.get(event.sender_id))
+    except Exception as e:
+        print(f"Inline query error: {e}")
+
+
 # ===== HANDLER: MENSAGENS DE TEXTO (URLs e contexto) =====
 @client.on(events.NewMessage(func=lambda e: e.is_private and not e.text.startswith('/')))
 async def message_handler(event):
@@ -185,18 +251,41 @@ async def message_handler(event):
             return
 
         elif context.get('action') == 'rename_category':
+            if not backend.check_rate_limit(chat_id, 'expensive'):
+                await frontend.show_rate_limit_error(chat_id)
+                return
+
+            del backend.user_context[chat_id]
             category_name = text.strip()
             if category_name:
                 category_type = context['category_type']
                 category_id = context['category_id']
                 config = context['config']
 
-                added_count = backend.add_full_category(
-                    chat_id, config, category_type, category_id, category_name
+                status_msg = await outbound.send_message(
+                    chat_id, f"⏳ **Adicionando categoria {category_name}...**", parse_mode='md'
                 )
+                reporter = ProgressReporter(
+                    status_msg, "📥 ADICIONANDO CATEGORIA", f"🏷️ **Nome:** {category_name}", unit='itens'
+                ).start()
+
+                # A leitura roda fora do loop para não travar o bot em categorias
+                # grandes; as seleções só são alteradas aqui, na thread do loop
+                try:
+                    items = await asyncio.get_running_loop().run_in_executor(
+                        None, functools.partial(
+                            backend.collect_full_category,
+                            config, category_type, category_id, category_name,
+                            progress_callback=reporter.update
+                        )
+                    )
+                finally:
+                    await reporter.stop()
+                added_count = backend.add_selections(chat_id, items)
 
                 if added_count > 0:
-                    await event.respond(
+                    await outbound.edit(
+                        status_msg,
                         f"""✅ **Categoria adicionada com sucesso!**
 
 🏷️ **Nome:** {category_name}
@@ -207,14 +296,13 @@ async def message_handler(event):
                         parse_mode='md'
                     )
                 else:
-                    await event.respond(
+                    await outbound.edit(
+                        status_msg,
                         "❌ **Erro ao adicionar categoria**\n\nNenhum item foi encontrado nesta categoria.",
                         parse_mode='md'
                     )
             else:
-                await event.respond("❌ **Nome inválido**\n\nPor favor, envie um nome válido.", parse_mode='md')
-
-            del backend.user_context[chat_id]
+                await outbound.send_message(event.chat_id, "❌ **Nome inválido**\n\nPor favor, envie um nome válido.", parse_mode='md')
             return
 
     # Rate limiting
@@ -224,7 +312,7 @@ async def message_handler(event):
 
     # Verifica URL
     if not text.startswith('http'):
-        await event.respond("""❌ **URL inválida!**
+        await outbound.send_message(event.chat_id, """❌ **URL inválida!**
 
 Por favor, envie uma URL válida no formato:
 `http://servidor.com/get.php?username=user&password=pass`
@@ -234,7 +322,8 @@ Por favor, envie uma URL válida no formato:
         return
 
     # Mensagem de carregamento
-    loading_msg = await event.respond(
+    loading_msg = await outbound.send_message(
+        event.chat_id,
         "⏳ **Analisando playlist...**\n\n🔍 Verificando servidor\n📡 Testando conexão\n⚡ Validando credenciais",
         parse_mode='md'
     )
@@ -243,7 +332,7 @@ Por favor, envie uma URL válida no formato:
         config = extract_playlist_info(text)
 
         if not config:
-            await loading_msg.edit("""❌ **URL inválida!**
+            await outbound.edit(loading_msg, """❌ **URL inválida!**
 
 A URL deve conter `username` e `password`.
 
@@ -251,8 +340,9 @@ A URL deve conter `username` e `password`.
 `http://servidor.com/get.php?username=USER&password=PASS`""", parse_mode='md')
             return
 
-        if not test_connection(config):
-            await loading_msg.edit(f"""❌ **Falha na conexão!**
+        # A resposta validada fica no estado da conta (info do servidor, fila de downloads)
+        if not await asyncio.get_running_loop().run_in_executor(None, account_state.is_valid, config):
+            await outbound.edit(loading_msg, f"""❌ **Falha na conexão!**
 
 Não foi possível conectar com o servidor.
 
@@ -270,46 +360,34 @@ Não foi possível conectar com o servidor.
 • Tente novamente em alguns minutos""", parse_mode='md')
             return
 
-        # Salva config
+        # Salva config (a conta anterior do chat para de ser sondada se ninguém mais a usa)
+        previous = user_data.get(chat_id)
         user_data[chat_id] = config
-
-        await loading_msg.edit("""✅ **Conexão estabelecida com sucesso!**
-
-🎉 Playlist configurada e validada
-🚀 Sistema pronto para uso
-⚡ Cache otimizado ativado
-
-**Preparando menu principal...**""", parse_mode='md')
-
-        await asyncio.sleep(1.5)
-        await loading_msg.delete()
+        if previous and not any(
+            (other['server'], other['username']) == (previous['server'], previous['username'])
+            for other in user_data.values()
+        ):
+            mirrors.forget(previous)
+
+        # Carrega categorias e listas em segundo plano; a mensagem vira o status
+        mirrors.register(config)
+        warmup.start(config, loading_msg)
         await frontend.show_main_menu(chat_id)
 
     except Exception as e:
         print(f"Error handling playlist URL: {e}")
         try:
-            await loading_msg.edit("❌ **Erro interno**\n\nTente novamente em alguns segundos.", parse_mode='md')
+            await outbound.edit(loading_msg, "❌ **Erro interno**\n\nTente novamente em alguns segundos.", parse_mode='md')
         except:
             pass
 
 
-# ===== HANDLER: CALLBACKS (BOTÕES INLINE) =====
-@client.on(events.CallbackQuery)
-async def callback_handler(event):
-    chat_id = event.chat_id
-    data = event.data.decode()
-
-    try:
-        # Rate limiting
-        if not backend.check_rate_limit(chat_id):
-            await event.answer("⚠️ Muitas solicitações! Aguarde alguns segundos.", alert=True)
-            return
-
-        message = await event.get_message()
+# ===== ROTAS DE CALLBACK (BOTÕES INLINE) =====
 
-        # ===== MENU PRINCIPAL =====
-        if data == "nova_playlist":
-            await message.edit("""🔄 **Nova Playlist**
+# ----- Menu principal -----
+@router.route("nova_playlist")
+async def cb_nova_playlist(ctx):
+    await outbound.edit(ctx.message, """🔄 **Nova Playlist**
 
 📝 Envie a nova URL da playlist IPTV:
 
@@ -318,37 +396,39 @@ async def callback_handler(event):
 
 **💡 Dica:** Cole a URL completa com username e password.""", parse_mode='md')
 
-        elif data == "menu_principal":
-            await frontend.show_main_menu(chat_id, message)
 
-        elif data == "server_info":
-            if chat_id not in user_data:
-                await event.answer("❌ Configure uma playlist primeiro!")
-                return
-            server_info = backend.get_server_info(user_data[chat_id])
-            await frontend.show_server_info(chat_id, message, server_info)
+@router.route("menu_principal")
+async def cb_menu_principal(ctx):
+    await frontend.show_main_menu(ctx.chat_id, ctx.message)
 
-        elif data == "menu_selections":
-            selections = backend.get_user_selections(chat_id)
-            await frontend.show_selections_menu(chat_id, message, selections)
 
-        elif data == "generate_m3u":
-            if chat_id not in user_data:
-                await event.answer("❌ Configure uma playlist primeiro!")
-                return
+@router.route("server_info", requires_config=True)
+async def cb_server_info(ctx):
+    server_info = await asyncio.get_running_loop().run_in_executor(None, account_state.server_info, ctx.config)
+    await frontend.show_server_info(ctx.chat_id, ctx.message, server_info)
 
-            selections = backend.get_user_selections(chat_id)
-            total = len(selections.get('channels', [])) + len(selections.get('movies', [])) + len(selections.get('series', []))
 
-            if total == 0:
-                await event.answer("❌ Nenhum item selecionado!", alert=True)
-                return
+@router.route("menu_selections")
+async def cb_menu_selections(ctx):
+    selections = backend.get_user_selections(ctx.chat_id)
+    await frontend.show_selections_menu(ctx.chat_id, ctx.message, selections)
+
+
+@router.route("generate_m3u", requires_config=True, cost_class='expensive')
+async def cb_generate_m3u(ctx):
+    chat_id = ctx.chat_id
+    selections = backend.get_user_selections(chat_id)
+    total = len(selections.get('channels', [])) + len(selections.get('movies', [])) + len(selections.get('series', []))
+
+    if total == 0:
+        await ctx.event.answer("❌ Nenhum item selecionado!", alert=True)
+        return
 
-            filename = backend.generate_m3u_file(chat_id, user_data[chat_id])
-            if filename:
-                await client.send_file(
-                    chat_id, filename,
-                    caption=f"""📄 **Arquivo M3U Personalizado Gerado!**
+    filename = backend.generate_m3u_file(chat_id, ctx.config)
+    if filename:
+        await outbound.send_file(
+            chat_id, filename,
+            caption=f"""📄 **Arquivo M3U Personalizado Gerado!**
 
 ✅ **Conteúdo incluído:**
 • 📺 Canais: {len(selections.get('channels', []))}
@@ -358,51 +438,49 @@ async def callback_handler(event):
 
 🏷️ **Categorias personalizadas mantidas**
 🎯 **Pronto para usar em qualquer player IPTV**""",
-                    parse_mode='md'
-                )
-                try:
-                    os.remove(filename)
-                except:
-                    pass
-                await event.answer("✅ Arquivo M3U enviado com sucesso!")
-            else:
-                await event.answer("❌ Erro ao gerar arquivo M3U")
-
-        elif data == "clear_selections":
-            if chat_id in backend.user_selections:
-                backend.user_selections[chat_id] = {'channels': [], 'movies': [], 'series': []}
-            await event.answer("🗑️ Todas as seleções foram removidas!")
-            selections = backend.get_user_selections(chat_id)
-            await frontend.show_selections_menu(chat_id, message, selections)
-
-        # ===== MENUS DE CONTEÚDO =====
-        elif data == "menu_canais":
-            if chat_id not in user_data:
-                await event.answer("❌ Configure uma playlist primeiro!")
-                return
-            await canal_manager.show_categories(chat_id, message, user_data[chat_id])
+            parse_mode='md'
+        )
+        try:
+            os.remove(filename)
+        except:
+            pass
+        await ctx.event.answer("✅ Arquivo M3U enviado com sucesso!")
+    else:
+        await ctx.event.answer("❌ Erro ao gerar arquivo M3U")
 
-        elif data == "menu_filmes":
-            if chat_id not in user_data:
-                await event.answer("❌ Configure uma playlist primeiro!")
-                return
-            await filme_manager.show_categories(chat_id, message, user_data[chat_id])
 
-        elif data == "menu_series":
-            if chat_id not in user_data:
-                await event.answer("❌ Configure uma playlist primeiro!")
-                return
-            await serie_manager.show_categories(chat_id, message, user_data[chat_id])
+@router.route("clear_selections")
+async def cb_clear_selections(ctx):
+    chat_id = ctx.chat_id
+    if chat_id in backend.user_selections:
+        backend.user_selections[chat_id] = {'channels': [], 'movies': [], 'series': []}
+    await ctx.event.answer("🗑️ Todas as seleções foram removidas!")
+    selections = backend.get_user_selections(chat_id)
+    await frontend.show_selections_menu(chat_id, ctx.message, selections)
+
+
+# ----- Menus de conteúdo -----
+@router.route("menu_canais", requires_config=True)
+async def cb_menu_canais(ctx):
+    await canal_manager.show_categories(ctx.chat_id, ctx.message, ctx.config)
+
+
+@router.route("menu_filmes", requires_config=True)
+async def cb_menu_filmes(ctx):
+    await filme_manager.show_categories(ctx.chat_id, ctx.message, ctx.config)
+
 
-        # ===== DOWNLOADS =====
-        elif data.startswith("download_"):
-            await download_manager.handle_callback(event, user_data.get(chat_id))
+@router.route("menu_series", requires_config=True)
+async def cb_menu_series(ctx):
+    await serie_manager.show_categories(ctx.chat_id, ctx.message, ctx.config)
 
-        # ===== PAINEL ADMIN =====
-        elif data == "admin_panel" and backend.is_owner(chat_id):
-            buttons = comando_manager.create_admin_buttons()
-            stats = backend.stats
-            await message.edit(f"""👑 **PAINEL ADMINISTRATIVO**
+
+# ----- Painel admin -----
+@router.route("admin_panel", owner_only=True)
+async def cb_admin_panel(ctx):
+    buttons = comando_manager.create_admin_buttons()
+    stats = backend.get_stats()
+    await outbound.edit(ctx.message, f"""👑 **PAINEL ADMINISTRATIVO**
 
 **📊 Estatísticas:**
 • Requisições: {stats['total_requests']}
@@ -413,62 +491,115 @@ async def callback_handler(event):
 • 📊 Estatísticas detalhadas
 • 🗄️ Limpeza de cache""", buttons=buttons, parse_mode='md')
 
-        elif data.startswith("admin_") and backend.is_owner(chat_id):
-            if data == "admin_stats":
-                stats = backend.get_stats()
-                buttons = comando_manager.create_admin_buttons()
-                await message.edit(f"""📊 **ESTATÍSTICAS DETALHADAS**
+
+@router.route("admin_stats", owner_only=True)
+async def cb_admin_stats(ctx):
+    stats = backend.get_stats()
+    queue = outbound.get_stats()
+    pages = render_cache.get_stats()
+    warm = prefetcher.get_stats()
+    policy = backend.policy.get_stats()
+    catalogs = backend.store.get_stats()
+    servers = "\n".join(
+        f"• `{server}`: {info['state']} ({info['failures']} falhas, teste em {info['retry_in']:.0f}s)"
+        for server, info in backend.health.get_stats().items()
+    ) or "• Todos respondendo"
+    latency = "\n".join(f"• `{server}`: p95 {p95 * 1000:.0f}ms" for server, p95 in policy['servers'].items())
+    admission = "\n".join(
+        f"• `{server}`: {info['active']} ativas, {info['waiting']} na fila, {info['rejected'] + info['timeouts']} recusadas"
+        for server, info in backend.admission.get_stats().items()
+    )
+    mirrored = "\n".join(
+        f"• `{server}` ({username}) → `{info['active']}` ({info['healthy']}/{info['hosts']} no ar, {info['switches']} trocas)"
+        for (server, username), info in mirrors.get_stats().items()
+    )
+    buttons = comando_manager.create_admin_buttons()
+    routes = "\n".join(
+        f"• `{r['route']}`: {r['calls']}x, média {r['avg_ms']:.0f}ms, pico {r['max_ms']:.0f}ms"
+        for r in router.get_stats(5)
+    ) or "• Nenhuma rota usada ainda"
+    await outbound.edit(ctx.message, f"""📊 **ESTATÍSTICAS DETALHADAS**
 
 **📈 Uso do sistema:**
 • Total de requisições: {stats['total_requests']}
 • Cache hits: {stats['cache_hits']}
 • Tamanho do cache: {stats['cache_size']} itens
+• Catálogos distintos: {catalogs['catalogs']} ({catalogs['bytes'] / 1024 / 1024:.1f}MB, {catalogs['refs']} referências)
+• Reaproveitados entre contas: {catalogs['reused']}x ({catalogs['bytes_saved'] / 1024 / 1024:.1f}MB não duplicados)
 
 **👥 Usuários:**
 • Usuários ativos: {stats['active_users']}
 • Seleções salvas: {stats['selections']}
 
+**📤 Fila de envios:**
+• Na fila: {queue['queued']} ({queue['queued_chats']} chats)
+• Pico da fila: {queue['max_depth']}
+• Enviados: {queue['sent']} | Edições agrupadas: {queue['coalesced']}
+• FloodWaits: {queue['flood_waits']} | Erros: {queue['errors']}
+
+**🗂️ Páginas renderizadas:**
+• Em cache: {pages['pages']} | Hits: {pages['hits']} | Misses: {pages['misses']} | Expiradas: {pages['stale']}
+
+**🔮 Pré-carregamento:**
+• Pendentes: {warm['pending']} | Em andamento: {warm['running']}
+• Concluídos: {warm['done']} | Descartados: {warm['dropped']} | Erros: {warm['errors']}
+
+**🩺 Servidores IPTV:**
+{servers}
+{latency}
+{mirrored}
+{admission}
+• Falhas rápidas: {stats['fast_failures']} | Cache negativo: {stats['negative_hits']}
+• Novas tentativas: {policy['retries']} | Hedges: {policy['hedges']} ({policy['hedge_wins']} venceram)
+
+**🧭 Rotas mais custosas:**
+{routes}
+
 **⚡ Sistema:**
 • Uptime: {int(time.time() - stats['uptime'])}s""", buttons=buttons, parse_mode='md')
 
-            elif data == "admin_clear_cache":
-                cleared = backend.clear_cache()
-                await event.answer(f"🗄️ Cache limpo! {cleared} itens removidos.")
 
-        # ===== DOWNLOADS/SHARE DO DONO =====
-        elif data.startswith(("canal_download_", "filme_download_", "serie_download_", "episode_download_")):
-            if not backend.is_owner(chat_id):
-                await event.answer("❌ Apenas o dono pode fazer downloads!", alert=True)
-                return
-            parts = data.split("_")
-            await comando_manager.handle_download_request(event, parts[0], parts[2], user_data.get(chat_id))
+@router.route("admin_clear_cache", owner_only=True)
+async def cb_admin_clear_cache(ctx):
+    cleared = backend.clear_cache()
+    await ctx.event.answer(f"🗄️ Cache limpo! {cleared} itens removidos.")
 
-        elif data.startswith(("canal_share_", "filme_share_", "serie_share_")):
-            if not backend.is_owner(chat_id):
-                await event.answer("❌ Apenas o dono pode enviar para grupos!", alert=True)
-                return
-            parts = data.split("_")
-            await comando_manager.handle_share_request(event, parts[0], parts[2], user_data.get(chat_id))
 
-        # ===== ADICIONAR CATEGORIA COMPLETA =====
-        elif data.startswith("add_full_category_"):
-            if chat_id not in user_data:
-                await event.answer("❌ Configure uma playlist primeiro!")
+# ----- Downloads/share do dono -----
+def _owner_item_route(item_type, action):
+    async def handler(ctx, item_id):
+        if action == 'download':
+            if not backend.is_owner(ctx.chat_id):
+                await ctx.event.answer("❌ Apenas o dono pode fazer downloads!", alert=True)
                 return
+            await comando_manager.handle_download_request(ctx.event, item_type, item_id, ctx.config)
+        else:
+            if not backend.is_owner(ctx.chat_id):
+                await ctx.event.answer("❌ Apenas o dono pode enviar para grupos!", alert=True)
+                return
+            await comando_manager.handle_share_request(ctx.event, item_type, item_id, ctx.config)
+    return handler
+
 
-            parts = data.split("_")
-            if len(parts) >= 4:
-                category_type = parts[3]
-                category_id = parts[4] if len(parts) > 4 else parts[3]
+for _item_type in ("canal", "filme", "serie", "episode"):
+    router.add(f"{_item_type}_download_{{item_id}}", _owner_item_route(_item_type, 'download'))
+for _item_type in ("canal", "filme", "serie"):
+    router.add(f"{_item_type}_share_{{item_id}}", _owner_item_route(_item_type, 'share'))
 
-                await event.answer("📝 Envie o nome personalizado para esta categoria")
 
-                await client.send_message(
-                    chat_id,
-                    f"""🏷️ **Renomear Categoria Completa**
+# ----- Adicionar categoria completa -----
+@router.route("add_full_category_{category_type}_{category_id*}", requires_config=True)
+async def cb_add_full_category(ctx, category_type, category_id, category_name=None):
+    chat_id = ctx.chat_id
+    await ctx.event.answer("📝 Envie o nome personalizado para esta categoria")
+    original = f"\n**📡 Original:** {category_name}" if category_name else ""
+
+    await outbound.send_message(
+        chat_id,
+        f"""🏷️ **Renomear Categoria Completa**
 
 **📁 Tipo:** {category_type.title()}
-**🆔 ID:** {category_id}
+**🆔 ID:** {category_id}{original}
 
 **💡 Envie o nome que deseja usar para esta categoria no M3U:**
 
@@ -478,35 +609,77 @@ async def callback_handler(event):
 • "Séries Netflix Premium"
 
 📝 **Digite o nome personalizado:**""",
-                    parse_mode='md'
-                )
+        parse_mode='md'
+    )
 
-                backend.user_context[chat_id] = {
-                    'action': 'rename_category',
-                    'category_type': category_type,
-                    'category_id': category_id,
-                    'config': user_data[chat_id]
-                }
+    backend.user_context[chat_id] = {
+        'action': 'rename_category',
+        'category_type': category_type,
+        'category_id': category_id,
+        'config': ctx.config
+    }
 
-        # ===== DELEGAÇÃO PARA MANAGERS =====
-        elif data.startswith("canal_"):
-            await canal_manager.handle_callback(event, user_data.get(chat_id))
 
-        elif data.startswith("filme_"):
-            await filme_manager.handle_callback(event, user_data.get(chat_id))
+# ----- Informativos -----
+@router.route("page_info")
+async def cb_page_info(ctx):
+    await ctx.event.answer("ℹ️ Informação de página")
 
-        elif data.startswith("serie_"):
-            await serie_manager.handle_callback(event, user_data.get(chat_id))
 
-        elif data in ("page_info", "empty"):
-            await event.answer("ℹ️ Informação de página" if data == "page_info" else "")
+@router.route("empty")
+async def cb_empty(ctx):
+    await ctx.event.answer("")
 
-        else:
+
+# ----- Rotas dos managers -----
+canal_manager.register_routes(router)
+filme_manager.register_routes(router)
+serie_manager.register_routes(router)
+download_manager.register_routes(router)
+busca_manager.register_routes(router)
+
+
+# ===== HANDLER: CALLBACKS (BOTÕES INLINE) =====
+@client.on(events.CallbackQuery)
+async def callback_handler(event):
+    chat_id = event.chat_id
+    data = event.data
+
+    try:
+        try:
+            route, params = router.decode(data)
+        except ExpiredCallbackError:
+            await event.answer("⌛ Este botão expirou. Abra o menu novamente.", alert=True)
+            return
+        if route is None:
             await event.answer("⚠️ Ação não reconhecida")
+            return
+
+        # Rate limiting (cada rota declara sua classe de custo)
+        if not backend.check_rate_limit(chat_id, route.cost_class):
+            await event.answer("⚠️ Muitas solicitações! Aguarde alguns segundos.", alert=True)
+            return
+
+        if route.owner_only and not backend.is_owner(chat_id):
+            await event.answer("❌ Comando disponível apenas para o administrador.")
+            return
 
-        # Responde callback para remover loading
+        config = user_data.get(chat_id)
+        if route.requires_config and not config:
+            await event.answer("❌ Configure uma playlist primeiro!")
+            return
+
+        ctx = CallbackContext(event, data, config)
+        fast_failures = backend.stats['fast_failures']
+        await router.dispatch(route, ctx, params)
+
+        # Responde callback para remover loading (avisa se o painel recusou por estar fora do ar)
         try:
-            await event.answer()
+            if config and backend.stats['fast_failures'] > fast_failures and backend.is_down(config):
+                retry_in = backend.retry_in(config)
+                await event.answer(f"🔌 Servidor IPTV fora do ar. Nova tentativa em {retry_in:.0f}s.", alert=True)
+            else:
+                await event.answer()
         except:
             pass
 
@@ -524,6 +697,14 @@ async def cleanup_worker():
     while True:
         try:
             backend.clean_old_files()
+            backend.clean_negative_cache()
+            backend.clean_expired_cache()
+            backend.rate_limiter.evict_idle()
+            mirrors.evict_idle()
+            router.contexts.cleanup()
+            account_state.cleanup()
+            search_engine.cleanup()
+            busca_manager.cleanup_inline()
             download_manager.cleanup_old_files()
         except Exception as e:
             print(f"Cleanup error: {e}")
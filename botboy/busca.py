@@ -0,0 +1,219 @@
+import asyncio
+import re
+import time
+from telethon import Button
+from telethon.tl.types import InputWebDocument
+from config import INLINE_RESULTS, INLINE_CACHE_TIME, INLINE_DEBOUNCE
+from mirrors import mirrors
+from outbound import outbound
+from router import router, TOKEN_SIZE
+from search import search_engine, LIST_ACTIONS, CATEGORY_ACTIONS
+from warmup import warmup
+
+KIND_ICONS = {'live': '📺', 'movie': '🎬', 'series': '🎞️'}
+_START_SAFE = re.compile(r'[A-Za-z0-9_-]+')  # Caracteres aceitos no parâmetro do /start
+
+
+class BuscaManager:
+    def __init__(self, client, backend, frontend, canal_manager, filme_manager, serie_manager):
+        self.client = client
+        self.backend = backend
+        self.frontend = frontend
+        self.canal_manager = canal_manager
+        self.filme_manager = filme_manager
+        self.serie_manager = serie_manager
+        self.bot_username = None
+        self.inline_latest = {}  # usuário -> (id da última consulta inline, momento)
+
+    def load_catalog(self, config, kinds):
+        """Busca categorias e listas completas e indexa as que já estavam em cache.
+
+        Resposta nova chega ao índice pelo ouvinte do backend; a que vem do
+        cache não avisa ninguém, então é entregue aqui (índice que falhou ou
+        foi descartado enquanto a lista continua em cache)."""
+        for kind in kinds:
+            for actions in (CATEGORY_ACTIONS, LIST_ACTIONS):
+                action = next(action for action, action_kind in actions.items() if action_kind == kind)
+                params = {'username': config['username'], 'password': config['password'], 'action': action}
+                data = self.backend.make_api_request(config, params)
+                if actions is CATEGORY_ACTIONS or kind in search_engine.missing_kinds(config):
+                    search_engine.on_catalog(config, params, data)
+
+    async def ensure_index(self, config) -> bool:
+        """Garante o catálogo indexado; retorna True se precisou buscar no painel"""
+        await warmup.wait(config)
+        missing = search_engine.missing_kinds(config)
+        if not missing:
+            return False
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.load_catalog, config, missing)
+        return True
+
+    def _result_buttons(self, config, doc):
+        item = search_engine.item(config, doc)
+        name = f"{KIND_ICONS[doc['kind']]} {self.frontend.truncate_text(doc['name'], 30)}"
+        if doc['kind'] == 'live':
+            return [Button.inline(name, data=router.pack("canal_play", stream_id=item['id'], item=item)),
+                    Button.inline("📥", data=router.pack("canal_add", stream_id=item['id'], item=item))]
+        if doc['kind'] == 'movie':
+            return [Button.inline(name, data=router.pack("filme_play", stream_id=item['id'], item=item)),
+                    Button.inline("📥", data=router.pack("filme_add", stream_id=item['id'], item=item))]
+        serie = {'id': item['id'], 'name': item['name'], 'cover': item['logo'], 'category': item['category']}
+        return [Button.inline(name, data=router.pack("serie_episodes", series_id=item['id'], page=0, serie=serie)),
+                Button.inline("📥", data=router.pack("serie_add", series_id=item['id'], serie=serie))]
+
+    async def show_results(self, chat_id, message, config, query, page=0):
+        started = time.perf_counter()
+        per_page = self.frontend.items_per_page
+        results, total = search_engine.search(config, query, limit=per_page, offset=page * per_page)
+        elapsed = (time.perf_counter() - started) * 1000
+
+        if not results:
+            text = f"🔎 **Nenhum resultado para:** `{query}`\n\n💡 Tente outra grafia ou menos palavras."
+            buttons = [[Button.inline("🔙 Menu Principal", data=b"menu_principal")]]
+        else:
+            buttons = [self._result_buttons(config, doc) for doc in results]
+            nav = self.frontend.create_pagination_buttons(page, total, "busca_page", query=query)
+            if nav:
+                buttons.append(nav)
+            buttons.append([Button.inline("🔙 Menu Principal", data=b"menu_principal")])
+
+            total_pages = (total + per_page - 1) // per_page
+            text = f"""🔎 **Resultados para:** `{query}`
+
+📊 **{total} encontrados** • Página {page + 1} de {total_pages}
+⚡ **{elapsed:.0f} ms**
+📥 **Use o botão 📥 para adicionar ao M3U**"""
+
+        if message is None:
+            await outbound.send_message(chat_id, text, buttons=buttons, parse_mode='md')
+            return
+        try:
+            await outbound.edit(message, text, buttons=buttons, parse_mode='md')
+        except:
+            await outbound.send_message(chat_id, text, buttons=buttons, parse_mode='md')
+
+    # ===== Modo inline =====
+
+    async def _deep_link(self, payload):
+        if self.bot_username is None:
+            self.bot_username = (await self.client.get_me()).username
+        return f"https://t.me/{self.bot_username}?start={payload}"
+
+    async def _inline_result(self, builder, config, doc):
+        item = search_engine.item(config, doc)
+        kind = doc['kind']
+        token = router.contexts.put({'kind': kind, 'item': item})
+        payload = f"add-{token}"
+        if _START_SAFE.fullmatch(str(item['id'])) and len(payload) + len(kind) + len(str(item['id'])) + 2 <= 64:
+            # Tipo e id no link: se o contexto se perder, o item sai do índice de busca
+            payload += f"-{kind}-{item['id']}"
+        add_button = Button.url("📥 Adicionar ao M3U", await self._deep_link(payload))
+
+        if kind == 'series':
+            text = f"🎞️ **{item['name']}**\n📡 {item['category']}"
+            buttons = [[add_button]]
+        else:
+            play_url = mirrors.stream_url(config, kind, item['id'], item['container'])
+            text = f"{KIND_ICONS[kind]} **{item['name']}**\n📡 {item['category']}\n\n🔗 `{play_url}`"
+            buttons = [[Button.url("▶️ Reproduzir", play_url)], [add_button]]
+
+        thumb = None
+        if item['logo'].startswith('http'):
+            thumb = InputWebDocument(item['logo'], size=0, mime_type='image/jpeg', attributes=[])
+
+        return await builder.article(
+            title=f"{KIND_ICONS[kind]} {item['name']}",
+            description=item['category'],
+            id=f"{kind}-{item['id']}",
+            thumb=thumb,
+            text=text,
+            parse_mode='md',
+            buttons=buttons
+        )
+
+    async def _superseded(self, user_id, query_id) -> bool:
+        """Espera um pouco se o usuário está digitando rápido; True se veio consulta mais nova"""
+        now = time.monotonic()
+        previous = self.inline_latest.get(user_id)
+        self.inline_latest[user_id] = (query_id, now)
+        if previous is None or now - previous[1] >= INLINE_DEBOUNCE:
+            return False
+        await asyncio.sleep(INLINE_DEBOUNCE)
+        return self.inline_latest.get(user_id, (None,))[0] != query_id
+
+    async def handle_inline(self, event, config):
+        """Responde ``@bot texto`` só com o índice local (sem chamar o painel)"""
+        if not config:
+            await event.answer([], switch_pm="⚙️ Configure sua playlist no bot", switch_pm_param="start")
+            return
+
+        query = event.text.strip()
+        if not query or await self._superseded(event.sender_id, event.id):
+            return
+
+        if search_engine.missing_kinds(config):
+            # Indexa em segundo plano; as próximas teclas já encontram o índice
+            asyncio.create_task(self.ensure_index(config))
+            await event.answer([], switch_pm="🔎 Indexando catálogo... tente de novo em instantes", switch_pm_param="start")
+            return
+
+        offset = int(event.offset) if event.offset.isdigit() else 0
+        results, total = search_engine.search(config, query, limit=INLINE_RESULTS, offset=offset)
+        articles = await asyncio.gather(*(self._inline_result(event.builder, config, doc) for doc in results))
+        next_offset = str(offset + INLINE_RESULTS) if offset + INLINE_RESULTS < total else None
+
+        await event.answer(articles, cache_time=INLINE_CACHE_TIME, private=True, next_offset=next_offset)
+
+    async def handle_start_payload(self, event, payload, config):
+        """Deep link ``/start add-<token>[-<tipo>-<id>]`` vindo de um resultado inline"""
+        values = None
+        if payload.startswith("add-"):
+            values = router.contexts.get(payload[4:4 + TOKEN_SIZE])
+            kind, _, item_id = payload[5 + TOKEN_SIZE:].partition('-')
+            if values is None and item_id and config:
+                await self.ensure_index(config)
+                doc = search_engine.find(config, kind, item_id)
+                if doc is not None:
+                    values = {'kind': kind, 'item': search_engine.item(config, doc)}
+        if values is None:
+            await outbound.send_message(event.chat_id, "⌛ Este link expirou. Faça a busca de novo.")
+            return
+
+        kind, item = values['kind'], values['item']
+        chat_id = event.chat_id
+        if kind == 'series':
+            if not config:
+                await outbound.send_message(chat_id, "❌ Configure uma playlist primeiro!")
+                return
+            await self.backend.load(config, self.serie_manager._info_sources(config, item['id']))
+            index = self.serie_manager.get_episode_index(config, item['id'])
+            serie = {'id': item['id'], 'name': item['name'], 'cover': item['logo'], 'category': item['category']}
+            episodes = index.episodes if index else []
+            added = sum(
+                1 for ep in episodes
+                if self.backend.add_to_selection(chat_id, 'series', self.serie_manager._episode_data(ep, serie))
+            )
+            text = f"📥 **{item['name']}**: {added} episódios adicionados ao M3U!" if added else \
+                f"ℹ️ Todos os episódios de **{item['name']}** já estão no M3U!"
+        else:
+            selection = 'channels' if kind == 'live' else 'movies'
+            if self.backend.add_to_selection(chat_id, selection, dict(item)):
+                text = f"📥 **{item['name']}** adicionado ao M3U!"
+            else:
+                text = f"ℹ️ **{item['name']}** já está no M3U!"
+
+        buttons = [[Button.inline("⭐ Minhas Seleções", data=b"menu_selections")]]
+        await outbound.send_message(chat_id, text, buttons=buttons, parse_mode='md')
+
+    def cleanup_inline(self, max_age: float = 60):
+        cutoff = time.monotonic() - max_age
+        for user_id in [user for user, (_, seen) in self.inline_latest.items() if seen < cutoff]:
+            del self.inline_latest[user_id]
+
+    def register_routes(self, router):
+        """Registra as rotas de callback da busca"""
+        async def results_page(ctx, page, query=''):
+            await self.show_results(ctx.chat_id, ctx.message, ctx.config, query, page)
+
+        router.add("busca_page_{page:int}", results_page, requires_config=True)
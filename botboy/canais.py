@@ -1,5 +1,13 @@
 from telethon import Button
 from typing import Optional
+from catalogo import LazyCatalogView, catalog_index
+from config import PREFETCH_CATEGORIES
+from media_cache import media_cache
+from mirrors import mirrors
+from outbound import outbound
+from prefetch import prefetcher
+from render_cache import render_cache
+from router import router
 
 
 class CanalManager:
@@ -8,45 +16,61 @@ class CanalManager:
         self.backend = backend
         self.frontend = frontend
 
-    def get_categories(self, config):
-        """Obtém categorias de canais"""
-        params = {
-            'username': config['username'],
-            'password': config['password'],
-            'action': 'get_live_categories'
-        }
-        return self.backend.make_api_request(config, params) or []
-
-    def get_channels(self, config, category_id=None):
-        """Obtém lista de canais"""
+    def _params(self, config, action, category_id=None):
         params = {
             'username': config['username'],
             'password': config['password'],
-            'action': 'get_live_streams'
+            'action': action
         }
         if category_id:
             params['category_id'] = category_id
+        return params
 
-        channels = self.backend.make_api_request(config, params) or []
+    def get_categories(self, config):
+        """Obtém categorias de canais"""
+        return self.backend.make_api_request(config, self._params(config, 'get_live_categories')) or []
 
-        categories = self.get_categories(config)
-        category_map = {str(cat.get('category_id')): cat.get('category_name', 'Canais') for cat in categories}
+    def get_channels(self, config, category_id=None):
+        """Obtém lista de canais (itens materializados sob demanda)"""
+        params = self._params(config, 'get_live_streams', category_id)
 
-        for channel in channels:
-            channel['play_url'] = f"{config['server']}/live/{config['username']}/{config['password']}/{channel['stream_id']}.{channel.get('container_extension', 'ts')}"
-            if not channel.get('category_name') and category_id:
-                channel['category_name'] = category_map.get(str(category_id), 'Canais')
+        channels = self.backend.make_api_request(config, params)
+        channels = channels if isinstance(channels, list) else []
 
-        return channels
+        categories = self.get_categories(config)
+        categories = catalog_index(categories if isinstance(categories, list) else [], ('category_id',))
+        base_url = mirrors.base_url(config, 'live')
+
+        def materialize(channel):
+            item = dict(channel)
+            item['play_url'] = f"{base_url}/{channel['stream_id']}.{channel.get('container_extension', 'ts')}"
+            if not item.get('category_name'):
+                category = categories.find(channel.get('category_id') or category_id)
+                if category:
+                    item['category_name'] = category.get('category_name', 'Canais')
+            return item
+
+        return LazyCatalogView(channels, materialize)
+
+    def _selection_data(self, channel):
+        """Dados do canal usados no M3U (e levados no contexto dos botões)"""
+        return {
+            'id': channel['stream_id'],
+            'name': channel['name'],
+            'logo': channel.get('stream_icon', ''),
+            'container': channel.get('container_extension', 'ts'),
+            'category': channel.get('category_name', 'Canais')
+        }
 
     async def show_categories(self, chat_id, message, config):
         """Mostra categorias de canais"""
         try:
+            await self.backend.load(config, [self._params(config, 'get_live_categories')])
             categories = self.get_categories(config)
 
             if not categories:
                 buttons = self.frontend.create_error_buttons("menu_principal")
-                await message.edit("❌ Não foi possível carregar as categorias de canais.", buttons=buttons)
+                await outbound.edit(message, "❌ Não foi possível carregar as categorias de canais.", buttons=buttons)
                 return
 
             buttons = [[Button.inline("📺 Todos os Canais", data=b"canal_list_all_0")]]
@@ -55,8 +79,9 @@ class CanalManager:
                 cat_name = self.frontend.truncate_text(category['category_name'], 25)
                 cat_id = category['category_id']
                 buttons.append([
-                    Button.inline(f"📁 {cat_name}", data=f"canal_list_{cat_id}_0".encode()),
-                    Button.inline("📥➕", data=f"add_full_category_channels_{cat_id}".encode()),
+                    Button.inline(f"📁 {cat_name}", data=router.pack("canal_list", category_id=cat_id, page=0)),
+                    Button.inline("📥➕", data=router.pack("add_full_category", category_type="channels", category_id=cat_id,
+                                                          category_name=category['category_name'])),
                 ])
 
             buttons.append([Button.inline("🔙 Menu Principal", data=b"menu_principal")])
@@ -75,46 +100,94 @@ class CanalManager:
 Escolha uma categoria:"""
 
             try:
-                await message.edit(text, buttons=buttons, parse_mode='md')
+                await outbound.edit(message, text, buttons=buttons, parse_mode='md')
             except:
-                await self.client.send_message(chat_id, text, buttons=buttons, parse_mode='md')
+                await outbound.send_message(chat_id, text, buttons=buttons, parse_mode='md')
+
+            for category in categories[:PREFETCH_CATEGORIES]:
+                self.prefetch_page(config, category['category_id'], 0)
 
         except Exception as e:
             print(f"Error showing channel categories: {e}")
             buttons = self.frontend.create_error_buttons("menu_principal")
-            await message.edit("❌ Erro ao carregar categorias.", buttons=buttons)
+            await outbound.edit(message, "❌ Erro ao carregar categorias.", buttons=buttons)
 
     async def show_channels(self, chat_id, message, config, category_id, page=0):
         """Mostra lista de canais com paginação"""
         try:
-            channels = self.get_channels(config) if category_id == "all" else self.get_channels(config, category_id)
-
-            if not channels:
+            key = render_cache.key(config, "canal_list", category_id, page)
+            sources = self._list_sources(config, None if category_id == "all" else category_id)
+            await self.backend.load(config, sources)
+            rendered = render_cache.get(key, sources)
+            if rendered is None:
+                rendered = self._render_channels(config, category_id, page)
+
+            if rendered is None:
                 buttons = self.frontend.create_error_buttons("menu_canais")
-                await message.edit("❌ Nenhum canal encontrado nesta categoria.", buttons=buttons)
+                await outbound.edit(message, "❌ Nenhum canal encontrado nesta categoria.", buttons=buttons)
                 return
 
-            start_idx = page * self.frontend.items_per_page
-            end_idx = start_idx + self.frontend.items_per_page
-            page_channels = channels[start_idx:end_idx]
+            text, markup = rendered
+            try:
+                await outbound.edit(message, text, buttons=markup, parse_mode='md')
+            except:
+                await outbound.send_message(chat_id, text, buttons=markup, parse_mode='md')
 
-            buttons = []
-            for channel in page_channels:
-                ch_name = self.frontend.truncate_text(channel['name'], 32)
-                sid = channel['stream_id']
-                buttons.append([
-                    Button.inline(f"📺 {ch_name}", data=f"canal_play_{sid}".encode()),
-                    Button.inline("📥", data=f"canal_add_{sid}".encode()),
-                ])
+            self.prefetch_page(config, category_id, page + 1)
 
-            nav = self.frontend.create_pagination_buttons(page, len(channels), "canal_list", category_id)
-            if nav:
-                buttons.append(nav)
+        except Exception as e:
+            print(f"Error showing channels: {e}")
+            buttons = self.frontend.create_error_buttons("menu_canais")
+            await outbound.edit(message, "❌ Erro ao carregar canais.", buttons=buttons)
+
+    def _list_sources(self, config, list_category):
+        """Requisições de que uma página da lista depende"""
+        return [self._params(config, 'get_live_streams', list_category), self._params(config, 'get_live_categories')]
+
+    def prefetch_page(self, config, category_id, page):
+        """Aquece a página em segundo plano (lista do painel + renderização)"""
+        key = render_cache.key(config, "canal_list", category_id, page)
+        list_category = None if category_id == "all" else category_id
+        sources = self._list_sources(config, list_category)
+        if render_cache.has(key, sources):
+            return
 
-            buttons.append([Button.inline("🔙 Categorias", data=b"menu_canais")])
+        def render():
+            if page * self.frontend.items_per_page < len(self.get_channels(config, list_category)):
+                self._render_channels(config, category_id, page)
 
-            total_pages = (len(channels) + self.frontend.items_per_page - 1) // self.frontend.items_per_page
-            text = f"""📺 **CANAIS DE TV**
+        prefetcher.schedule(config, key, sources, render)
+
+    def _render_channels(self, config, category_id, page):
+        """Monta texto e teclado de uma página de canais (None se vazia)"""
+        list_category = None if category_id == "all" else category_id
+        channels = self.get_channels(config, list_category)
+        if not channels:
+            return None
+
+        start_idx = page * self.frontend.items_per_page
+        end_idx = start_idx + self.frontend.items_per_page
+        page_channels = channels[start_idx:end_idx]
+
+        buttons = []
+        for channel in page_channels:
+            ch_name = self.frontend.truncate_text(channel['name'], 32)
+            sid = channel['stream_id']
+            item = self._selection_data(channel)
+            buttons.append([
+                Button.inline(f"📺 {ch_name}", data=router.pack("canal_play", stream_id=sid, item=item,
+                                                               category_id=category_id, page=page)),
+                Button.inline("📥", data=router.pack("canal_add", stream_id=sid, item=item)),
+            ])
+
+        nav = self.frontend.create_pagination_buttons(page, len(channels), "canal_list", category_id=category_id)
+        if nav:
+            buttons.append(nav)
+
+        buttons.append([Button.inline("🔙 Categorias", data=b"menu_canais")])
+
+        total_pages = (len(channels) + self.frontend.items_per_page - 1) // self.frontend.items_per_page
+        text = f"""📺 **CANAIS DE TV**
 
 📊 **Página {page + 1} de {total_pages}**
 📺 **Total: {len(channels)} canais**
@@ -122,41 +195,38 @@ Escolha uma categoria:"""
 
 Escolha um canal:"""
 
-            try:
-                await message.edit(text, buttons=buttons, parse_mode='md')
-            except:
-                await self.client.send_message(chat_id, text, buttons=buttons, parse_mode='md')
-
-        except Exception as e:
-            print(f"Error showing channels: {e}")
-            buttons = self.frontend.create_error_buttons("menu_canais")
-            await message.edit("❌ Erro ao carregar canais.", buttons=buttons)
+        key = render_cache.key(config, "canal_list", category_id, page)
+        sources = self._list_sources(config, list_category)
+        return render_cache.put(key, sources, text, self.client.build_reply_markup(buttons))
 
-    async def play_channel(self, chat_id, message, config, stream_id):
+    async def play_channel(self, chat_id, message, config, stream_id, item=None, category_id="all", page=0):
         """Mostra detalhes de um canal"""
         try:
-            channels = self.get_channels(config)
-            channel = next((ch for ch in channels if str(ch['stream_id']) == str(stream_id)), None)
+            if item is None:
+                await self.backend.load(config, self._list_sources(config, None))
+                channel = self.get_channels(config).find(stream_id)
 
-            if not channel:
-                buttons = self.frontend.create_error_buttons("menu_canais")
-                await message.edit("❌ Canal não encontrado.", buttons=buttons)
-                return
+                if not channel:
+                    buttons = self.frontend.create_error_buttons("menu_canais")
+                    await outbound.edit(message, "❌ Canal não encontrado.", buttons=buttons)
+                    return
+                item = self._selection_data(channel)
 
+            play_url = mirrors.stream_url(config, 'live', item['id'], item['container'])
             buttons = [
-                [Button.url("▶️ Reproduzir", channel['play_url']),
-                 Button.inline("📥 Adicionar ao M3U", data=f"canal_add_{stream_id}".encode())],
-                [Button.inline("🔙 Voltar", data=b"canal_list_all_0")],
+                [Button.url("▶️ Reproduzir", play_url),
+                 Button.inline("📥 Adicionar ao M3U", data=router.pack("canal_add", stream_id=stream_id, item=item))],
+                [Button.inline("🔙 Voltar", data=router.pack("canal_list", category_id=category_id, page=page))],
             ]
 
-            text = f"""📺 **{channel['name']}**
+            text = f"""📺 **{item['name']}**
 
-🆔 **Stream ID:** {channel['stream_id']}
-📡 **Categoria:** {channel.get('category_name', 'Geral')}
+🆔 **Stream ID:** {item['id']}
+📡 **Categoria:** {item.get('category') or 'Geral'}
 🌐 **Servidor:** {config['server'].split('//')[1] if '//' in config['server'] else config['server']}
 
 🔗 **URL de reprodução:**
-`{channel['play_url']}`
+`{play_url}`
 
 **💡 Como reproduzir:**
 • Clique em "▶️ Reproduzir" para abrir no player
@@ -164,79 +234,58 @@ Escolha um canal:"""
 • Copie a URL para usar em outro player"""
 
             # Tenta enviar com imagem
-            if channel.get('stream_icon') and channel['stream_icon'].startswith('http'):
+            if item.get('logo') and item['logo'].startswith('http'):
                 try:
                     await message.delete()
-                    await self.client.send_file(chat_id, channel['stream_icon'], caption=text, buttons=buttons, parse_mode='md')
+                    await media_cache.send(outbound, chat_id, media_cache.icon_key(item['logo']), item['logo'], caption=text, buttons=buttons, parse_mode='md')
                     return
                 except:
                     pass
 
             try:
-                await message.edit(text, buttons=buttons, parse_mode='md')
+                await outbound.edit(message, text, buttons=buttons, parse_mode='md')
             except:
-                await self.client.send_message(chat_id, text, buttons=buttons, parse_mode='md')
+                await outbound.send_message(chat_id, text, buttons=buttons, parse_mode='md')
 
         except Exception as e:
             print(f"Error playing channel: {e}")
             buttons = self.frontend.create_error_buttons("menu_canais")
-            await message.edit("❌ Erro ao carregar canal.", buttons=buttons)
+            await outbound.edit(message, "❌ Erro ao carregar canal.", buttons=buttons)
 
-    async def add_to_m3u(self, event, config, stream_id):
+    async def add_to_m3u(self, event, config, stream_id, item=None):
         """Adiciona canal ao M3U preservando categoria original"""
         try:
-            channels = self.get_channels(config)
-            channel = next((ch for ch in channels if str(ch['stream_id']) == str(stream_id)), None)
+            if item is None:
+                await self.backend.load(config, self._list_sources(config, None))
+                channel = self.get_channels(config).find(stream_id)
 
-            if not channel:
-                await event.answer("❌ Canal não encontrado!")
-                return
-
-            channel_data = {
-                'id': channel['stream_id'],
-                'name': channel['name'],
-                'logo': channel.get('stream_icon', ''),
-                'container': channel.get('container_extension', 'ts'),
-                'category': channel.get('category_name', 'Canais')
-            }
+                if not channel:
+                    await event.answer("❌ Canal não encontrado!")
+                    return
+                item = self._selection_data(channel)
 
-            added = self.backend.add_to_selection(event.chat_id, 'channels', channel_data)
+            added = self.backend.add_to_selection(event.chat_id, 'channels', dict(item))
 
             if added:
-                await event.answer(f"📥 {channel['name']} adicionado ao M3U!")
+                await event.answer(f"📥 {item['name']} adicionado ao M3U!")
             else:
-                await event.answer(f"ℹ️ {channel['name']} já está no M3U!")
+                await event.answer(f"ℹ️ {item['name']} já está no M3U!")
 
         except Exception as e:
             print(f"Error adding to M3U: {e}")
             await event.answer("❌ Erro ao adicionar ao M3U")
 
-    async def handle_callback(self, event, config):
-        """Manipula callbacks de canais"""
-        if not config:
-            await event.answer("❌ Configure uma playlist primeiro!")
-            return
-
-        data = event.data.decode()
-        chat_id = event.chat_id
-        message = await event.get_message()
+    def register_routes(self, router):
+        """Registra as rotas de callback de canais"""
+        async def list_channels(ctx, category_id, page):
+            await self.show_channels(ctx.chat_id, ctx.message, ctx.config, category_id, page)
 
-        try:
-            if data.startswith("canal_list_"):
-                parts = data.split("_")
-                if len(parts) >= 4:
-                    category_id = parts[2]
-                    page = int(parts[3])
-                    await self.show_channels(chat_id, message, config, category_id, page)
+        async def play(ctx, stream_id, item=None, category_id="all", page=0):
+            await self.play_channel(ctx.chat_id, ctx.message, ctx.config, stream_id, item, category_id, page)
 
-            elif data.startswith("canal_play_"):
-                stream_id = data.split("_")[2]
-                await self.play_channel(chat_id, message, config, stream_id)
+        async def add(ctx, stream_id, item=None):
+            await self.add_to_m3u(ctx.event, ctx.config, stream_id, item)
 
-            elif data.startswith("canal_add_"):
-                stream_id = data.split("_")[2]
-                await self.add_to_m3u(event, config, stream_id)
-
-        except Exception as e:
-            print(f"Error in channel callback: {e}")
-            await event.answer("❌ Erro interno")
+        router.add("canal_list_{category_id*}_{page:int}", list_channels, requires_config=True)
+        router.add("canal_play_{stream_id}", play, requires_config=True)
+        router.add("canal_add_{stream_id}", add, requires_config=True)
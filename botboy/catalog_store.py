@@ -0,0 +1,98 @@
+import hashlib
+import threading
+from typing import Any, Callable, Dict, Optional
+
+
+class CatalogStore:
+    """Respostas do painel guardadas uma única vez, pelo conteúdo.
+
+    Contas do mesmo painel costumam receber exatamente o mesmo catálogo (o
+    get_vod_streams completo, de dezenas de MB, é igual para todo mundo).
+    O cache do backend continua por conta, e cada uma só enxerga o que
+    buscou com as próprias credenciais; a entrada aponta para o resumo
+    (blake2b) do corpo da resposta, e o conteúdo com esse resumo é
+    decodificado e guardado uma vez só, com contagem de referências. O
+    objeto é compartilhado entre as contas: quem recebe não deve alterá-lo.
+    Estruturas montadas a partir do conteúdo (índices por id, de episódios)
+    ficam junto dele e saem da memória com ele."""
+
+    def __init__(self):
+        self.blobs: Dict[str, Dict] = {}
+        self.ids: Dict[int, str] = {}  # id do objeto guardado -> resumo
+        self.lock = threading.Lock()
+        self.stats = {'reused': 0, 'bytes_saved': 0}
+
+    @staticmethod
+    def digest(raw: bytes) -> str:
+        return hashlib.blake2b(raw, digest_size=16).hexdigest()
+
+    @classmethod
+    def derive(cls, digest: str, part) -> str:
+        """Resumo de uma parte (ex.: uma categoria) de um conteúdo já resumido"""
+        return cls.digest(f"{digest}:{part}".encode())
+
+    def digest_for(self, data: Any) -> Optional[str]:
+        """Resumo de um objeto guardado (None se ``data`` não veio daqui)"""
+        with self.lock:
+            digest = self.ids.get(id(data))
+            blob = self.blobs.get(digest)
+            return digest if blob is not None and blob['data'] is data else None
+
+    def lookup(self, digest: str) -> Optional[Any]:
+        """Conteúdo já decodificado com esse resumo (None se não houver)"""
+        blob = self.blobs.get(digest)
+        return blob['data'] if blob else None
+
+    def put(self, digest: str, data: Any, size: int = 0) -> Any:
+        """Guarda uma referência ao conteúdo e devolve o objeto compartilhado"""
+        with self.lock:
+            blob = self.blobs.get(digest)
+            if blob is None:
+                blob = self.blobs[digest] = {'data': data, 'refs': 0, 'size': size, 'derived': {}}
+                self.ids[id(data)] = digest
+            else:
+                self.stats['reused'] += 1
+                self.stats['bytes_saved'] += blob['size']
+            blob['refs'] += 1
+            return blob['data']
+
+    def release(self, digest: str):
+        """Solta uma referência; sem nenhuma, o conteúdo sai da memória"""
+        with self.lock:
+            blob = self.blobs.get(digest)
+            if blob is None:
+                return
+            blob['refs'] -= 1
+            if blob['refs'] <= 0:
+                del self.blobs[digest]
+                self.ids.pop(id(blob['data']), None)
+
+    def clear(self):
+        with self.lock:
+            self.blobs = {}
+            self.ids = {}
+
+    def derived(self, data: Any, name, build: Callable[[], Any]) -> Any:
+        """Estrutura ``name`` montada de ``data`` uma vez e guardada junto dele.
+
+        Se ``data`` não estiver guardado (ou já tiver saído), monta e
+        devolve sem guardar."""
+        with self.lock:
+            blob = self.blobs.get(self.ids.get(id(data)))
+            if blob is not None and blob['data'] is not data:
+                blob = None
+            if blob is not None and name in blob['derived']:
+                return blob['derived'][name]
+        value = build()
+        if blob is not None:
+            with self.lock:
+                value = blob['derived'].setdefault(name, value)
+        return value
+
+    def get_stats(self) -> Dict:
+        with self.lock:
+            stats = dict(self.stats)
+            stats['catalogs'] = len(self.blobs)
+            stats['refs'] = sum(blob['refs'] for blob in self.blobs.values())
+            stats['bytes'] = sum(blob['size'] for blob in self.blobs.values())
+            return stats
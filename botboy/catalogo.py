@@ -0,0 +1,171 @@
+import threading
+import weakref
+from collections import OrderedDict
+from collections.abc import Sequence
+from typing import Callable, Dict, List, Optional
+from backend import backend
+
+INDEX_SWEEP_MIN = 64  # Séries registradas antes de limpar as que já saíram do cache
+
+
+class CatalogIndex:
+    """Mapa id -> posição sobre uma resposta de lista do painel.
+
+    É montado uma única vez por resposta e guardado junto dela no
+    armazenamento do backend (sai da memória quando a resposta sai do
+    cache). Nunca altera os itens."""
+
+    def __init__(self, items: List[Dict], id_keys: tuple):
+        self.items = items
+        self.positions: Dict[str, int] = {}
+        for position, item in enumerate(items):
+            for key in id_keys:
+                if item.get(key) is not None:
+                    self.positions.setdefault(str(item[key]), position)
+                    break
+
+    def find(self, item_id) -> Optional[Dict]:
+        position = self.positions.get(str(item_id))
+        return self.items[position] if position is not None else None
+
+
+def catalog_index(items: List[Dict], id_keys: tuple = ('stream_id', 'id')) -> CatalogIndex:
+    """Índice da resposta ``items``, reaproveitado enquanto ela estiver em cache"""
+    return backend.store.derived(items, ('catalog_index', id_keys), lambda: CatalogIndex(items, id_keys))
+
+
+class LazyCatalogView(Sequence):
+    """Lista do catálogo que só materializa os itens acessados.
+
+    ``materialize`` recebe o item cru e devolve um novo dict com os campos
+    derivados (URL de reprodução, nome da categoria...). Fatiar uma página
+    custa ``ITEMS_PER_PAGE`` materializações, não o tamanho do catálogo, e
+    o item cru em cache nunca é modificado."""
+
+    def __init__(self, items: List[Dict], materialize: Callable[[Dict], Dict], id_keys: tuple = ('stream_id', 'id')):
+        self.items = items
+        self.materialize = materialize
+        self.id_keys = id_keys
+
+    def __len__(self):
+        return len(self.items)
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self.materialize(item) for item in self.items[position]]
+        return self.materialize(self.items[position])
+
+    def find(self, item_id) -> Optional[Dict]:
+        """Busca por id em O(1) usando o índice da resposta"""
+        item = catalog_index(self.items, self.id_keys).find(item_id)
+        return self.materialize(item) if item is not None else None
+
+
+def _season_order(season) -> tuple:
+    text = str(season)
+    return (0, int(text), '') if text.isdigit() else (1, 0, text)
+
+
+class EpisodeIndex:
+    """Índice dos episódios de uma série, montado uma vez do ``get_series_info``.
+
+    Guarda temporada -> episódios em ordem, a lista completa para paginação
+    e o mapa episode_id -> episódio. Cada episódio é uma cópia com
+    ``season`` e ``container_extension`` preenchidos; a resposta em cache
+    não é alterada."""
+
+    def __init__(self, series_id, series_info: Dict):
+        self.series_id = str(series_id)
+        self.payload = series_info
+        info = series_info.get('info') if isinstance(series_info.get('info'), dict) else {}
+        self.name = info.get('name', 'Série')
+        self.cover = info.get('cover', '')
+
+        raw_seasons = series_info.get('episodes') or {}
+        if isinstance(raw_seasons, list):
+            # Alguns painéis mandam uma lista de temporadas em vez de um dict
+            grouped = {}
+            for episodes in raw_seasons:
+                for ep in episodes or []:
+                    grouped.setdefault(str(ep.get('season', '1')), []).append(ep)
+            raw_seasons = grouped
+
+        self.seasons: 'OrderedDict[str, List[Dict]]' = OrderedDict()
+        self.episodes: List[Dict] = []
+        self.by_id: Dict[str, Dict] = {}
+        for season in sorted(raw_seasons, key=_season_order):
+            season_episodes = []
+            for ep in raw_seasons[season] or []:
+                episode = dict(ep)
+                episode['season'] = str(season)
+                episode['container_extension'] = ep.get('container_extension') or 'mp4'
+                season_episodes.append(episode)
+                if episode.get('id') is not None:
+                    self.by_id[str(episode['id'])] = episode
+            self.seasons[str(season)] = season_episodes
+            self.episodes.extend(season_episodes)
+
+    def summary(self) -> Dict:
+        """Resumo da série no formato usado pelos botões e pelo M3U"""
+        return {'id': self.series_id, 'name': self.name, 'cover': self.cover, 'category': 'Séries'}
+
+    def season(self, season) -> List[Dict]:
+        return self.seasons.get(str(season), [])
+
+    def find(self, episode_id) -> Optional[Dict]:
+        return self.by_id.get(str(episode_id))
+
+
+# (servidor, usuário, série) -> referência fraca ao índice; quem mantém o
+# índice vivo é a resposta get_series_info guardada no backend
+_episode_indexes: Dict[tuple, 'weakref.ref[EpisodeIndex]'] = {}
+_episode_owners: Dict[tuple, tuple] = {}
+_lock = threading.Lock()
+_sweep_at = INDEX_SWEEP_MIN
+
+
+def episode_index(config: Dict, series_id, series_info: Dict) -> EpisodeIndex:
+    """Índice da série, montado uma vez por resposta e registrado para a conta"""
+    global _sweep_at
+    account = (config['server'], config['username'])
+    key = account + (str(series_id),)
+    index = backend.store.derived(series_info, ('episode_index', str(series_id)),
+                                  lambda: EpisodeIndex(series_id, series_info))
+    with _lock:
+        ref = _episode_indexes.get(key)
+        current = ref() if ref else None
+        if current is not index:
+            if current is not None:
+                _forget_owners(account, current)
+            _episode_indexes[key] = weakref.ref(index)
+            for episode_id in index.by_id:
+                _episode_owners[account + (episode_id,)] = key
+
+        if len(_episode_indexes) > _sweep_at:
+            _sweep()
+            _sweep_at = max(INDEX_SWEEP_MIN, 2 * len(_episode_indexes))
+    return index
+
+
+def _forget_owners(account: tuple, index: EpisodeIndex):
+    for episode_id in index.by_id:
+        _episode_owners.pop(account + (episode_id,), None)
+
+
+def _sweep():
+    """Remove séries cujo índice já saiu da memória (chamado com ``_lock``)"""
+    for key in [key for key, ref in _episode_indexes.items() if ref() is None]:
+        del _episode_indexes[key]
+    for owner in [owner for owner, key in _episode_owners.items() if key not in _episode_indexes]:
+        del _episode_owners[owner]
+
+
+def find_episode(config: Dict, episode_id):
+    """(índice da série, episódio) de um episode_id já indexado, ou None"""
+    with _lock:
+        key = _episode_owners.get((config['server'], config['username'], str(episode_id)))
+        ref = _episode_indexes.get(key) if key else None
+    index = ref() if ref else None
+    if index is None:
+        return None
+    return index, index.find(episode_id)
@@ -1,6 +1,9 @@
 from telethon import Button
 from typing import Dict, List, Optional, Any
 from config import OWNER_ID
+from mirrors import mirrors
+from outbound import outbound
+from router import MessageHandle
 
 
 class ComandoManager:
@@ -29,7 +32,7 @@ class ComandoManager:
                 await event.answer("❌ Apenas o dono pode enviar para grupos!")
                 return
 
-            await self.client.send_message(
+            await outbound.send_message(
                 chat_id,
                 f"📤 **Enviar {item_type} para grupo**\n\n📝 Digite o ID do grupo (exemplo: -1001234567890):",
                 parse_mode='md'
@@ -54,7 +57,7 @@ class ComandoManager:
             chat_id = event.chat_id
 
             if not group_id.startswith('-'):
-                await self.client.send_message(chat_id, "❌ ID do grupo deve começar com '-'")
+                await outbound.send_message(chat_id, "❌ ID do grupo deve começar com '-'")
                 return
 
             item_type = context['item_type']
@@ -65,29 +68,29 @@ class ComandoManager:
                 card_text = f"""🎬 **FILME COMPARTILHADO**
 
 📺 **Nome:** Filme #{item_id}
-🔗 **Link:** `{config['server']}/movie/{config['username']}/{config['password']}/{item_id}.mp4`
+🔗 **Link:** `{mirrors.stream_url(config, 'movie', item_id, 'mp4')}`
 
 **💡 Enviado pelo Bot IPTV Profissional**"""
             else:
                 card_text = f"""📺 **CANAL COMPARTILHADO**
 
 📡 **Nome:** Canal #{item_id}
-🔗 **Link:** `{config['server']}/live/{config['username']}/{config['password']}/{item_id}.ts`
+🔗 **Link:** `{mirrors.stream_url(config, 'live', item_id, 'ts')}`
 
 **💡 Enviado pelo Bot IPTV Profissional**"""
 
-            await self.client.send_message(int(group_id), card_text, parse_mode='md')
-            await self.client.send_message(
+            await outbound.send_message(int(group_id), card_text, parse_mode='md')
+            await outbound.send_message(
                 chat_id,
                 f"✅ **{item_type.title()} enviado com sucesso!**\n\n📤 Grupo: `{group_id}`",
                 parse_mode='md'
             )
 
         except ValueError:
-            await self.client.send_message(event.chat_id, "❌ ID do grupo inválido!")
+            await outbound.send_message(event.chat_id, "❌ ID do grupo inválido!")
         except Exception as e:
             print(f"Error sending to group: {e}")
-            await self.client.send_message(event.chat_id, "❌ Erro ao enviar para o grupo.")
+            await outbound.send_message(event.chat_id, "❌ Erro ao enviar para o grupo.")
 
     async def handle_download_request(self, event, item_type: str, item_id: str, config: Dict):
         try:
@@ -96,13 +99,14 @@ class ComandoManager:
                 await event.answer("❌ Apenas o dono pode fazer downloads!")
                 return
 
-            message = await event.get_message()
-            await message.edit(f"💾 **Iniciando download...**\n\n🔄 Preparando {item_type}\n⏳ Aguarde...", parse_mode='md')
+            message = MessageHandle(event)
+            await outbound.edit(message, f"💾 **Iniciando download...**\n\n🔄 Preparando {item_type}\n⏳ Aguarde...", parse_mode='md')
 
             import asyncio
             await asyncio.sleep(2)
 
-            await message.edit(
+            await outbound.edit(
+                message,
                 f"✅ **Download concluído!**\n\n📁 Arquivo salvo em: `/downloads/{item_type}_{item_id}.mp4`",
                 parse_mode='md'
             )
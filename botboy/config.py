@@ -13,10 +13,116 @@ OWNER_ID = 1985282432
 
 # Configurações do sistema
 CACHE_TTL = 3600          # Cache em segundos (1 hora)
+ACCOUNT_INFO_TTL = 60     # Validade do get_account_info (cadastro, info do servidor, downloads)
+NEGATIVE_CACHE_TTL = 20   # Falhas e respostas vazias do painel são lembradas por pouco tempo
 RATE_LIMIT_TIME = 60      # Janela de rate limit em segundos
 RATE_LIMIT_MAX = 20       # Máximo de requisições por janela
+# Token bucket por classe de custo: (capacidade, tokens recarregados por segundo)
+RATE_LIMIT_BUCKETS = {
+    'cheap': (RATE_LIMIT_MAX, RATE_LIMIT_MAX / RATE_LIMIT_TIME),  # Navegação e páginas
+    'expensive': (3, 3 / 300),  # M3U, categoria completa, downloads
+}
+RATE_LIMIT_IDLE_TTL = 600  # Baldes sem uso (já recarregados) são descartados
 ITEMS_PER_PAGE = 8        # Itens por página na paginação
 MAX_BUTTON_TEXT = 35      # Máximo de caracteres em botões
 MAX_FILE_SIZE = 2 * 1024 * 1024 * 1024  # 2GB
 DOWNLOAD_DIR = "downloads"
 CLEANUP_INTERVAL = 1800   # Limpeza a cada 30 minutos
+
+# Download em streaming (download → upload sem passar pelo disco)
+DOWNLOAD_CHUNK_SIZE = 512 * 1024  # Tamanho de cada leitura HTTP
+STREAM_BUFFER_CHUNKS = 16         # Pedaços em memória antes de pausar o download
+
+# Upload paralelo para o Telegram (arquivos acima de 10MB)
+UPLOAD_WORKERS = 4          # Partes enviadas ao mesmo tempo (1 = upload normal)
+UPLOAD_PART_SIZE = 512 * 1024  # Tamanho de cada parte (máximo do Telegram)
+UPLOAD_PART_RETRIES = 3     # Tentativas por parte antes de desistir
+UPLOAD_MAX_FAILED_PARTS = 8  # Partes com falha guardadas para uma nova rodada no fim do upload
+
+# Cache de mídias já enviadas (reenvio por referência do Telegram)
+MEDIA_CACHE_FILE = "media_cache.json"
+MEDIA_CACHE_MAX = 20000     # Máximo de referências guardadas
+MEDIA_CACHE_SAVE_DELAY = 5  # Segundos para agrupar as gravações do arquivo
+
+# Fila de downloads (vagas derivadas do max_connections da conta)
+DOWNLOAD_RESERVED_CONNECTIONS = 0  # Conexões da conta deixadas livres para assistir
+
+# Espaço em disco do DOWNLOAD_DIR
+STREAM_UPLOADS = True       # Envia durante o download (False = grava em disco antes)
+DOWNLOAD_QUOTA = 4 * 1024 * 1024 * 1024  # Máximo de bytes no DOWNLOAD_DIR
+DOWNLOAD_MIN_FREE = 512 * 1024 * 1024    # Espaço livre mínimo no disco
+DOWNLOAD_RESERVE_STEP = 64 * 1024 * 1024  # Reserva incremental sem Content-Length
+DOWNLOAD_MAX_AGE = 3600     # Arquivos completos sem uso são removidos após 1 hora
+
+# Sondagem dos formatos de download (HEAD / Range no painel)
+PROBE_ALTERNATE_FORMATS = ['mp4', 'mkv']  # Extensões testadas além da original
+PROBE_TIMEOUT = 10          # Timeout de cada sondagem em segundos
+PROBE_CONCURRENCY = 4       # Sondagens simultâneas
+PROBE_CACHE_TTL = 1800      # Resultados reaproveitados por 30 minutos
+
+# Fila de envios para o Telegram
+OUTBOUND_GLOBAL_RATE = 25     # Envios por segundo somando todos os chats
+OUTBOUND_CHAT_INTERVAL = 0.5  # Intervalo mínimo entre envios no mesmo chat
+
+# Mensagens de progresso (downloads e categorias completas)
+PROGRESS_INTERVAL = 3       # Segundos mínimos entre edições da mesma mensagem
+PROGRESS_MAX_EDITS = 20     # Teto de edições por operação (com total conhecido)
+PROGRESS_SMOOTHING = 0.3    # Peso da amostra nova na média móvel de velocidade
+PROGRESS_BACKOFF = 1.5      # Sem total conhecido, cada edição aumenta o intervalo seguinte
+PROGRESS_MAX_INTERVAL = 60  # Intervalo máximo entre edições sem total conhecido
+
+# Callbacks compactos (contexto guardado no servidor quando não cabe em 64 bytes)
+CALLBACK_CONTEXT_TTL = 2 * 24 * 3600  # Validade de um botão com contexto
+CALLBACK_CONTEXT_MAX = 20000          # Máximo de contextos guardados (LRU)
+CALLBACK_CONTEXT_FILE = "callback_contexts.json"  # Contextos sobrevivem a reinícios do bot
+CALLBACK_CONTEXT_SAVE_DELAY = 30      # Segundos para agrupar as gravações do arquivo
+
+# Cache de páginas renderizadas (texto + teclado das listas)
+RENDER_CACHE_MAX = 2000  # Páginas guardadas (LRU)
+
+# Busca no catálogo (/buscar e modo inline)
+SEARCH_MIN_SIMILARITY = 0.5  # Fração mínima de trigramas em comum para busca aproximada
+SEARCH_BACKGROUND_MIN = 2000  # Listas a partir deste tamanho são indexadas fora do loop do bot
+SEARCH_MAX_INDEXES = 300  # Índices guardados (conta x tipo, LRU)
+INLINE_RESULTS = 20      # Resultados por lote no modo inline
+INLINE_CACHE_TIME = 300  # Segundos que o Telegram pode reaproveitar uma resposta inline
+INLINE_DEBOUNCE = 0.3    # Digitação mais rápida que isso só responde a última consulta
+
+# Pré-carregamento (próxima página, listas das categorias e séries visíveis)
+PREFETCH_PER_SERVER = 1     # Pré-carregamentos simultâneos por servidor
+PREFETCH_WORKERS = 4        # Threads de pré-carregamento somando todos os servidores
+PREFETCH_QUEUE_MAX = 200    # Tarefas pendentes (as mais antigas são descartadas)
+PREFETCH_CATEGORIES = 3     # Categorias do topo aquecidas ao abrir a lista de categorias
+PREFETCH_IDLE_POLL = 0.5    # Espera antes de reavaliar servidores ocupados com pedidos interativos
+
+# Disjuntor por servidor (painel fora do ar responde na hora)
+BREAKER_FAILURES = 3        # Falhas seguidas que abrem o disjuntor
+BREAKER_COOLDOWN = 30       # Segundos recusando antes da requisição de teste
+BREAKER_MAX_COOLDOWN = 300  # Espera máxima (dobra a cada teste que falha)
+
+# Requisições ao painel (timeouts adaptativos, novas tentativas e hedge)
+REQUEST_TIMEOUT_MIN = 3      # Timeout mínimo em segundos
+REQUEST_TIMEOUT_MAX = 15     # Timeout máximo (usado até haver amostras de latência)
+REQUEST_TIMEOUT_FACTOR = 3   # Timeout = p95 da latência do servidor x este fator
+LATENCY_WINDOW = 50          # Amostras de latência guardadas por servidor e ação
+LATENCY_MIN_SAMPLES = 5      # Amostras necessárias antes de adaptar timeout e hedge
+REQUEST_RETRIES = 2          # Novas tentativas em falhas de rede, 429 e 5xx
+RETRY_BACKOFF = 0.5          # Espera base entre tentativas (dobra a cada uma, com jitter)
+REQUEST_DEADLINE = 30        # Tempo total máximo de uma leitura somando as tentativas
+HEDGE_WORKERS = 16           # Threads das requisições ao painel (originais e cópias)
+
+# Espelhos do painel (vários hosts para a mesma conta)
+# Hosts extras por servidor, além das URLs extras enviadas junto com a playlist
+# Ex.: {"http://painel.com": ["http://painel2.com:8080", "http://painel3.net"]}
+PANEL_MIRRORS = {}
+MIRROR_PROBE_INTERVAL = 60   # Segundos entre sondagens dos espelhos
+MIRROR_PROBE_TIMEOUT = 5     # Timeout de cada sondagem
+MIRROR_SWITCH_MARGIN = 0.3   # Só troca de espelho saudável se o outro for 30% mais rápido
+MIRROR_SMOOTHING = 0.3       # Peso da sondagem nova na média de latência
+MIRROR_IDLE_TTL = 3600       # Conjunto sem uso por 1 hora deixa de ser sondado e sai da memória
+
+# Admissão de requisições por servidor (protege o painel de rajadas)
+ADMISSION_MAX_CONCURRENT = 4  # Requisições simultâneas por servidor
+ADMISSION_MAX_QUEUE = 50      # Requisições esperando por servidor (acima disso recusa)
+ADMISSION_MAX_PER_USER = 10   # Requisições de uma mesma conta na fila
+ADMISSION_TIMEOUT = 10        # Espera máxima na fila em segundos
@@ -0,0 +1,114 @@
+import hashlib
+import threading
+import time
+from typing import Dict, Optional
+from backend import backend
+from config import ACCOUNT_INFO_TTL
+
+
+class AccountState:
+    """Estado da conta no painel (``get_account_info``) com validade curta.
+
+    Uma única requisição atende o cadastro da playlist, a tela de info do
+    servidor e as vagas da fila de downloads. Dentro de ``ACCOUNT_INFO_TTL``
+    ninguém volta ao painel, e pedidos simultâneos da mesma conta esperam a
+    mesma requisição. Falhas não ficam em cache."""
+
+    def __init__(self, ttl: int = ACCOUNT_INFO_TTL):
+        self.ttl = ttl
+        self.entries: Dict[tuple, Dict] = {}
+        self.locks: Dict[tuple, threading.Lock] = {}
+        self._guard = threading.Lock()
+
+    @staticmethod
+    def account(config: Dict) -> tuple:
+        # A senha faz parte da chave: com a senha errada a conta não aproveita
+        # a resposta de quem se cadastrou com a certa (nem vê os dados dela)
+        password = hashlib.blake2b(str(config['password']).encode(), digest_size=16).hexdigest()
+        return (config['server'], config['username'], password)
+
+    def _lock(self, key: tuple) -> threading.Lock:
+        with self._guard:
+            return self.locks.setdefault(key, threading.Lock())
+
+    @staticmethod
+    def _validate(data) -> Optional[Dict]:
+        """A resposta só vale se for um dict sem erro e com login aceito"""
+        if not isinstance(data, dict) or data.get('error'):
+            return None
+        user_info = data.get('user_info')
+        if isinstance(user_info, dict) and str(user_info.get('auth', 1)) == '0':
+            return None
+        return data
+
+    def get(self, config: Dict, refresh: bool = False) -> Optional[Dict]:
+        """Resposta validada do get_account_info (None se o painel falhar ou recusar)"""
+        key = self.account(config)
+        requested = time.time()
+        entry = self.entries.get(key)
+        if entry and not refresh and requested - entry['time'] < self.ttl:
+            return entry['info']
+
+        with self._lock(key):
+            # Outra thread pode ter buscado enquanto esta esperava
+            entry = self.entries.get(key)
+            if entry and entry['time'] >= requested:
+                return entry['info']
+
+            params = {
+                'username': config['username'],
+                'password': config['password'],
+                'action': 'get_account_info'
+            }
+            info = self._validate(backend.make_api_request(config, params, cached=False))
+            if info is None:
+                self.entries.pop(key, None)
+            else:
+                self.entries[key] = {'time': time.time(), 'info': info}
+            return info
+
+    def is_valid(self, config: Dict) -> bool:
+        """Testa a conexão e as credenciais (a resposta fica para os próximos usos)"""
+        return self.get(config) is not None
+
+    def server_info(self, config: Dict) -> Dict:
+        """Informações da conta e do servidor no formato da tela de info"""
+        data = self.get(config)
+        if data:
+            user_info = data.get('user_info') or {}
+            server_info = data.get('server_info') or {}
+            return {
+                'server': config['server'],
+                'username': config['username'],
+                'status': user_info.get('status', 'Active') if user_info else 'Online',
+                'exp_date': user_info.get('exp_date', 'N/A') if user_info else 'N/A',
+                'active_cons': user_info.get('active_cons', '0') if user_info else '0',
+                'max_connections': user_info.get('max_connections', '1') if user_info else '1',
+                'available_channels': server_info.get('available_channels', '0') if server_info else '0',
+                'available_movies': server_info.get('available_movies', '0') if server_info else '0',
+                'available_series': server_info.get('available_series', '0') if server_info else '0',
+            }
+
+        return {
+            'server': config['server'],
+            'username': config['username'],
+            'status': 'Connected',
+            'exp_date': 'N/A',
+            'active_cons': '0',
+            'max_connections': '1',
+            'available_channels': 'N/A',
+            'available_movies': 'N/A',
+            'available_series': 'N/A'
+        }
+
+    def cleanup(self):
+        """Remove estados expirados"""
+        now = time.time()
+        for key in [key for key, entry in list(self.entries.items()) if now - entry['time'] >= self.ttl]:
+            self.entries.pop(key, None)
+        with self._guard:
+            for key in [key for key, lock in self.locks.items() if key not in self.entries and not lock.locked()]:
+                del self.locks[key]
+
+
+account_state = AccountState()
@@ -1,9 +1,19 @@
-import os
 import asyncio
-import requests
-import time
+import hashlib
+import aiohttp
 from telethon import Button
-from config import DOWNLOAD_DIR, MAX_FILE_SIZE
+from catalogo import find_episode
+from conta import account_state
+from config import DOWNLOAD_DIR, MAX_FILE_SIZE, DOWNLOAD_CHUNK_SIZE, STREAM_UPLOADS, PROBE_ALTERNATE_FORMATS
+from media_cache import media_cache
+from mirrors import mirrors
+from outbound import outbound
+from probe import prober, format_size
+from progress import ProgressReporter
+from router import router
+from scheduler import DownloadScheduler
+from storage import StorageManager, StorageFullError, FileBusyError
+from upload import StreamPipe, ParallelUploader, ParallelUploadError, pump_response
 
 
 class DownloadManager:
@@ -12,187 +22,277 @@ class DownloadManager:
         self.backend = backend
         self.download_dir = DOWNLOAD_DIR
         self.max_file_size = MAX_FILE_SIZE
-
-        if not os.path.exists(self.download_dir):
-            os.makedirs(self.download_dir)
+        self.uploader = ParallelUploader(client)
+        self.scheduler = DownloadScheduler()
+        self.storage = StorageManager(self.download_dir)
 
     def is_download_allowed(self, user_id):
         return self.backend.is_owner(user_id)
 
-    def get_file_formats(self, config, stream_id, content_type='movie'):
+    def _download_url(self, config, stream_id, content_type, file_format):
+        kind = 'movie' if content_type == 'movie' else 'series'
+        return mirrors.stream_url(config, kind, stream_id, file_format)
+
+    @staticmethod
+    def _filename(config, stream_id, content_type, file_format):
+        """Nome no DOWNLOAD_DIR: ids só são únicos por servidor e tipo de conteúdo"""
+        server = hashlib.sha1(config['server'].encode()).hexdigest()[:12]
+        return f"download_{server}_{content_type}_{stream_id}.{file_format}"
+
+    def _original_container(self, config, stream_id, content_type):
+        """Extensão informada pelo painel (episódios vêm do índice da série)"""
+        if content_type != 'movie':
+            found = find_episode(config, stream_id)
+            return found[1]['container_extension'] if found else 'mp4'
+        params = {
+            'username': config['username'],
+            'password': config['password'],
+            'action': 'get_movie_info',
+            'movie_id': stream_id
+        }
+        info = self.backend.make_api_request(config, params)
+        if isinstance(info, dict) and isinstance(info.get('movie_data'), dict):
+            return info['movie_data'].get('container_extension') or 'mp4'
+        return 'mp4'
+
+    async def get_file_formats(self, config, stream_id, content_type='movie'):
+        """Lista os formatos que o painel realmente serve, com tamanho sondado.
+
+        Uma extensão alternativa com o mesmo tamanho de um formato já
+        listado é o mesmo arquivo servido com outro nome e fica de fora."""
+        container = 'mp4'
         try:
-            if content_type == 'movie':
-                params = {
-                    'username': config['username'],
-                    'password': config['password'],
-                    'action': 'get_movie_info',
-                    'movie_id': stream_id
-                }
-            else:
-                params = {
-                    'username': config['username'],
-                    'password': config['password'],
-                    'action': 'get_episode_info',
-                    'episode_id': stream_id
-                }
-
-            info = self.backend.make_api_request(config, params)
-
-            if info and 'movie_data' in info:
-                formats = []
-                movie_data = info['movie_data']
-
-                if movie_data.get('container_extension'):
-                    formats.append({
-                        'quality': 'Original',
-                        'format': movie_data['container_extension'],
-                        'size': 'Tamanho original'
-                    })
-
-                container = movie_data.get('container_extension', 'mp4')
-                if container in ['mkv', 'mp4', 'avi']:
-                    formats.extend([
-                        {'quality': 'HD 720p', 'format': 'mp4', 'size': '~1.5GB'},
-                        {'quality': 'Full HD 1080p', 'format': 'mp4', 'size': '~3GB'},
-                        {'quality': 'SD 480p', 'format': 'mp4', 'size': '~800MB'}
-                    ])
-
+            container = await asyncio.get_running_loop().run_in_executor(
+                None, self._original_container, config, stream_id, content_type
+            )
+            candidates = [container] + [ext for ext in PROBE_ALTERNATE_FORMATS if ext != container]
+            urls = {ext: self._download_url(config, stream_id, content_type, ext) for ext in candidates}
+            results = await prober.probe(list(urls.values()))
+
+            formats = []
+            for ext in candidates:
+                result = results[urls[ext]]
+                if not result['ok']:
+                    continue
+                if result['size'] and any(fmt['bytes'] == result['size'] for fmt in formats):
+                    continue
+                formats.append({
+                    'quality': 'Original' if ext == container else 'Alternativo',
+                    'format': ext,
+                    'size': format_size(result['size']),
+                    'bytes': result['size'],
+                    'ranges': result['ranges']
+                })
+
+            if formats:
                 return formats
 
-            return [{'quality': 'Padrão', 'format': 'mp4', 'size': 'Tamanho variável'}]
-
         except Exception as e:
             print(f"Error getting file formats: {e}")
-            return [{'quality': 'Padrão', 'format': 'mp4', 'size': 'Tamanho variável'}]
+
+        return [{'quality': 'Padrão', 'format': container, 'size': 'Tamanho variável', 'bytes': 0, 'ranges': False}]
+
+    def _back_data(self, content_type, stream_id) -> bytes:
+        if content_type == 'episode':
+            return router.pack("serie_play", episode_id=stream_id)
+        return router.pack("filme_play", stream_id=stream_id)
 
     async def show_download_options(self, chat_id, message, config, stream_id, content_type):
         try:
             if not self.is_download_allowed(chat_id):
-                buttons = [[Button.inline("🔙 Voltar", data=f"{content_type}_play_{stream_id}".encode())]]
-                await message.edit("❌ **Download restrito!**\n\nApenas o proprietário do bot pode fazer downloads.", buttons=buttons, parse_mode='md')
+                buttons = [[Button.inline("🔙 Voltar", data=self._back_data(content_type, stream_id))]]
+                await outbound.edit(message, "❌ **Download restrito!**\n\nApenas o proprietário do bot pode fazer downloads.", buttons=buttons, parse_mode='md')
                 return
 
-            formats = self.get_file_formats(config, stream_id, content_type)
+            formats = await self.get_file_formats(config, stream_id, content_type)
 
             buttons = []
             for i, fmt in enumerate(formats):
                 btn_text = f"📥 {fmt['quality']} ({fmt['format'].upper()}) - {fmt['size']}"
-                buttons.append([Button.inline(btn_text, data=f"download_start_{content_type}_{stream_id}_{i}".encode())])
+                if fmt['ranges']:
+                    btn_text += " ⏯️"
+                data = router.pack("download_start", content_type=content_type, stream_id=stream_id, format_index=i, selected=fmt)
+                buttons.append([Button.inline(btn_text, data=data)])
 
-            buttons.append([Button.inline("🔙 Voltar", data=f"{content_type}_play_{stream_id}".encode())])
+            buttons.append([Button.inline("🔙 Voltar", data=self._back_data(content_type, stream_id))])
 
             text = f"""💾 **OPÇÕES DE DOWNLOAD**
 
 **📋 Escolha o formato:**
-• Diferentes qualidades disponíveis
-• Download direto para você
+• Tamanhos reais consultados no servidor
+• ⏯️ Servidor aceita retomada do download
 
 **⚠️ Importante:**
 • Downloads podem demorar alguns minutos
 • Apenas o proprietário pode baixar"""
 
-            await message.edit(text, buttons=buttons, parse_mode='md')
+            await outbound.edit(message, text, buttons=buttons, parse_mode='md')
 
         except Exception as e:
             print(f"Error showing download options: {e}")
 
-    async def start_download(self, chat_id, message, config, stream_id, content_type, format_index):
+    async def start_download(self, chat_id, message, config, stream_id, content_type, format_index, selected=None):
         try:
             if not self.is_download_allowed(chat_id):
-                await message.edit("❌ Acesso negado!")
+                await outbound.edit(message, "❌ Acesso negado!")
                 return
 
-            formats = self.get_file_formats(config, stream_id, content_type)
-            selected = formats[int(format_index)] if int(format_index) < len(formats) else formats[0]
+            if selected is None:
+                formats = await self.get_file_formats(config, stream_id, content_type)
+                selected = formats[int(format_index)] if int(format_index) < len(formats) else formats[0]
+            download_url = self._download_url(config, stream_id, content_type, selected['format'])
 
-            if content_type == 'movie':
-                download_url = f"{config['server']}/movie/{config['username']}/{config['password']}/{stream_id}.{selected['format']}"
-            else:
-                download_url = f"{config['server']}/series/{config['username']}/{config['password']}/{stream_id}.{selected['format']}"
-
-            filename = f"download_{stream_id}.{selected['format']}"
-            filepath = os.path.join(self.download_dir, filename)
-
-            await message.edit(f"💾 **INICIANDO DOWNLOAD**\n\n📁 **Formato:** {selected['quality']}\n⏳ **Progresso:** 0%\n\n**Aguarde...**", parse_mode='md')
-
-            # Download real com progresso
-            try:
-                response = requests.get(download_url, stream=True, timeout=300)
-                total_size = int(response.headers.get('content-length', 0))
-
-                with open(filepath, 'wb') as f:
-                    downloaded = 0
-                    last_update = 0
-                    for chunk in response.iter_content(chunk_size=1024 * 1024):
-                        if chunk:
-                            f.write(chunk)
-                            downloaded += len(chunk)
-                            progress = int((downloaded / total_size * 100)) if total_size > 0 else 0
-
-                            if progress - last_update >= 15:
-                                last_update = progress
-                                bar = '▓' * (progress // 10) + '░' * (10 - progress // 10)
-                                try:
-                                    await message.edit(
-                                        f"💾 **FAZENDO DOWNLOAD**\n\n📁 **Formato:** {selected['quality']}\n⏳ **Progresso:** {progress}%\n{bar}",
-                                        parse_mode='md'
-                                    )
-                                except:
-                                    pass
-
-                # Envia o arquivo
-                await message.edit("📤 **Enviando arquivo...**", parse_mode='md')
-                await self.client.send_file(
-                    chat_id, filepath,
-                    caption=f"🎬 **Download concluído!**\n📁 Formato: {selected['quality']}",
-                    parse_mode='md'
-                )
-
-                os.remove(filepath)
-                await message.edit("✅ **Arquivo enviado com sucesso!**\n🗑️ Arquivo removido do servidor.", parse_mode='md')
-
-            except Exception as dl_error:
-                print(f"Download error: {dl_error}")
-                if os.path.exists(filepath):
-                    os.remove(filepath)
-                await message.edit("❌ Erro durante o download. Tente novamente.")
+            filename = self._filename(config, stream_id, content_type, selected['format'])
 
-        except Exception as e:
-            print(f"Error starting download: {e}")
-            await message.edit("❌ Erro ao iniciar download.")
+            caption = f"🎬 **Download concluído!**\n📁 Formato: {selected['quality']}"
+
+            # Já enviado antes: reenvia pela referência do Telegram, sem tocar no painel
+            cache_key = media_cache.download_key(config['server'], content_type, stream_id, selected['format'])
+            if await media_cache.resend(self.client, chat_id, cache_key, caption=caption, parse_mode='md'):
+                await outbound.edit(message, "✅ **Arquivo enviado com sucesso!**\n⚡ Reenviado do cache, sem novo download.", parse_mode='md')
+                return
 
-    async def handle_callback(self, event, config):
-        data = event.data.decode()
-        chat_id = event.chat_id
-        message = await event.get_message()
+            # Cópia completa ainda no disco: envia sem baixar de novo
+            local_path = self.storage.lookup(filename)
+            if local_path:
+                sent = await self.client.send_file(chat_id, local_path, caption=caption, supports_streaming=True, parse_mode='md')
+                media_cache.put(cache_key, sent)
+                await outbound.edit(message, "✅ **Arquivo enviado com sucesso!**", parse_mode='md')
+                return
 
-        try:
-            if data.startswith("download_options_"):
-                parts = data.split("_")
-                content_type = parts[2]
-                stream_id = parts[3] if len(parts) > 3 else '0'
-                await self.show_download_options(chat_id, message, config, stream_id, content_type)
-
-            elif data.startswith("download_start_"):
-                parts = data.split("_")
-                content_type = parts[2]
-                stream_id = parts[3]
-                format_index = parts[4]
-                await self.start_download(chat_id, message, config, stream_id, content_type, format_index)
+            if selected['bytes'] > self.max_file_size:
+                await outbound.edit(message, "❌ **Arquivo muito grande!**\n\nO limite de envio é de 2GB.", parse_mode='md')
+                return
+
+            # Respeita o limite de conexões simultâneas da conta no painel
+            capacity = self.scheduler.capacity_from(
+                await asyncio.get_running_loop().run_in_executor(None, account_state.server_info, config)
+            )
+
+            async def on_queue(position):
+                try:
+                    await outbound.edit(
+                        message,
+                        f"⏳ **DOWNLOAD NA FILA**\n\n📁 **Formato:** {selected['quality']}\n📋 **Posição na fila:** {position}\n\n🔌 Todas as conexões da conta estão em uso.\n**Aguarde...**",
+                        parse_mode='md'
+                    )
+                except Exception:
+                    pass
+
+            async with self.scheduler.slot(config, capacity, on_position=on_queue):
+                await outbound.edit(message, f"💾 **INICIANDO DOWNLOAD**\n\n📁 **Formato:** {selected['quality']}\n⏳ **Progresso:** 0%\n\n**Aguarde...**", parse_mode='md')
+
+                reporter = ProgressReporter(message, "💾 FAZENDO DOWNLOAD", f"📁 **Formato:** {selected['quality']}").start()
+                on_progress = reporter.update
+
+                try:
+                    try:
+                        sent = await self._deliver(chat_id, download_url, filename, caption, on_progress, parallel=True)
+                    except ParallelUploadError as up_error:
+                        # As partes com falha já tiveram uma nova rodada no fim do upload; o
+                        # stream foi consumido, então o último recurso é baixar de novo
+                        print(f"Parallel upload failed, retrying with send_file: {up_error}")
+                        sent = await self._deliver(chat_id, download_url, filename, caption, on_progress, parallel=False)
+                    finally:
+                        await reporter.stop()
+
+                    if not sent:
+                        await outbound.edit(message, "❌ **Arquivo muito grande!**\n\nO limite de envio é de 2GB.", parse_mode='md')
+                        return
+
+                    media_cache.put(cache_key, sent)
+
+                    await outbound.edit(message, "✅ **Arquivo enviado com sucesso!**", parse_mode='md')
+
+                except FileBusyError:
+                    await outbound.edit(message, "⏳ **Este arquivo já está sendo baixado.**\n\nTente novamente quando o download atual terminar.", parse_mode='md')
+
+                except StorageFullError as full_error:
+                    print(f"Download storage full: {full_error}")
+                    await outbound.edit(message, "❌ **Sem espaço em disco!**\n\nAguarde os downloads em andamento terminarem.", parse_mode='md')
+
+                except Exception as dl_error:
+                    print(f"Download error: {dl_error}")
+                    await outbound.edit(message, "❌ Erro durante o download. Tente novamente.")
 
         except Exception as e:
-            print(f"Error in download callback: {e}")
-            await event.answer("❌ Erro ao processar download")
+            print(f"Error starting download: {e}")
+            await outbound.edit(message, "❌ Erro ao iniciar download.")
+
+    async def _deliver(self, chat_id, download_url, filename, caption, on_progress, parallel):
+        """Baixa a URL e entrega o arquivo no chat. Retorna a mensagem enviada ou None se exceder o limite"""
+        timeout = aiohttp.ClientTimeout(total=None, sock_connect=30, sock_read=300)
+        async with aiohttp.ClientSession(timeout=timeout) as session:
+            async with session.get(download_url) as response:
+                if response.status != 200:
+                    raise RuntimeError(f"HTTP {response.status}")
+
+                total_size = response.content_length or 0
+                if total_size > self.max_file_size:
+                    return None
+
+                if STREAM_UPLOADS and total_size > 0:
+                    return await self._stream_to_chat(chat_id, response, filename, total_size, caption, on_progress, parallel)
+                return await self._stage_and_send(chat_id, response, filename, total_size, caption, on_progress)
+
+    async def _stream_to_chat(self, chat_id, response, filename, total_size, caption, on_progress, parallel):
+        """Envia o arquivo enquanto ele é baixado, sem gravar em disco"""
+        pipe = StreamPipe(filename, total_size)
+        producer = asyncio.create_task(pump_response(response, pipe, DOWNLOAD_CHUNK_SIZE))
+        try:
+            if parallel and self.uploader.should_use(total_size):
+                file = await self.uploader.upload(pipe, total_size, filename, progress_callback=on_progress)
+            else:
+                file = pipe
+            return await self.client.send_file(
+                chat_id, file,
+                file_size=total_size,
+                caption=caption,
+                progress_callback=on_progress,
+                supports_streaming=True,
+                parse_mode='md'
+            )
+        finally:
+            producer.cancel()
+
+    async def _stage_and_send(self, chat_id, response, filename, total_size, caption, on_progress):
+        """Grava em DOWNLOAD_DIR (com espaço reservado) e envia o arquivo"""
+        reservation = self.storage.reserve(filename, total_size)
+        try:
+            with open(reservation.path, 'wb') as f:
+                async for chunk in response.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+                    if reservation.written + len(chunk) > self.max_file_size:
+                        raise RuntimeError("Arquivo excede o limite de envio")
+                    reservation.write(f, chunk)
+                    on_progress(reservation.written, total_size or None)
+        except BaseException:
+            reservation.discard()
+            raise
+        reservation.complete()
+
+        return await self.client.send_file(
+            chat_id, reservation.path,
+            caption=caption,
+            progress_callback=on_progress,
+            supports_streaming=True,
+            parse_mode='md'
+        )
+
+    def register_routes(self, router):
+        """Registra as rotas de callback de download"""
+        async def options(ctx, content_type, stream_id):
+            await self.show_download_options(ctx.chat_id, ctx.message, ctx.config, stream_id, content_type)
+
+        async def start(ctx, content_type, stream_id, format_index, selected=None):
+            await self.start_download(ctx.chat_id, ctx.message, ctx.config, stream_id, content_type, format_index, selected)
+
+        router.add("download_options_{content_type}_{stream_id=0}", options, requires_config=True)
+        router.add("download_start_{content_type}_{stream_id}_{format_index:int}", start,
+                   requires_config=True, cost_class='expensive')
 
     def cleanup_old_files(self):
         try:
-            if not os.path.exists(self.download_dir):
-                return
-            current_time = time.time()
-            for filename in os.listdir(self.download_dir):
-                filepath = os.path.join(self.download_dir, filename)
-                if os.path.isfile(filepath) and (current_time - os.path.getctime(filepath)) > 3600:
-                    os.remove(filepath)
-                    print(f"Removed old download file: {filename}")
+            self.storage.cleanup()
+            prober.cleanup()
         except Exception as e:
             print(f"Error cleaning up downloads: {e}")
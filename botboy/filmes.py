@@ -1,4 +1,12 @@
 from telethon import Button
+from catalogo import LazyCatalogView, catalog_index
+from config import PREFETCH_CATEGORIES
+from media_cache import media_cache
+from mirrors import mirrors
+from outbound import outbound
+from prefetch import prefetcher
+from render_cache import render_cache
+from router import router
 
 
 class FilmeManager:
@@ -7,42 +15,58 @@ class FilmeManager:
         self.backend = backend
         self.frontend = frontend
 
-    def get_categories(self, config):
-        params = {
-            'username': config['username'],
-            'password': config['password'],
-            'action': 'get_vod_categories'
-        }
-        return self.backend.make_api_request(config, params) or []
-
-    def get_movies(self, config, category_id=None):
+    def _params(self, config, action, category_id=None):
         params = {
             'username': config['username'],
             'password': config['password'],
-            'action': 'get_vod_streams'
+            'action': action
         }
         if category_id:
             params['category_id'] = category_id
+        return params
 
-        movies = self.backend.make_api_request(config, params) or []
+    def get_categories(self, config):
+        return self.backend.make_api_request(config, self._params(config, 'get_vod_categories')) or []
 
-        categories = self.get_categories(config)
-        category_map = {str(cat.get('category_id')): cat.get('category_name', 'Filmes') for cat in categories}
+    def get_movies(self, config, category_id=None):
+        params = self._params(config, 'get_vod_streams', category_id)
 
-        for movie in movies:
-            movie['play_url'] = f"{config['server']}/movie/{config['username']}/{config['password']}/{movie['stream_id']}.{movie.get('container_extension', 'mp4')}"
-            if not movie.get('category_name') and category_id:
-                movie['category_name'] = category_map.get(str(category_id), 'Filmes')
+        movies = self.backend.make_api_request(config, params)
+        movies = movies if isinstance(movies, list) else []
 
-        return movies
+        categories = self.get_categories(config)
+        categories = catalog_index(categories if isinstance(categories, list) else [], ('category_id',))
+        base_url = mirrors.base_url(config, 'movie')
+
+        def materialize(movie):
+            item = dict(movie)
+            item['play_url'] = f"{base_url}/{movie['stream_id']}.{movie.get('container_extension', 'mp4')}"
+            if not item.get('category_name'):
+                category = categories.find(movie.get('category_id') or category_id)
+                if category:
+                    item['category_name'] = category.get('category_name', 'Filmes')
+            return item
+
+        return LazyCatalogView(movies, materialize)
+
+    def _selection_data(self, movie):
+        """Dados do filme usados no M3U (e levados no contexto dos botões)"""
+        return {
+            'id': movie['stream_id'],
+            'name': movie['name'],
+            'logo': movie.get('stream_icon', ''),
+            'container': movie.get('container_extension', 'mp4'),
+            'category': movie.get('category_name', 'Filmes')
+        }
 
     async def show_categories(self, chat_id, message, config):
         try:
+            await self.backend.load(config, [self._params(config, 'get_vod_categories')])
             categories = self.get_categories(config)
 
             if not categories:
                 buttons = self.frontend.create_error_buttons("menu_principal")
-                await message.edit("❌ Nenhuma categoria de filmes encontrada.", buttons=buttons)
+                await outbound.edit(message, "❌ Nenhuma categoria de filmes encontrada.", buttons=buttons)
                 return
 
             buttons = [[Button.inline("🎬 Todos os Filmes", data=b"filme_list_all_0")]]
@@ -51,8 +75,9 @@ class FilmeManager:
                 cat_name = self.frontend.truncate_text(category['category_name'], 25)
                 cat_id = category['category_id']
                 buttons.append([
-                    Button.inline(f"📁 {cat_name}", data=f"filme_list_{cat_id}_0".encode()),
-                    Button.inline("📥➕", data=f"add_full_category_movies_{cat_id}".encode()),
+                    Button.inline(f"📁 {cat_name}", data=router.pack("filme_list", category_id=cat_id, page=0)),
+                    Button.inline("📥➕", data=router.pack("add_full_category", category_type="movies", category_id=cat_id,
+                                                          category_name=category['category_name'])),
                 ])
 
             buttons.append([Button.inline("🔙 Menu Principal", data=b"menu_principal")])
@@ -71,46 +96,94 @@ class FilmeManager:
 Escolha uma categoria:"""
 
             try:
-                await message.edit(text, buttons=buttons, parse_mode='md')
+                await outbound.edit(message, text, buttons=buttons, parse_mode='md')
             except:
-                await self.client.send_message(chat_id, text, buttons=buttons, parse_mode='md')
+                await outbound.send_message(chat_id, text, buttons=buttons, parse_mode='md')
+
+            for category in categories[:PREFETCH_CATEGORIES]:
+                self.prefetch_page(config, category['category_id'], 0)
 
         except Exception as e:
             print(f"Error showing movie categories: {e}")
             buttons = self.frontend.create_error_buttons("menu_principal")
-            await message.edit("❌ Erro ao carregar categorias.", buttons=buttons)
+            await outbound.edit(message, "❌ Erro ao carregar categorias.", buttons=buttons)
 
     async def show_movies(self, chat_id, message, config, category_id, page=0):
         try:
-            movies = self.get_movies(config) if category_id == "all" else self.get_movies(config, category_id)
-
-            if not movies:
+            key = render_cache.key(config, "filme_list", category_id, page)
+            sources = self._list_sources(config, None if category_id == "all" else category_id)
+            await self.backend.load(config, sources)
+            rendered = render_cache.get(key, sources)
+            if rendered is None:
+                rendered = self._render_movies(config, category_id, page)
+
+            if rendered is None:
                 buttons = self.frontend.create_error_buttons("menu_filmes")
-                await message.edit("❌ Nenhum filme encontrado nesta categoria.", buttons=buttons)
+                await outbound.edit(message, "❌ Nenhum filme encontrado nesta categoria.", buttons=buttons)
                 return
 
-            start_idx = page * self.frontend.items_per_page
-            end_idx = start_idx + self.frontend.items_per_page
-            page_movies = movies[start_idx:end_idx]
+            text, markup = rendered
+            try:
+                await outbound.edit(message, text, buttons=markup, parse_mode='md')
+            except:
+                await outbound.send_message(chat_id, text, buttons=markup, parse_mode='md')
 
-            buttons = []
-            for movie in page_movies:
-                mv_name = self.frontend.truncate_text(movie['name'], 28)
-                sid = movie['stream_id']
-                buttons.append([
-                    Button.inline(f"🎬 {mv_name}", data=f"filme_play_{sid}".encode()),
-                    Button.inline("📥", data=f"filme_add_{sid}".encode()),
-                    Button.inline("💾", data=f"download_options_movie_{sid}".encode()),
-                ])
+            self.prefetch_page(config, category_id, page + 1)
+
+        except Exception as e:
+            print(f"Error showing movies: {e}")
+            buttons = self.frontend.create_error_buttons("menu_filmes")
+            await outbound.edit(message, "❌ Erro ao carregar filmes.", buttons=buttons)
+
+    def _list_sources(self, config, list_category):
+        """Requisições de que uma página da lista depende"""
+        return [self._params(config, 'get_vod_streams', list_category), self._params(config, 'get_vod_categories')]
+
+    def prefetch_page(self, config, category_id, page):
+        """Aquece a página em segundo plano (lista do painel + renderização)"""
+        key = render_cache.key(config, "filme_list", category_id, page)
+        list_category = None if category_id == "all" else category_id
+        sources = self._list_sources(config, list_category)
+        if render_cache.has(key, sources):
+            return
 
-            nav = self.frontend.create_pagination_buttons(page, len(movies), "filme_list", category_id)
-            if nav:
-                buttons.append(nav)
+        def render():
+            if page * self.frontend.items_per_page < len(self.get_movies(config, list_category)):
+                self._render_movies(config, category_id, page)
 
-            buttons.append([Button.inline("🔙 Categorias", data=b"menu_filmes")])
+        prefetcher.schedule(config, key, sources, render)
 
-            total_pages = (len(movies) + self.frontend.items_per_page - 1) // self.frontend.items_per_page
-            text = f"""🎬 **FILMES**
+    def _render_movies(self, config, category_id, page):
+        """Monta texto e teclado de uma página de filmes (None se vazia)"""
+        list_category = None if category_id == "all" else category_id
+        movies = self.get_movies(config, list_category)
+        if not movies:
+            return None
+
+        start_idx = page * self.frontend.items_per_page
+        end_idx = start_idx + self.frontend.items_per_page
+        page_movies = movies[start_idx:end_idx]
+
+        buttons = []
+        for movie in page_movies:
+            mv_name = self.frontend.truncate_text(movie['name'], 28)
+            sid = movie['stream_id']
+            item = self._selection_data(movie)
+            buttons.append([
+                Button.inline(f"🎬 {mv_name}", data=router.pack("filme_play", stream_id=sid, item=item,
+                                                               category_id=category_id, page=page)),
+                Button.inline("📥", data=router.pack("filme_add", stream_id=sid, item=item)),
+                Button.inline("💾", data=router.pack("download_options", content_type="movie", stream_id=sid)),
+            ])
+
+        nav = self.frontend.create_pagination_buttons(page, len(movies), "filme_list", category_id=category_id)
+        if nav:
+            buttons.append(nav)
+
+        buttons.append([Button.inline("🔙 Categorias", data=b"menu_filmes")])
+
+        total_pages = (len(movies) + self.frontend.items_per_page - 1) // self.frontend.items_per_page
+        text = f"""🎬 **FILMES**
 
 📊 **Página {page + 1} de {total_pages}**
 🎬 **Total: {len(movies)} filmes**
@@ -119,118 +192,95 @@ Escolha uma categoria:"""
 
 Escolha um filme:"""
 
-            try:
-                await message.edit(text, buttons=buttons, parse_mode='md')
-            except:
-                await self.client.send_message(chat_id, text, buttons=buttons, parse_mode='md')
-
-        except Exception as e:
-            print(f"Error showing movies: {e}")
-            buttons = self.frontend.create_error_buttons("menu_filmes")
-            await message.edit("❌ Erro ao carregar filmes.", buttons=buttons)
+        key = render_cache.key(config, "filme_list", category_id, page)
+        sources = self._list_sources(config, list_category)
+        return render_cache.put(key, sources, text, self.client.build_reply_markup(buttons))
 
-    async def play_movie(self, chat_id, message, config, stream_id):
+    async def play_movie(self, chat_id, message, config, stream_id, item=None, category_id="all", page=0):
         try:
-            movies = self.get_movies(config)
-            movie = next((mv for mv in movies if str(mv['stream_id']) == str(stream_id)), None)
+            if item is None:
+                await self.backend.load(config, self._list_sources(config, None))
+                movie = self.get_movies(config).find(stream_id)
 
-            if not movie:
-                buttons = self.frontend.create_error_buttons("menu_filmes")
-                await message.edit("❌ Filme não encontrado.", buttons=buttons)
-                return
+                if not movie:
+                    buttons = self.frontend.create_error_buttons("menu_filmes")
+                    await outbound.edit(message, "❌ Filme não encontrado.", buttons=buttons)
+                    return
+                item = self._selection_data(movie)
 
+            play_url = mirrors.stream_url(config, 'movie', item['id'], item['container'])
             buttons = [
-                [Button.url("▶️ Reproduzir", movie['play_url']),
-                 Button.inline("📥 Adicionar ao M3U", data=f"filme_add_{stream_id}".encode())],
-                [Button.inline("💾 Download", data=f"download_options_movie_{stream_id}".encode())],
-                [Button.inline("🔙 Voltar", data=b"filme_list_all_0")],
+                [Button.url("▶️ Reproduzir", play_url),
+                 Button.inline("📥 Adicionar ao M3U", data=router.pack("filme_add", stream_id=stream_id, item=item))],
+                [Button.inline("💾 Download", data=router.pack("download_options", content_type="movie", stream_id=stream_id))],
+                [Button.inline("🔙 Voltar", data=router.pack("filme_list", category_id=category_id, page=page))],
             ]
 
-            text = f"""🎬 **{movie['name']}**
+            text = f"""🎬 **{item['name']}**
 
-🆔 **Stream ID:** {movie['stream_id']}
-📡 **Categoria:** {movie.get('category_name', 'Geral')}
+🆔 **Stream ID:** {item['id']}
+📡 **Categoria:** {item.get('category') or 'Geral'}
 🌐 **Servidor:** {config['server'].split('//')[1] if '//' in config['server'] else config['server']}
 
 🔗 **URL de reprodução:**
-`{movie['play_url']}`
+`{play_url}`
 
 **💡 Como reproduzir:**
 • Clique em "▶️ Reproduzir" para abrir no player
 • Use 📥 para adicionar ao M3U
 • Use 💾 para baixar o filme"""
 
-            if movie.get('stream_icon') and movie['stream_icon'].startswith('http'):
+            if item.get('logo') and item['logo'].startswith('http'):
                 try:
                     await message.delete()
-                    await self.client.send_file(chat_id, movie['stream_icon'], caption=text, buttons=buttons, parse_mode='md')
+                    await media_cache.send(outbound, chat_id, media_cache.icon_key(item['logo']), item['logo'], caption=text, buttons=buttons, parse_mode='md')
                     return
                 except:
                     pass
 
             try:
-                await message.edit(text, buttons=buttons, parse_mode='md')
+                await outbound.edit(message, text, buttons=buttons, parse_mode='md')
             except:
-                await self.client.send_message(chat_id, text, buttons=buttons, parse_mode='md')
+                await outbound.send_message(chat_id, text, buttons=buttons, parse_mode='md')
 
         except Exception as e:
             print(f"Error playing movie: {e}")
             buttons = self.frontend.create_error_buttons("menu_filmes")
-            await message.edit("❌ Erro ao carregar filme.", buttons=buttons)
+            await outbound.edit(message, "❌ Erro ao carregar filme.", buttons=buttons)
 
-    async def add_to_m3u(self, event, config, stream_id):
+    async def add_to_m3u(self, event, config, stream_id, item=None):
         try:
-            movies = self.get_movies(config)
-            movie = next((mv for mv in movies if str(mv['stream_id']) == str(stream_id)), None)
+            if item is None:
+                await self.backend.load(config, self._list_sources(config, None))
+                movie = self.get_movies(config).find(stream_id)
 
-            if not movie:
-                await event.answer("❌ Filme não encontrado!")
-                return
-
-            movie_data = {
-                'id': movie['stream_id'],
-                'name': movie['name'],
-                'logo': movie.get('stream_icon', ''),
-                'container': movie.get('container_extension', 'mp4'),
-                'category': movie.get('category_name', 'Filmes')
-            }
+                if not movie:
+                    await event.answer("❌ Filme não encontrado!")
+                    return
+                item = self._selection_data(movie)
 
-            added = self.backend.add_to_selection(event.chat_id, 'movies', movie_data)
+            added = self.backend.add_to_selection(event.chat_id, 'movies', dict(item))
 
             if added:
-                await event.answer(f"📥 {movie['name']} adicionado ao M3U!")
+                await event.answer(f"📥 {item['name']} adicionado ao M3U!")
             else:
-                await event.answer(f"ℹ️ {movie['name']} já está no M3U!")
+                await event.answer(f"ℹ️ {item['name']} já está no M3U!")
 
         except Exception as e:
             print(f"Error adding movie to M3U: {e}")
             await event.answer("❌ Erro ao adicionar ao M3U")
 
-    async def handle_callback(self, event, config):
-        if not config:
-            await event.answer("❌ Configure uma playlist primeiro!")
-            return
-
-        data = event.data.decode()
-        chat_id = event.chat_id
-        message = await event.get_message()
+    def register_routes(self, router):
+        """Registra as rotas de callback de filmes"""
+        async def list_movies(ctx, category_id, page):
+            await self.show_movies(ctx.chat_id, ctx.message, ctx.config, category_id, page)
 
-        try:
-            if data.startswith("filme_list_"):
-                parts = data.split("_")
-                if len(parts) >= 4:
-                    category_id = parts[2]
-                    page = int(parts[3])
-                    await self.show_movies(chat_id, message, config, category_id, page)
+        async def play(ctx, stream_id, item=None, category_id="all", page=0):
+            await self.play_movie(ctx.chat_id, ctx.message, ctx.config, stream_id, item, category_id, page)
 
-            elif data.startswith("filme_play_"):
-                stream_id = data.split("_")[2]
-                await self.play_movie(chat_id, message, config, stream_id)
+        async def add(ctx, stream_id, item=None):
+            await self.add_to_m3u(ctx.event, ctx.config, stream_id, item)
 
-            elif data.startswith("filme_add_"):
-                stream_id = data.split("_")[2]
-                await self.add_to_m3u(event, config, stream_id)
-
-        except Exception as e:
-            print(f"Error in movie callback: {e}")
-            await event.answer("❌ Erro interno")
+        router.add("filme_list_{category_id*}_{page:int}", list_movies, requires_config=True)
+        router.add("filme_play_{stream_id}", play, requires_config=True)
+        router.add("filme_add_{stream_id}", add, requires_config=True)
@@ -2,6 +2,8 @@ from telethon import Button
 from typing import Dict, List, Optional, Any
 from datetime import datetime
 from config import ITEMS_PER_PAGE, MAX_BUTTON_TEXT
+from outbound import outbound
+from router import router
 
 
 class IPTVFrontend:
@@ -18,19 +20,17 @@ class IPTVFrontend:
     def create_error_buttons(self, back_callback: str = "menu_principal") -> list:
         return [[Button.inline("🔙 Voltar", data=back_callback.encode())]]
 
-    def create_pagination_buttons(self, page: int, total_items: int, callback_prefix: str, *args) -> list:
+    def create_pagination_buttons(self, page: int, total_items: int, route: str, **params) -> list:
         buttons = []
         total_pages = (total_items + self.items_per_page - 1) // self.items_per_page
 
         if page > 0:
-            cb = f"{callback_prefix}_{'_'.join(map(str, args))}_{page - 1}"
-            buttons.append(Button.inline("⬅️ Anterior", data=cb.encode()))
+            buttons.append(Button.inline("⬅️ Anterior", data=router.pack(route, page=page - 1, **params)))
 
         buttons.append(Button.inline(f"📄 {page + 1}/{total_pages}", data=b"page_info"))
 
         if (page + 1) * self.items_per_page < total_items:
-            cb = f"{callback_prefix}_{'_'.join(map(str, args))}_{page + 1}"
-            buttons.append(Button.inline("➡️ Próximo", data=cb.encode()))
+            buttons.append(Button.inline("➡️ Próximo", data=router.pack(route, page=page + 1, **params)))
 
         return buttons
 
@@ -64,12 +64,12 @@ class IPTVFrontend:
 
         try:
             if message:
-                await message.edit(text, buttons=buttons, parse_mode='md')
+                await outbound.edit(message, text, buttons=buttons, parse_mode='md')
             else:
-                await self.client.send_message(chat_id, text, buttons=buttons, parse_mode='md')
+                await outbound.send_message(chat_id, text, buttons=buttons, parse_mode='md')
         except Exception as e:
             print(f"Error showing main menu: {e}")
-            await self.client.send_message(chat_id, text, buttons=buttons, parse_mode='md')
+            await outbound.send_message(chat_id, text, buttons=buttons, parse_mode='md')
 
     async def show_server_info(self, chat_id: int, message, server_info: Dict):
         buttons = [[Button.inline("🔙 Menu Principal", data=b"menu_principal")]]
@@ -100,7 +100,7 @@ class IPTVFrontend:
 **⚡ Status da conexão:** 🟢 Estável"""
 
         try:
-            await message.edit(text, buttons=buttons, parse_mode='md')
+            await outbound.edit(message, text, buttons=buttons, parse_mode='md')
         except Exception as e:
             print(f"Error showing server info: {e}")
 
@@ -136,7 +136,7 @@ class IPTVFrontend:
 **💡 Dica:** Use os botões 📥 ao navegar pelos conteúdos para adicionar às suas seleções."""
 
         try:
-            await message.edit(text, buttons=buttons, parse_mode='md')
+            await outbound.edit(message, text, buttons=buttons, parse_mode='md')
         except Exception as e:
             print(f"Error showing selections menu: {e}")
 
@@ -149,6 +149,6 @@ Aguarde alguns segundos antes de tentar novamente.
 **⏰ Limite:** 20 solicitações por minuto
 **🛡️ Proteção:** Anti-spam ativada"""
         try:
-            await self.client.send_message(chat_id, text, parse_mode='md')
+            await outbound.send_message(chat_id, text, parse_mode='md')
         except Exception as e:
             print(f"Error showing rate limit: {e}")
@@ -0,0 +1,110 @@
+import threading
+import time
+from typing import Dict
+from config import BREAKER_FAILURES, BREAKER_COOLDOWN, BREAKER_MAX_COOLDOWN
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+
+
+class CircuitOpenError(Exception):
+    """Nenhum host foi tentado: todos com o disjuntor aberto ou já em teste"""
+
+
+class CircuitBreaker:
+    """Disjuntor de um servidor do painel.
+
+    Fechado: tudo passa. Depois de ``BREAKER_FAILURES`` falhas seguidas
+    abre e recusa na hora por ``cooldown`` segundos. Passado esse tempo
+    fica meio-aberto e deixa passar uma única requisição de teste: sucesso
+    fecha de novo, falha reabre com o dobro da espera (até
+    ``BREAKER_MAX_COOLDOWN``)."""
+
+    def __init__(self):
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.cooldown = BREAKER_COOLDOWN
+        self.probing = False
+        self.lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self.lock:
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.cooldown:
+                self.state = HALF_OPEN
+                self.probing = False
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN and not self.probing:
+                self.probing = True
+                return True
+            return False
+
+    def success(self):
+        with self.lock:
+            self.state = CLOSED
+            self.failures = 0
+            self.cooldown = BREAKER_COOLDOWN
+            self.probing = False
+
+    def failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.state == HALF_OPEN:
+                self.cooldown = min(self.cooldown * 2, BREAKER_MAX_COOLDOWN)
+                self._open()
+            elif self.state == CLOSED and self.failures >= BREAKER_FAILURES:
+                self._open()
+
+    def _open(self):
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        self.probing = False
+
+    def retry_in(self) -> float:
+        """Segundos até a próxima tentativa (0 se já pode tentar)"""
+        if self.state != OPEN:
+            return 0.0
+        return max(0.0, self.cooldown - (time.monotonic() - self.opened_at))
+
+
+class ServerHealth:
+    """Disjuntores por servidor, usados pelo backend antes de ir ao painel"""
+
+    def __init__(self):
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self._guard = threading.Lock()
+
+    def breaker(self, server: str) -> CircuitBreaker:
+        with self._guard:
+            breaker = self.breakers.get(server)
+            if breaker is None:
+                breaker = self.breakers[server] = CircuitBreaker()
+            return breaker
+
+    def allow(self, server: str) -> bool:
+        return self.breaker(server).allow()
+
+    def success(self, server: str):
+        self.breaker(server).success()
+
+    def failure(self, server: str):
+        self.breaker(server).failure()
+
+    def is_down(self, server: str) -> bool:
+        """Se o servidor está recusando requisições agora (aberto e ainda na espera)"""
+        breaker = self.breakers.get(server)
+        return breaker is not None and breaker.state != CLOSED and breaker.retry_in() > 0
+
+    def retry_in(self, server: str) -> float:
+        breaker = self.breakers.get(server)
+        return breaker.retry_in() if breaker else 0.0
+
+    def get_stats(self) -> Dict:
+        """Servidores fora do estado normal (aberto ou em teste)"""
+        return {
+            server: {'state': breaker.state, 'failures': breaker.failures, 'retry_in': breaker.retry_in()}
+            for server, breaker in self.breakers.items()
+            if breaker.state != CLOSED
+        }
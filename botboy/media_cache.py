@@ -0,0 +1,130 @@
+import asyncio
+import json
+import os
+import threading
+from typing import Dict
+from telethon.tl.types import InputDocument, InputPhoto
+from config import MEDIA_CACHE_FILE, MEDIA_CACHE_MAX, MEDIA_CACHE_SAVE_DELAY
+
+
+class MediaCache:
+    """Cache persistente de arquivos já enviados ao Telegram.
+
+    Guarda a referência (id, access_hash, file_reference) da primeira
+    mídia enviada para cada chave, permitindo reenviar o mesmo arquivo
+    sem baixar nem fazer upload de novo. As alterações são gravadas no
+    arquivo em lote, ``MEDIA_CACHE_SAVE_DELAY`` segundos depois da
+    primeira, numa thread (nunca no loop a cada envio)."""
+
+    def __init__(self, path: str = MEDIA_CACHE_FILE, max_entries: int = MEDIA_CACHE_MAX,
+                 save_delay: float = MEDIA_CACHE_SAVE_DELAY):
+        self.path = path
+        self.max_entries = max_entries
+        self.save_delay = save_delay
+        self.entries = self._load()
+        self.hits = 0
+        self._save_pending = False
+        self._write_lock = threading.Lock()
+
+    @staticmethod
+    def download_key(server: str, content_type: str, stream_id, file_format: str) -> str:
+        # Filmes e episódios têm ids independentes no painel
+        return f"download:{server}:{content_type}:{stream_id}:{file_format}"
+
+    @staticmethod
+    def icon_key(url: str) -> str:
+        return f"icon:{url}"
+
+    def _load(self) -> Dict:
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            except (json.JSONDecodeError, IOError):
+                return {}
+        return {}
+
+    def _write(self, entries: Dict):
+        with self._write_lock:
+            try:
+                tmp_path = f"{self.path}.tmp"
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(entries, f)
+                os.replace(tmp_path, self.path)
+            except IOError as e:
+                print(f"Error saving media cache: {e}")
+
+    def _save(self):
+        """Agenda a gravação (agrupando as alterações seguintes); fora do loop grava na hora"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._write(dict(self.entries))
+            return
+        if not self._save_pending:
+            self._save_pending = True
+            loop.call_later(self.save_delay, self._flush, loop)
+
+    def _flush(self, loop):
+        self._save_pending = False
+        loop.run_in_executor(None, self._write, dict(self.entries))
+
+    def get(self, key: str):
+        """Retorna a mídia de entrada (InputDocument/InputPhoto) da chave, se houver"""
+        entry = self.entries.get(key)
+        if not entry:
+            return None
+        file_reference = bytes.fromhex(entry['file_reference'])
+        if entry['kind'] == 'photo':
+            return InputPhoto(entry['id'], entry['access_hash'], file_reference)
+        return InputDocument(entry['id'], entry['access_hash'], file_reference)
+
+    def put(self, key: str, message) -> bool:
+        """Registra a mídia de uma mensagem enviada"""
+        media = getattr(message, 'document', None) or getattr(message, 'photo', None)
+        if media is None:
+            return False
+
+        self.entries.pop(key, None)
+        self.entries[key] = {
+            'kind': 'photo' if getattr(message, 'photo', None) is not None else 'document',
+            'id': media.id,
+            'access_hash': media.access_hash,
+            'file_reference': (media.file_reference or b'').hex()
+        }
+        while len(self.entries) > self.max_entries:
+            self.entries.pop(next(iter(self.entries)))
+        self._save()
+        return True
+
+    def forget(self, key: str):
+        if self.entries.pop(key, None) is not None:
+            self._save()
+
+    async def resend(self, client, chat_id: int, key: str, **kwargs):
+        """Reenvia a mídia em cache. Retorna None se não houver ou se foi recusada"""
+        cached = self.get(key)
+        if cached is None:
+            return None
+        try:
+            message = await client.send_file(chat_id, cached, **kwargs)
+            self.hits += 1
+            return message
+        except Exception as e:
+            # Referência expirada ou inválida: o chamador envia o arquivo original
+            print(f"Cached media rejected ({key}): {e}")
+            self.forget(key)
+            return None
+
+    async def send(self, client, chat_id: int, key: str, file, **kwargs):
+        """Envia ``file`` usando a referência em cache quando existir"""
+        message = await self.resend(client, chat_id, key, **kwargs)
+        if message is not None:
+            return message
+
+        message = await client.send_file(chat_id, file, **kwargs)
+        self.put(key, message)
+        return message
+
+
+media_cache = MediaCache()
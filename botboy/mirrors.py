@@ -0,0 +1,207 @@
+import asyncio
+import threading
+import time
+from typing import Dict, List, Optional
+import aiohttp
+from config import (PANEL_MIRRORS, MIRROR_PROBE_INTERVAL, MIRROR_PROBE_TIMEOUT, MIRROR_SWITCH_MARGIN, MIRROR_SMOOTHING,
+                    MIRROR_IDLE_TTL)
+
+
+class MirrorSet:
+    """Hosts de um mesmo painel e qual deles está em uso.
+
+    A ordem é: saudáveis antes, depois menor latência (média móvel das
+    sondagens e das requisições reais). O host ativo só muda se cair ou se
+    outro for ``MIRROR_SWITCH_MARGIN`` mais rápido, para não ficar trocando
+    a cada oscilação."""
+
+    def __init__(self, hosts: List[str], config: Dict):
+        self.hosts = list(hosts)
+        self.config = config  # a conta dona do conjunto (credenciais da sondagem)
+        self.latency: Dict[str, Optional[float]] = {host: None for host in self.hosts}
+        self.healthy: Dict[str, bool] = {host: True for host in self.hosts}
+        self.active = self.hosts[0]
+        self.switches = 0
+        self.used = time.monotonic()  # último uso pela conta (a sondagem não conta)
+        self.lock = threading.Lock()
+
+    def ranked(self) -> List[str]:
+        def order(host):
+            latency = self.latency[host]
+            return (not self.healthy[host], latency if latency is not None else float('inf'), self.hosts.index(host))
+        return sorted(self.hosts, key=order)
+
+    def report(self, host: str, ok: bool, latency: Optional[float] = None):
+        """Registra o resultado de uma sondagem ou requisição e reelege o host ativo"""
+        if host not in self.latency:
+            return
+        with self.lock:
+            self.healthy[host] = ok
+            if ok and latency is not None:
+                previous = self.latency[host]
+                self.latency[host] = latency if previous is None else (
+                    MIRROR_SMOOTHING * latency + (1 - MIRROR_SMOOTHING) * previous
+                )
+            self._elect()
+
+    def _elect(self):
+        best = self.ranked()[0]
+        if best == self.active:
+            return
+        active_latency = self.latency[self.active]
+        best_latency = self.latency[best]
+        degraded = not self.healthy[self.active] and self.healthy[best]
+        faster = (
+            best_latency is not None and active_latency is not None
+            and best_latency < active_latency * (1 - MIRROR_SWITCH_MARGIN)
+        )
+        if degraded or faster:
+            self.active = best
+            self.switches += 1
+
+
+class MirrorSelector:
+    """Escolhe o espelho de cada painel e monta as URLs do Xtream.
+
+    A identidade da conta continua sendo ``config['server']`` (caches,
+    filas e índices usam ela); só o host das requisições e das URLs de
+    reprodução muda. Cada conta tem o seu conjunto de espelhos: os de
+    ``PANEL_MIRRORS`` (configurados pelo dono do bot, valem para todas as
+    contas do painel) mais os que a própria conta enviou em
+    ``config['mirrors']``, que nunca recebem credenciais de outra conta.
+    Uma tarefa em segundo plano sonda os espelhos a cada
+    ``MIRROR_PROBE_INTERVAL`` segundos, cada conjunto com a sua conta.
+    Conjuntos sem uso por ``idle_ttl`` segundos não são sondados e saem
+    na limpeza (voltam no próximo uso)."""
+
+    def __init__(self, idle_ttl: float = MIRROR_IDLE_TTL):
+        self.idle_ttl = idle_ttl
+        self.sets: Dict[tuple, MirrorSet] = {}
+        self._guard = threading.Lock()
+        self._worker = None
+
+    @staticmethod
+    def hosts_for(config: Dict) -> List[str]:
+        """Servidor, espelhos do dono do bot e espelhos enviados pela conta, sem repetição"""
+        hosts = []
+        for host in [config['server']] + PANEL_MIRRORS.get(config['server'], []) + list(config.get('mirrors') or []):
+            if host not in hosts:
+                hosts.append(host)
+        return hosts
+
+    def _set(self, config: Dict) -> Optional[MirrorSet]:
+        hosts = self.hosts_for(config)
+        if len(hosts) < 2:
+            return None
+        key = (config['server'], config['username'])
+        with self._guard:
+            mirror_set = self.sets.get(key)
+            if mirror_set is None:
+                mirror_set = self.sets[key] = MirrorSet(hosts, config)
+            else:
+                mirror_set.config = config
+                mirror_set.used = time.monotonic()
+                for host in hosts:
+                    if host not in mirror_set.latency:
+                        mirror_set.hosts.append(host)
+                        mirror_set.latency[host] = None
+                        mirror_set.healthy[host] = True
+            return mirror_set
+
+    def register(self, config: Dict):
+        """Conta cadastrada: passa a sondar os espelhos dela (se houver mais de um)"""
+        if self._set(config) is None:
+            return
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run())
+
+    def forget(self, config: Dict):
+        """Conta removida ou trocada: para de sondar os espelhos dela"""
+        with self._guard:
+            self.sets.pop((config['server'], config['username']), None)
+
+    def evict_idle(self) -> int:
+        """Remove os conjuntos sem uso há ``idle_ttl`` segundos e retorna quantos saíram"""
+        now = time.monotonic()
+        with self._guard:
+            idle = [key for key, mirror_set in self.sets.items() if now - mirror_set.used >= self.idle_ttl]
+            for key in idle:
+                del self.sets[key]
+        return len(idle)
+
+    def _active_sets(self) -> List[MirrorSet]:
+        now = time.monotonic()
+        with self._guard:
+            return [mirror_set for mirror_set in self.sets.values() if now - mirror_set.used < self.idle_ttl]
+
+    def candidates(self, config: Dict) -> List[str]:
+        """Hosts na ordem de uso: o ativo primeiro, depois os demais pelo ranking"""
+        mirror_set = self._set(config)
+        if mirror_set is None:
+            return [config['server']]
+        ranked = mirror_set.ranked()
+        return [mirror_set.active] + [host for host in ranked if host != mirror_set.active]
+
+    def host(self, config: Dict) -> str:
+        mirror_set = self._set(config)
+        return mirror_set.active if mirror_set else config['server']
+
+    def report(self, config: Dict, host: str, ok: bool, latency: Optional[float] = None):
+        mirror_set = self._set(config)
+        if mirror_set is not None:
+            mirror_set.report(host, ok, latency)
+
+    # ===== URLs =====
+
+    @staticmethod
+    def api_url(host: str) -> str:
+        return f"{host}/player_api.php"
+
+    def base_url(self, config: Dict, kind: str) -> str:
+        """Prefixo das URLs de ``kind`` ('live', 'movie' ou 'series') no host ativo"""
+        return f"{self.host(config)}/{kind}/{config['username']}/{config['password']}"
+
+    def stream_url(self, config: Dict, kind: str, stream_id, extension: str) -> str:
+        return f"{self.base_url(config, kind)}/{stream_id}.{extension}"
+
+    # ===== Sondagem =====
+
+    async def _probe(self, session: aiohttp.ClientSession, mirror_set: MirrorSet, host: str):
+        params = {'username': mirror_set.config['username'], 'password': mirror_set.config['password']}
+        started = time.monotonic()
+        try:
+            async with session.get(self.api_url(host), params=params) as response:
+                await response.read()
+                ok = response.status < 500
+        except Exception:
+            ok = False
+        mirror_set.report(host, ok, time.monotonic() - started if ok else None)
+
+    async def _run(self):
+        timeout = aiohttp.ClientTimeout(total=MIRROR_PROBE_TIMEOUT)
+        while self.sets:
+            try:
+                async with aiohttp.ClientSession(timeout=timeout) as session:
+                    await asyncio.gather(*(
+                        self._probe(session, mirror_set, host)
+                        for mirror_set in self._active_sets()
+                        for host in list(mirror_set.hosts)
+                    ))
+            except Exception as e:
+                print(f"Mirror probe error: {e}")
+            await asyncio.sleep(MIRROR_PROBE_INTERVAL)
+
+    def get_stats(self) -> Dict:
+        """Por conta: (servidor, usuário) -> host ativo e saúde dos espelhos"""
+        return {
+            account: {
+                'active': mirror_set.active,
+                'hosts': len(mirror_set.hosts),
+                'healthy': sum(mirror_set.healthy.values()),
+                'switches': mirror_set.switches
+            }
+            for account, mirror_set in list(self.sets.items())
+        }
+
+
+mirrors = MirrorSelector()
@@ -0,0 +1,169 @@
+import asyncio
+import time
+from collections import deque, OrderedDict
+from typing import Dict
+from telethon.errors import FloodWaitError
+from config import OUTBOUND_GLOBAL_RATE, OUTBOUND_CHAT_INTERVAL
+
+
+class _Job:
+    def __init__(self, chat_id, call, edit_key=None):
+        self.chat_id = chat_id
+        self.call = call  # fábrica da corrotina que faz o envio
+        self.edit_key = edit_key
+        self.future = asyncio.get_running_loop().create_future()
+        self.started = False
+
+
+class OutboundQueue:
+    """Fila central de envios para o Telegram.
+
+    Garante um intervalo mínimo entre envios no mesmo chat e um teto
+    global por segundo, respeita ``FloodWaitError`` reagendando o envio
+    para depois da espera pedida e junta edições pendentes da mesma
+    mensagem: só o estado mais recente é enviado."""
+
+    def __init__(self, global_rate: int = OUTBOUND_GLOBAL_RATE, chat_interval: float = OUTBOUND_CHAT_INTERVAL):
+        self.client = None
+        self.global_rate = global_rate
+        self.chat_interval = chat_interval
+        self.chats: 'OrderedDict[int, deque]' = OrderedDict()
+        self.next_allowed: Dict[int, float] = {}
+        self.busy = set()
+        self.pending_edits = {}
+        self.recent_sends = deque()
+        self.stats = {'sent': 0, 'coalesced': 0, 'flood_waits': 0, 'errors': 0, 'max_depth': 0}
+        self._wakeup = None
+        self._worker = None
+
+    def bind(self, client):
+        self.client = client
+
+    def queue_depth(self) -> int:
+        return sum(len(jobs) for jobs in self.chats.values())
+
+    def get_stats(self) -> Dict:
+        stats = dict(self.stats)
+        stats['queued'] = self.queue_depth()
+        stats['queued_chats'] = len(self.chats)
+        stats['in_flight'] = len(self.busy)
+        return stats
+
+    # ===== API pública =====
+
+    async def send_message(self, chat_id, *args, **kwargs):
+        return await self._submit(_Job(chat_id, lambda: self.client.send_message(chat_id, *args, **kwargs)))
+
+    async def send_file(self, chat_id, *args, **kwargs):
+        return await self._submit(_Job(chat_id, lambda: self.client.send_file(chat_id, *args, **kwargs)))
+
+    async def edit(self, message, *args, **kwargs):
+        """Edita ``message``; uma edição ainda na fila é substituída pela nova"""
+        key = (message.chat_id, message.id)
+        pending = self.pending_edits.get(key)
+        if pending is not None and not pending.started:
+            pending.call = lambda: message.edit(*args, **kwargs)
+            self.stats['coalesced'] += 1
+            return await asyncio.shield(pending.future)
+
+        job = _Job(message.chat_id, lambda: message.edit(*args, **kwargs), edit_key=key)
+        self.pending_edits[key] = job
+        return await self._submit(job)
+
+    # ===== Agendamento =====
+
+    async def _submit(self, job: _Job):
+        self._ensure_worker()
+        self.chats.setdefault(job.chat_id, deque()).append(job)
+        self.stats['max_depth'] = max(self.stats['max_depth'], self.queue_depth())
+        self._wakeup.set()
+        return await asyncio.shield(job.future)
+
+    def _ensure_worker(self):
+        if self._worker is None or self._worker.done():
+            self._wakeup = asyncio.Event()
+            self._worker = asyncio.create_task(self._run())
+
+    def _next_job(self, now: float):
+        """Próximo envio liberado (chats atendidos em rodízio)"""
+        for chat_id in list(self.chats):
+            if chat_id in self.busy or self.next_allowed.get(chat_id, 0) > now:
+                continue
+            jobs = self.chats[chat_id]
+            job = jobs.popleft()
+            if jobs:
+                self.chats.move_to_end(chat_id)
+            else:
+                del self.chats[chat_id]
+            return job
+        return None
+
+    def _prune(self, now: float):
+        """Esquece intervalos de chats que já estão liberados"""
+        expired = [chat_id for chat_id, allowed in self.next_allowed.items() if allowed <= now and chat_id not in self.chats]
+        for chat_id in expired:
+            del self.next_allowed[chat_id]
+
+    def _next_wait(self, now: float):
+        waits = [self.next_allowed.get(chat_id, 0) - now for chat_id in self.chats if chat_id not in self.busy]
+        return max(0.01, min(waits)) if waits else None
+
+    async def _global_slot(self):
+        """Limita o total de envios por segundo"""
+        while True:
+            now = time.monotonic()
+            while self.recent_sends and now - self.recent_sends[0] >= 1:
+                self.recent_sends.popleft()
+            if len(self.recent_sends) < self.global_rate:
+                self.recent_sends.append(now)
+                return
+            await asyncio.sleep(1 - (now - self.recent_sends[0]))
+
+    async def _run(self):
+        while True:
+            job = self._next_job(time.monotonic())
+            if job is None:
+                self._prune(time.monotonic())
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self._next_wait(time.monotonic()))
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            await self._global_slot()
+            job.started = True
+            if job.edit_key is not None and self.pending_edits.get(job.edit_key) is job:
+                del self.pending_edits[job.edit_key]
+            self.busy.add(job.chat_id)
+            asyncio.create_task(self._execute(job))
+
+    async def _execute(self, job: _Job):
+        chat_id = job.chat_id
+        try:
+            result = await job.call()
+            self.stats['sent'] += 1
+            job.future.set_result(result)
+        except FloodWaitError as e:
+            self.stats['flood_waits'] += 1
+            print(f"FloodWait on chat {chat_id}: {e.seconds}s")
+            self.next_allowed[chat_id] = time.monotonic() + e.seconds
+            newer = self.pending_edits.get(job.edit_key) if job.edit_key is not None else None
+            if newer is not None:
+                # Uma edição mais nova da mesma mensagem já está na fila
+                job.future.set_result(None)
+            else:
+                job.started = False
+                if job.edit_key is not None:
+                    self.pending_edits[job.edit_key] = job
+                self.chats.setdefault(chat_id, deque()).appendleft(job)
+        except Exception as e:
+            self.stats['errors'] += 1
+            job.future.set_exception(e)
+        finally:
+            self.busy.discard(chat_id)
+            self.next_allowed[chat_id] = max(self.next_allowed.get(chat_id, 0), time.monotonic() + self.chat_interval)
+            self._wakeup.set()
+
+
+outbound = OutboundQueue()
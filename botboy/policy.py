@@ -0,0 +1,149 @@
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Dict, Optional
+import requests
+from config import (
+    REQUEST_TIMEOUT_MIN, REQUEST_TIMEOUT_MAX, REQUEST_TIMEOUT_FACTOR, LATENCY_WINDOW, LATENCY_MIN_SAMPLES,
+    REQUEST_RETRIES, RETRY_BACKOFF, REQUEST_DEADLINE, HEDGE_WORKERS
+)
+
+# Respostas que valem nova tentativa (o painel está vivo, mas sobrecarregado)
+RETRY_STATUS = {429, 500, 502, 503, 504}
+# Respostas que indicam que o painel só aceita POST
+POST_STATUS = {405, 501}
+
+
+class LatencyTracker:
+    """Latências recentes de um servidor para uma ação do painel (usado de várias threads)"""
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self.samples = deque(maxlen=window)
+        self.lock = threading.Lock()
+
+    def add(self, seconds: float):
+        with self.lock:
+            self.samples.append(seconds)
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        with self.lock:
+            ordered = sorted(self.samples)
+        if len(ordered) < LATENCY_MIN_SAMPLES:
+            return None
+        return ordered[int(fraction * (len(ordered) - 1))]
+
+
+class RequestPolicy:
+    """Como o backend fala com o painel: timeout, novas tentativas e hedge.
+
+    O timeout de cada servidor/ação sai do p95 das respostas recentes
+    (``REQUEST_TIMEOUT_FACTOR`` vezes, entre o mínimo e o máximo). Falhas de
+    rede e 429/5xx são repetidas com espera exponencial e jitter, dentro
+    de ``REQUEST_DEADLINE``. Se uma leitura passa do p95 sem resposta, uma
+    cópia é disparada e vale a primeira que chegar. POST só é usado quando
+    o painel recusa GET (405/501), e isso fica lembrado por servidor.
+
+    Novas tentativas e hedge esperam (``sleep``/``wait``), então só rodam
+    fora do loop do bot; o backend nunca chama isto na thread do loop."""
+
+    def __init__(self):
+        self.latency: Dict[tuple, LatencyTracker] = {}
+        self._guard = threading.Lock()
+        self.post_only = set()
+        self.executor = ThreadPoolExecutor(max_workers=HEDGE_WORKERS, thread_name_prefix='panel')
+        self.stats = {'retries': 0, 'hedges': 0, 'hedge_wins': 0}
+
+    def _tracker(self, server: str, action: str) -> LatencyTracker:
+        with self._guard:
+            tracker = self.latency.get((server, action))
+            if tracker is None:
+                tracker = self.latency[(server, action)] = LatencyTracker()
+            return tracker
+
+    def timeout_for(self, server: str, action: str) -> float:
+        p95 = self._tracker(server, action).percentile(0.95)
+        if p95 is None:
+            return REQUEST_TIMEOUT_MAX
+        return min(REQUEST_TIMEOUT_MAX, max(REQUEST_TIMEOUT_MIN, p95 * REQUEST_TIMEOUT_FACTOR))
+
+    def _send(self, url: str, params: Dict, server: str, timeout: float) -> requests.Response:
+        if server in self.post_only:
+            return requests.post(url, data=params, timeout=timeout)
+        response = requests.get(url, params=params, timeout=timeout)
+        if response.status_code in POST_STATUS:
+            response = requests.post(url, data=params, timeout=timeout)
+            if response.status_code == 200:
+                self.post_only.add(server)
+        return response
+
+    def _attempt(self, url: str, params: Dict, server: str, action: str, timeout: float) -> requests.Response:
+        started = time.monotonic()
+        response = self._send(url, params, server, timeout)
+        if response.status_code == 200:
+            self._tracker(server, action).add(time.monotonic() - started)
+        return response
+
+    def _hedged(self, url: str, params: Dict, server: str, action: str, timeout: float) -> requests.Response:
+        """Uma tentativa; passando do p95, dispara uma cópia e fica com a primeira boa"""
+        primary = self.executor.submit(self._attempt, url, params, server, action, timeout)
+        hedge_after = self._tracker(server, action).percentile(0.95)
+        if hedge_after is None or hedge_after >= timeout:
+            return primary.result()
+
+        done, _ = wait([primary], timeout=hedge_after)
+        if done:
+            return primary.result()
+
+        self.stats['hedges'] += 1
+        hedge = self.executor.submit(self._attempt, url, params, server, action, timeout)
+        pending = {primary, hedge}
+        while True:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None and future.result().status_code == 200:
+                    if future is hedge:
+                        self.stats['hedge_wins'] += 1
+                    return future.result()
+            if not pending:
+                # As duas falharam: devolve o resultado da original
+                return primary.result()
+
+    def request(self, url: str, params: Dict, server: str) -> requests.Response:
+        """Leitura no painel com as regras acima; levanta a última exceção de rede.
+
+        Bloqueia (esperas entre tentativas e pelo hedge): só em thread, nunca no loop."""
+        action = params.get('action', '')
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            timeout = self.timeout_for(server, action)
+            try:
+                response = self._hedged(url, params, server, action, timeout)
+                if response.status_code not in RETRY_STATUS:
+                    return response
+                error = None
+            except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
+                response, error = None, e
+
+            backoff = RETRY_BACKOFF * (2 ** attempt) * random.uniform(0.5, 1.5)
+            attempt += 1
+            if attempt > REQUEST_RETRIES or time.monotonic() - started + backoff + timeout > REQUEST_DEADLINE:
+                if error is not None:
+                    raise error
+                return response
+            self.stats['retries'] += 1
+            time.sleep(backoff)
+
+    def get_stats(self) -> Dict:
+        stats = dict(self.stats)
+        stats['servers'] = {}
+        with self._guard:
+            trackers = list(self.latency.items())
+        for (server, action), tracker in trackers:
+            p95 = tracker.percentile(0.95)
+            if p95 is not None:
+                current = stats['servers'].get(server, 0.0)
+                stats['servers'][server] = max(current, p95)
+        return stats
@@ -0,0 +1,100 @@
+import asyncio
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+from backend import backend
+from config import PREFETCH_PER_SERVER, PREFETCH_WORKERS, PREFETCH_QUEUE_MAX, PREFETCH_IDLE_POLL
+
+
+class Prefetcher:
+    """Pré-carregamento do que o usuário deve abrir em seguida.
+
+    Cada tarefa traz os params das requisições a aquecer e, opcionalmente,
+    uma função que renderiza a página no loop depois que tudo estiver em
+    cache. As mais recentes saem primeiro (são as mais prováveis), no
+    máximo ``PREFETCH_PER_SERVER`` por servidor, e nenhuma começa enquanto
+    o servidor estiver atendendo uma requisição interativa."""
+
+    def __init__(self, per_server: int = PREFETCH_PER_SERVER, max_pending: int = PREFETCH_QUEUE_MAX):
+        self.per_server = per_server
+        self.max_pending = max_pending
+        self.pending: 'OrderedDict[tuple, tuple]' = OrderedDict()
+        self.running: Dict[str, int] = defaultdict(int)
+        self.executor = ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix='prefetch')
+        self.stats = {'scheduled': 0, 'done': 0, 'dropped': 0, 'errors': 0}
+        self._wakeup = None
+        self._worker = None
+
+    def schedule(self, config: Dict, key: tuple, sources: List[Dict], render: Optional[Callable[[], object]] = None):
+        """Agenda o aquecimento de ``sources``; ``key`` evita tarefas repetidas da mesma conta"""
+        key = (config.get('username'), key)
+        if key in self.pending:
+            self.pending.move_to_end(key)
+            return
+        self.pending[key] = (config, sources, render)
+        self.stats['scheduled'] += 1
+        while len(self.pending) > self.max_pending:
+            self.pending.popitem(last=False)
+            self.stats['dropped'] += 1
+        self._ensure_worker()
+        self._wakeup.set()
+
+    def get_stats(self) -> Dict:
+        stats = dict(self.stats)
+        stats['pending'] = len(self.pending)
+        stats['running'] = sum(self.running.values())
+        return stats
+
+    def _ensure_worker(self):
+        if self._worker is None or self._worker.done():
+            self._wakeup = asyncio.Event()
+            self._worker = asyncio.create_task(self._run())
+
+    def _next_key(self) -> Optional[tuple]:
+        """Tarefa mais recente cujo servidor tem vaga e não está ocupado"""
+        for key in reversed(self.pending):
+            server = self.pending[key][0].get('server')
+            if self.running[server] < self.per_server and not backend.in_flight.get(server):
+                return key
+        return None
+
+    async def _run(self):
+        while True:
+            key = self._next_key()
+            if key is None:
+                self._wakeup.clear()
+                try:
+                    # Acorda com tarefa nova/concluída ou reavalia servidores ocupados
+                    await asyncio.wait_for(self._wakeup.wait(), PREFETCH_IDLE_POLL if self.pending else None)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            config, sources, render = self.pending.pop(key)
+            self.running[config.get('server')] += 1
+            asyncio.create_task(self._execute(config, sources, render))
+
+    async def _execute(self, config: Dict, sources: List[Dict], render):
+        try:
+            missing = [params for params in sources if backend.cached_at(config['server'], params) is None]
+            if missing:
+                loop = asyncio.get_running_loop()
+                await loop.run_in_executor(self.executor, self._fetch, config, missing)
+            # Só renderiza com tudo em cache: senão a renderização iria ao painel no loop
+            if render and all(backend.cached_at(config['server'], params) is not None for params in sources):
+                render()
+            self.stats['done'] += 1
+        except Exception as e:
+            print(f"Prefetch error: {e}")
+            self.stats['errors'] += 1
+        finally:
+            self.running[config.get('server')] -= 1
+            self._wakeup.set()
+
+    @staticmethod
+    def _fetch(config: Dict, sources: List[Dict]):
+        for params in sources:
+            backend.make_api_request(config, params, background=True)
+
+
+prefetcher = Prefetcher()
@@ -0,0 +1,106 @@
+import asyncio
+import re
+import time
+from typing import Dict, List, Optional
+import aiohttp
+from config import PROBE_TIMEOUT, PROBE_CONCURRENCY, PROBE_CACHE_TTL
+
+
+def format_size(size: int) -> str:
+    """Formata bytes para exibição (ex.: 1.4GB)"""
+    if not size:
+        return "Tamanho desconhecido"
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if size < 1024 or unit == 'GB':
+            return f"{size:.0f}{unit}" if unit in ('B', 'KB') else f"{size:.1f}{unit}"
+        size /= 1024
+
+
+class FormatProber:
+    """Sondagem real dos arquivos de download no painel.
+
+    Para cada URL faz um HEAD e, se o servidor não informar o tamanho,
+    um GET com ``Range: bytes=0-0``; o ``Content-Range`` revela o tamanho
+    total e se o servidor aceita retomada. Os resultados ficam em cache
+    por ``PROBE_CACHE_TTL`` segundos."""
+
+    def __init__(self):
+        self.cache = {}
+        self._semaphore = None
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(PROBE_CONCURRENCY)
+        return self._semaphore
+
+    @staticmethod
+    def _total_from_range(header: Optional[str]) -> int:
+        match = re.search(r'/(\d+)\s*$', header or '')
+        return int(match.group(1)) if match else 0
+
+    async def _probe_url(self, session: aiohttp.ClientSession, url: str) -> Dict:
+        result = {'ok': False, 'size': 0, 'ranges': False}
+        try:
+            async with session.head(url, allow_redirects=True) as response:
+                if response.status == 200:
+                    result['ok'] = True
+                    result['size'] = response.content_length or 0
+                    result['ranges'] = response.headers.get('Accept-Ranges', '').lower() == 'bytes'
+        except Exception:
+            pass
+
+        if result['ok'] and result['size'] and result['ranges']:
+            return result
+
+        # Muitos painéis não respondem HEAD direito: pede um único byte
+        try:
+            async with session.get(url, headers={'Range': 'bytes=0-0'}, allow_redirects=True) as response:
+                if response.status == 206:
+                    result.update(ok=True, ranges=True)
+                    result['size'] = self._total_from_range(response.headers.get('Content-Range')) or result['size']
+                elif response.status == 200:
+                    result['ok'] = True
+                    result['size'] = result['size'] or response.content_length or 0
+        except Exception:
+            pass
+
+        return result
+
+    async def probe(self, urls: List[str]) -> Dict[str, Dict]:
+        """Sonda as URLs em paralelo, reaproveitando resultados recentes"""
+        now = time.time()
+        results = {}
+        pending = []
+        for url in urls:
+            cached = self.cache.get(url)
+            if cached and now - cached['time'] < PROBE_CACHE_TTL:
+                results[url] = cached['result']
+            else:
+                pending.append(url)
+
+        if pending:
+            timeout = aiohttp.ClientTimeout(total=PROBE_TIMEOUT)
+            semaphore = self._get_semaphore()
+
+            async def limited(url):
+                async with semaphore:
+                    return await self._probe_url(session, url)
+
+            async with aiohttp.ClientSession(timeout=timeout) as session:
+                probed = await asyncio.gather(*(limited(url) for url in pending))
+
+            for url, result in zip(pending, probed):
+                self.cache[url] = {'time': now, 'result': result}
+                results[url] = result
+
+        return results
+
+    def cleanup(self):
+        """Remove sondagens expiradas"""
+        now = time.time()
+        expired = [url for url, entry in self.cache.items() if now - entry['time'] >= PROBE_CACHE_TTL]
+        for url in expired:
+            del self.cache[url]
+
+
+prober = FormatProber()
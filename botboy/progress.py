@@ -0,0 +1,121 @@
+import asyncio
+import time
+from typing import Optional
+from outbound import outbound
+from probe import format_size
+from config import PROGRESS_INTERVAL, PROGRESS_MAX_EDITS, PROGRESS_SMOOTHING, PROGRESS_BACKOFF, PROGRESS_MAX_INTERVAL
+
+
+def format_duration(seconds: float) -> str:
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}h{(seconds % 3600) // 60:02d}m"
+    if seconds >= 60:
+        return f"{seconds // 60}m{seconds % 60:02d}s"
+    return f"{seconds}s"
+
+
+class ProgressReporter:
+    """Mensagem de progresso para operações longas.
+
+    ``update`` só guarda o estado mais recente (pode ser chamado de
+    threads e a cada pedaço); uma tarefa edita a mensagem no máximo a
+    cada ``interval`` segundos e só após avançar ``1/max_edits`` do total,
+    então o número de edições por operação não depende do tamanho. Sem
+    total conhecido, o intervalo cresce ``PROGRESS_BACKOFF`` vezes a cada
+    edição (até ``PROGRESS_MAX_INTERVAL``), para streams longos não
+    esbarrarem no FloodWait.
+    Velocidade e tempo restante vêm de uma média móvel exponencial."""
+
+    def __init__(self, message, title: str, details: str = '', unit: str = 'bytes',
+                 interval: float = PROGRESS_INTERVAL, max_edits: int = PROGRESS_MAX_EDITS):
+        self.message = message
+        self.title = title
+        self.details = details
+        self.unit = unit
+        self.interval = interval
+        self.min_step = 1 / max_edits
+        self.done = 0
+        self.total = 0
+        self.rate = None
+        self.edits = 0
+        self._last_sample = (time.monotonic(), 0)
+        self._last_fraction = 0.0
+        self._last_edit = time.monotonic()
+        self._last_rendered = None
+        self._task: Optional[asyncio.Task] = None
+
+    def update(self, done: int, total: Optional[int] = None):
+        self.done = done
+        if total is not None:
+            self.total = total
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+        return self
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    def _sample_rate(self):
+        now = time.monotonic()
+        last_time, last_done = self._last_sample
+        if now > last_time and self.done >= last_done:
+            instant = (self.done - last_done) / (now - last_time)
+            self.rate = instant if self.rate is None else PROGRESS_SMOOTHING * instant + (1 - PROGRESS_SMOOTHING) * self.rate
+        self._last_sample = (now, self.done)
+
+    def _unknown_gap(self) -> float:
+        """Intervalo entre edições quando o total não é conhecido"""
+        return min(self.interval * PROGRESS_BACKOFF ** self.edits, PROGRESS_MAX_INTERVAL)
+
+    def _format_amount(self, value) -> str:
+        return format_size(value) if self.unit == 'bytes' else str(int(value))
+
+    def render(self) -> str:
+        lines = [f"**{self.title}**", ""]
+        if self.details:
+            lines.append(self.details)
+
+        if self.total:
+            percent = min(100, int(self.done / self.total * 100))
+            bar = '▓' * (percent // 10) + '░' * (10 - percent // 10)
+            lines.append(f"⏳ **Progresso:** {percent}% ({self._format_amount(self.done)}/{self._format_amount(self.total)})")
+            lines.append(bar)
+        else:
+            lines.append(f"⏳ **Processado:** {self._format_amount(self.done)}")
+
+        if self.rate:
+            speed = f"{format_size(self.rate)}/s" if self.unit == 'bytes' else f"{self.rate:.1f} {self.unit}/s"
+            status = f"🚀 {speed}"
+            if self.total and self.done < self.total:
+                status += f" • ⏱️ {format_duration((self.total - self.done) / self.rate)} restantes"
+            lines.append(status)
+
+        return "\n".join(lines)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            self._sample_rate()
+
+            fraction = self.done / self.total if self.total else None
+            if fraction is not None and fraction - self._last_fraction < self.min_step:
+                continue
+            if fraction is None and time.monotonic() - self._last_edit < self._unknown_gap():
+                continue
+            if fraction is not None:
+                self._last_fraction = fraction
+
+            text = self.render()
+            if text == self._last_rendered:
+                continue
+            self._last_rendered = text
+            try:
+                await outbound.edit(self.message, text, parse_mode='md')
+                self.edits += 1
+                self._last_edit = time.monotonic()
+            except Exception:
+                pass
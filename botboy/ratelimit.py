@@ -0,0 +1,46 @@
+import time
+from typing import Dict, Tuple
+from config import RATE_LIMIT_BUCKETS, RATE_LIMIT_IDLE_TTL
+
+
+class TokenBucketLimiter:
+    """Rate limiting por token bucket, com orçamentos por classe de custo.
+
+    Cada usuário tem um balde por classe (ex.: ``cheap`` para trocar de
+    página, ``expensive`` para M3U, categorias completas e downloads).
+    O balde recarrega continuamente, então um uso constante abaixo da
+    taxa nunca é bloqueado e rajadas ficam limitadas à capacidade."""
+
+    def __init__(self, budgets: Dict[str, Tuple[float, float]] = RATE_LIMIT_BUCKETS, idle_ttl: int = RATE_LIMIT_IDLE_TTL):
+        self.budgets = budgets
+        self.idle_ttl = idle_ttl
+        self.buckets: Dict[Tuple[int, str], list] = {}  # (usuário, classe) -> [tokens, último acesso]
+
+    def allow(self, user_id: int, cost_class: str = 'cheap', cost: float = 1) -> bool:
+        """Consome ``cost`` tokens do balde; retorna False se não houver saldo"""
+        capacity, refill_rate = self.budgets.get(cost_class, self.budgets['cheap'])
+        now = time.monotonic()
+        key = (user_id, cost_class)
+
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = [capacity, now]
+        else:
+            bucket[0] = min(capacity, bucket[0] + (now - bucket[1]) * refill_rate)
+            bucket[1] = now
+
+        if bucket[0] < cost:
+            return False
+        bucket[0] -= cost
+        return True
+
+    def evict_idle(self) -> int:
+        """Remove baldes ociosos (já estariam cheios de novo) e retorna quantos saíram"""
+        cutoff = time.monotonic() - self.idle_ttl
+        idle = [key for key, bucket in self.buckets.items() if bucket[1] < cutoff]
+        for key in idle:
+            del self.buckets[key]
+        return len(idle)
+
+    def active_users(self) -> int:
+        return len({user_id for user_id, _ in self.buckets})
@@ -0,0 +1,96 @@
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from backend import backend
+from config import RENDER_CACHE_MAX
+from router import router
+
+# Mude quando o texto ou o teclado das listas mudar de formato
+LAYOUT_VERSION = 1
+
+
+class RenderCache:
+    """Páginas de lista prontas para envio (texto + teclado já montado).
+
+    A chave é (servidor, lista, categoria, página, versão do layout), sem
+    o usuário: contas do mesmo painel dividem as páginas. Cada página
+    guarda o resumo do conteúdo de cada requisição de origem; ela só vale
+    para quem tiver no próprio cache (com as próprias credenciais) as
+    mesmas respostas, ainda válidas. Nada por usuário entra na página (as
+    seleções ficam fora). Os contextos de botão usados pela página são
+    renovados a cada uso."""
+
+    def __init__(self, max_entries: int = RENDER_CACHE_MAX):
+        self.max_entries = max_entries
+        self.entries: 'OrderedDict[tuple, Dict]' = OrderedDict()
+        self.stats = {'hits': 0, 'misses': 0, 'stale': 0}
+
+    @staticmethod
+    def key(config: Dict, list_name: str, category, page: int) -> tuple:
+        return (config['server'], list_name, str(category), page, LAYOUT_VERSION)
+
+    @staticmethod
+    def _digests(key: tuple, sources: List[Dict]) -> List[Optional[str]]:
+        return [backend.digest_of(key[0], params) for params in sources]
+
+    def get(self, key: tuple, sources: List[Dict]) -> Optional[Tuple[str, object]]:
+        """Página em cache, se ``sources`` (params da conta que pede) tiverem o mesmo conteúdo"""
+        entry = self.entries.get(key)
+        if entry is None:
+            self.stats['misses'] += 1
+            return None
+
+        digests = self._digests(key, sources)
+        if None in digests:
+            # Esta conta ainda não tem as respostas: a página não vale para ela
+            self.stats['misses'] += 1
+            return None
+        if digests != entry['digests']:
+            del self.entries[key]
+            self.stats['stale'] += 1
+            return None
+
+        self.entries.move_to_end(key)
+        for token, values in entry['contexts']:
+            router.contexts.keep(token, values)
+        self.stats['hits'] += 1
+        return entry['text'], entry['markup']
+
+    def has(self, key: tuple, sources: List[Dict]) -> bool:
+        """Se a página está em cache e válida para ``sources`` (sem contar nas estatísticas)"""
+        entry = self.entries.get(key)
+        return entry is not None and self._digests(key, sources) == entry['digests']
+
+    def put(self, key: tuple, sources: List[Dict], text: str, markup) -> Tuple[str, object]:
+        """Guarda a página; ``sources`` são os params das requisições que a geraram"""
+        digests = self._digests(key, sources)
+        if None not in digests:
+            self.entries[key] = {
+                'text': text,
+                'markup': markup,
+                'digests': digests,
+                'contexts': self._contexts(markup)
+            }
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return text, markup
+
+    @staticmethod
+    def _contexts(markup) -> List[Tuple[str, Dict]]:
+        contexts = []
+        for row in getattr(markup, 'rows', []):
+            for button in row.buttons:
+                token = router.token_of(getattr(button, 'data', None))
+                if token is not None:
+                    values = router.contexts.get(token)
+                    if values is not None:
+                        contexts.append((token, values))
+        return contexts
+
+    def get_stats(self) -> Dict:
+        stats = dict(self.stats)
+        stats['pages'] = len(self.entries)
+        return stats
+
+
+render_cache = RenderCache()
@@ -0,0 +1,407 @@
+import base64
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+from config import CALLBACK_CONTEXT_TTL, CALLBACK_CONTEXT_MAX, CALLBACK_CONTEXT_FILE, CALLBACK_CONTEXT_SAVE_DELAY
+
+MAX_CALLBACK_DATA = 64  # Limite do Telegram para o data de um botão
+PACKED = 0x00           # data binário: rota + parâmetros compactados
+TOKEN = 0x01            # data binário: rota + token do contexto no servidor
+EXTRA = 0x02            # data binário: rota + token só dos extras + parâmetros compactados
+TOKEN_SIZE = 12         # base64 dos 9 bytes do resumo
+
+
+class ExpiredCallbackError(Exception):
+    """Botão cujo contexto no servidor já expirou"""
+
+
+def _write_varint(value: int) -> bytes:
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def _read_varint(data: bytes, pos: int) -> Tuple[int, int]:
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return value, pos
+        shift += 7
+
+
+def _pack_value(value) -> bytes:
+    """Números viram varint; textos, varint do tamanho + UTF-8 (bit 0 diferencia)"""
+    text = str(value)
+    if text.isdigit() and (text == '0' or text[0] != '0') and text.isascii():
+        return _write_varint(int(text) << 1)
+    raw = text.encode()
+    return _write_varint(len(raw) << 1 | 1) + raw
+
+
+def _unpack_value(data: bytes, pos: int) -> Tuple[str, int]:
+    header, pos = _read_varint(data, pos)
+    if not header & 1:
+        return str(header >> 1), pos
+    end = pos + (header >> 1)
+    return data[pos:end].decode(), end
+
+
+class CallbackContextStore:
+    """Contextos de botões guardados no servidor, referenciados por token.
+
+    O token é um resumo do conteúdo em base64 curto, então renderizar a
+    mesma página de novo reaproveita a entrada em vez de criar outra. Os
+    contextos ficam em ``path`` (botões continuam valendo depois de
+    reiniciar o bot); tokens novos são gravados em lote, numa thread,
+    ``save_delay`` segundos depois do primeiro. Sem ``path``, só memória."""
+
+    def __init__(self, path: Optional[str] = CALLBACK_CONTEXT_FILE, ttl: int = CALLBACK_CONTEXT_TTL,
+                 max_entries: int = CALLBACK_CONTEXT_MAX, save_delay: float = CALLBACK_CONTEXT_SAVE_DELAY):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.save_delay = save_delay
+        self.lock = threading.Lock()  # botões também são montados nas threads de pré-carregamento
+        self.entries: 'OrderedDict[str, Tuple[float, Dict]]' = self._load()
+        self._save_pending = False
+        self._write_lock = threading.Lock()
+
+    def _load(self) -> 'OrderedDict[str, Tuple[float, Dict]]':
+        entries = OrderedDict()
+        if self.path and os.path.exists(self.path):
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    now = time.time()
+                    for token, expires, values in json.load(f):
+                        if expires >= now:
+                            entries[token] = (expires, values)
+            except (json.JSONDecodeError, IOError, ValueError, TypeError):
+                return OrderedDict()
+        return entries
+
+    def _save(self):
+        """Agenda a gravação (chamado com ``lock``), agrupando os tokens seguintes"""
+        if self.path and not self._save_pending:
+            self._save_pending = True
+            timer = threading.Timer(self.save_delay, self._flush)
+            timer.daemon = True
+            timer.start()
+
+    def _flush(self):
+        with self.lock:
+            self._save_pending = False
+            snapshot = [[token, expires, values] for token, (expires, values) in self.entries.items()]
+        with self._write_lock:
+            try:
+                tmp_path = f"{self.path}.tmp"
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(snapshot, f, default=str)
+                os.replace(tmp_path, self.path)
+            except IOError as e:
+                print(f"Error saving callback contexts: {e}")
+
+    def put(self, values: Dict) -> str:
+        raw = json.dumps(values, sort_keys=True, default=str).encode()
+        token = base64.urlsafe_b64encode(hashlib.blake2b(raw, digest_size=9).digest()).decode()
+        self.keep(token, values)
+        return token
+
+    def keep(self, token: str, values: Dict):
+        """Renova (ou restaura) a entrada de um token já emitido"""
+        with self.lock:
+            new = token not in self.entries
+            self.entries[token] = (time.time() + self.ttl, values)
+            self.entries.move_to_end(token)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+            if new:
+                # Renovar a validade não precisa ir para o disco
+                self._save()
+
+    def get(self, token: str) -> Optional[Dict]:
+        with self.lock:
+            entry = self.entries.get(token)
+            if entry is None or entry[0] < time.time():
+                return None
+            self.entries.move_to_end(token)
+            return entry[1]
+
+    def cleanup(self) -> int:
+        now = time.time()
+        with self.lock:
+            expired = [token for token, (expires, _) in self.entries.items() if expires < now]
+            for token in expired:
+                del self.entries[token]
+            if expired:
+                self._save()
+        return len(expired)
+
+
+class MessageHandle:
+    """Referência à mensagem do botão clicado.
+
+    O update do clique já traz o id da mensagem, então ``edit`` e
+    ``delete`` vão direto pelo evento, sem buscar a mensagem antes. A
+    mensagem completa só é baixada (uma vez) com ``fetch``, quando o
+    conteúdo dela é realmente necessário."""
+
+    def __init__(self, event):
+        self._event = event
+        self._message = None
+        self.chat_id = event.chat_id
+        msg_id = event.message_id
+        # Mensagens enviadas via modo inline não têm chat; o id é um TLObject
+        self.id = msg_id if isinstance(msg_id, int) else (msg_id.dc_id, msg_id.id)
+
+    async def edit(self, *args, **kwargs):
+        return await self._event.edit(*args, **kwargs)
+
+    async def delete(self, *args, **kwargs):
+        return await self._event.delete(*args, **kwargs)
+
+    async def fetch(self):
+        if self._message is None:
+            self._message = await self._event.get_message()
+        return self._message
+
+
+class CallbackContext:
+    """Dados de um clique entregues aos handlers de rota"""
+
+    def __init__(self, event, data: bytes, config: Optional[Dict]):
+        self.event = event
+        self.data = data
+        self.chat_id = event.chat_id
+        self.config = config
+        self.message = MessageHandle(event)
+
+
+class Route:
+    """Uma rota de callback: prefixo literal + parâmetros tipados.
+
+    O padrão ``"canal_list_{category_id*}_{page:int}"`` casa com o prefixo
+    ``canal_list``; os parâmetros são separados por ``_``. O parâmetro
+    marcado com ``*`` absorve os ``_`` excedentes (ids de categoria com
+    underscore); os demais ocupam um segmento cada, a partir das pontas."""
+
+    _PARAM = re.compile(r'\{(\w+)(\*)?(?::(\w+))?(?:=([^}]*))?\}')
+    _TYPES = {'str': str, 'int': int}
+
+    def __init__(self, pattern: str, handler: Callable, cost_class: str = 'cheap',
+                 requires_config: bool = False, owner_only: bool = False):
+        self.pattern = pattern
+        self.handler = handler
+        self.cost_class = cost_class
+        self.requires_config = requires_config
+        self.owner_only = owner_only
+
+        literal = pattern.split('{', 1)[0]
+        self.prefix = literal.rstrip('_')
+        self.code = (zlib.crc32(self.prefix.encode()) & 0xFFFF).to_bytes(2, 'big')
+        # finditer (e não findall): default ausente é None, não ''
+        self.params: List[Tuple[str, Callable, bool, Optional[str]]] = [
+            (m.group(1), self._TYPES[m.group(3) or 'str'], bool(m.group(2)), m.group(4))
+            for m in self._PARAM.finditer(pattern)
+        ]
+
+        self.calls = 0
+        self.errors = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+
+    def parse(self, rest: str) -> Optional[Dict]:
+        """Converte o trecho após o prefixo nos argumentos da rota"""
+        tokens = rest.split('_') if rest else []
+        params = self.params
+        values: Dict = {}
+
+        greedy_index = next((i for i, p in enumerate(params) if p[2]), None)
+        if greedy_index is None:
+            if len(tokens) > len(params):
+                return None
+            raw = tokens + [None] * (len(params) - len(tokens))
+        else:
+            right = len(params) - greedy_index - 1
+            if len(tokens) < greedy_index + 1 + right:
+                return None
+            middle_end = len(tokens) - right
+            raw = tokens[:greedy_index] + ['_'.join(tokens[greedy_index:middle_end])] + tokens[middle_end:]
+
+        for (name, cast, _, default), value in zip(params, raw):
+            if value is None:
+                if default is None:
+                    return None
+                value = default
+            try:
+                values[name] = cast(value)
+            except ValueError:
+                return None
+        return values
+
+    def unpack(self, data: bytes) -> Dict:
+        """Lê os parâmetros compactados por ``CallbackRouter.pack``"""
+        values: Dict = {}
+        pos = 0
+        for name, cast, _, _ in self.params:
+            raw, pos = _unpack_value(data, pos)
+            values[name] = cast(raw)
+        return values
+
+    def record(self, elapsed: float, failed: bool):
+        self.calls += 1
+        self.total_time += elapsed
+        self.max_time = max(self.max_time, elapsed)
+        if failed:
+            self.errors += 1
+
+
+class CallbackRouter:
+    """Despacho de callbacks por prefixo em dicionário.
+
+    A busca testa os prefixos possíveis do ``data`` do maior para o menor
+    (um por ``_``), então o custo depende do número de segmentos, não do
+    número de rotas. Cada rota guarda contadores de chamadas e latência.
+
+    Botões novos usam ``pack``: 2 bytes com o código da rota e os
+    parâmetros em varint. Valores extras (nome, logo, categoria...) vão
+    para o ``CallbackContextStore`` e o botão leva o token deles junto com
+    os parâmetros da rota; se o contexto se perder, a rota ainda abre e o
+    handler busca os dados de novo. Só quando os parâmetros da rota não
+    cabem em 64 bytes o botão leva apenas o token. O formato texto antigo
+    continua aceito para botões que já estão nos chats."""
+
+    def __init__(self, contexts: Optional[CallbackContextStore] = None):
+        self.routes: Dict[str, Route] = {}
+        self.codes: Dict[bytes, Route] = {}
+        self.contexts = contexts if contexts is not None else CallbackContextStore()
+
+    def add(self, pattern: str, handler: Callable, **options) -> Route:
+        route = Route(pattern, handler, **options)
+        other = self.codes.get(route.code)
+        if other is not None and other.prefix != route.prefix:
+            raise ValueError(f"Callback code collision: {route.prefix} / {other.prefix}")
+        self.routes[route.prefix] = route
+        self.codes[route.code] = route
+        return route
+
+    def route(self, pattern: str, **options):
+        """Decorador equivalente a ``add``"""
+        def decorator(handler):
+            self.add(pattern, handler, **options)
+            return handler
+        return decorator
+
+    def match(self, data: str) -> Tuple[Optional[Route], Optional[Dict]]:
+        cut = len(data)
+        while cut > 0:
+            route = self.routes.get(data[:cut])
+            if route is not None:
+                rest = data[cut + 1:] if cut < len(data) else ''
+                params = route.parse(rest)
+                if params is not None:
+                    return route, params
+            cut = data.rfind('_', 0, cut)
+        return None, None
+
+    def pack(self, prefix: str, **values) -> bytes:
+        """Monta o data de um botão para a rota ``prefix``"""
+        route = self.routes[prefix]
+        names = [name for name, _, _, _ in route.params]
+        body = bytearray([PACKED]) + route.code
+        for name, _, _, default in route.params:
+            value = values.get(name, default)
+            if value is None:
+                raise KeyError(f"{prefix}: missing callback parameter {name}")
+            body += _pack_value(value)
+
+        if len(body) <= MAX_CALLBACK_DATA and all(name in names for name in values):
+            return bytes(body)
+
+        extra = {name: value for name, value in values.items() if name not in names}
+        if extra and len(body) + TOKEN_SIZE <= MAX_CALLBACK_DATA:
+            return bytes([EXTRA]) + route.code + self.contexts.put(extra).encode() + bytes(body[3:])
+
+        for name, _, _, default in route.params:
+            values.setdefault(name, default)
+        return bytes([TOKEN]) + route.code + self.contexts.put(values).encode()
+
+    @staticmethod
+    def token_of(data: bytes) -> Optional[str]:
+        """Token do contexto levado pelo botão (None se não houver)"""
+        if data and data[0] == TOKEN:
+            return data[3:].decode()
+        if data and data[0] == EXTRA:
+            return data[3:3 + TOKEN_SIZE].decode()
+        return None
+
+    def decode(self, data: bytes) -> Tuple[Optional[Route], Optional[Dict]]:
+        """Interpreta o data recebido (binário ou texto antigo)"""
+        if not data or data[0] not in (PACKED, TOKEN, EXTRA):
+            return self.match(data.decode())
+
+        route = self.codes.get(data[1:3])
+        if route is None:
+            return None, None
+        if data[0] in (PACKED, EXTRA):
+            offset = 3 if data[0] == PACKED else 3 + TOKEN_SIZE
+            try:
+                values = route.unpack(data[offset:])
+            except (IndexError, ValueError, UnicodeDecodeError):
+                return None, None
+            if data[0] == EXTRA:
+                # Contexto perdido: os extras ficam no padrão do handler, que busca de novo
+                values.update(self.contexts.get(self.token_of(data)) or {})
+            return route, values
+
+        values = self.contexts.get(data[3:].decode())
+        if values is None:
+            raise ExpiredCallbackError(route.prefix)
+        values = dict(values)
+        for name, cast, _, _ in route.params:
+            values[name] = cast(values[name])
+        return route, values
+
+    async def dispatch(self, route: Route, ctx: CallbackContext, params: Dict):
+        """Executa o handler da rota medindo sua latência"""
+        started = time.perf_counter()
+        failed = False
+        try:
+            return await route.handler(ctx, **params)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            route.record(time.perf_counter() - started, failed)
+
+    def get_stats(self, limit: int = 10) -> List[Dict]:
+        """Rotas mais custosas (tempo total), com média e pico em ms"""
+        used = [r for r in self.routes.values() if r.calls]
+        used.sort(key=lambda r: r.total_time, reverse=True)
+        return [
+            {
+                'route': r.prefix,
+                'calls': r.calls,
+                'errors': r.errors,
+                'avg_ms': r.total_time / r.calls * 1000,
+                'max_ms': r.max_time * 1000
+            }
+            for r in used[:limit]
+        ]
+
+
+router = CallbackRouter()
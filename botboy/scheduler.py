@@ -0,0 +1,113 @@
+import asyncio
+import heapq
+import itertools
+from contextlib import asynccontextmanager
+from typing import Dict, Tuple
+from config import DOWNLOAD_RESERVED_CONNECTIONS
+
+
+class _AccountSlots:
+    """Vagas de conexão de uma conta do painel e sua fila de espera"""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.active = 0
+        self.waiting = []  # heap de (prioridade, ordem, future, on_position)
+        self.positions = {}  # future -> última posição informada
+
+    def notify_positions(self):
+        """Avisa apenas quem mudou de posição na fila"""
+        for position, (_, _, future, on_position) in enumerate(sorted(self.waiting), start=1):
+            if future.done() or self.positions.get(future) == position:
+                continue
+            self.positions[future] = position
+            if on_position:
+                asyncio.ensure_future(on_position(position))
+
+    def wake(self):
+        while self.waiting and self.active < self.capacity:
+            _, _, future, _ = heapq.heappop(self.waiting)
+            self.positions.pop(future, None)
+            if future.done():
+                continue
+            self.active += 1
+            future.set_result(True)
+        self.notify_positions()
+
+
+class DownloadScheduler:
+    """Fila de downloads que respeita o max_connections de cada conta.
+
+    Cada conta (servidor + usuário) tem ``max_connections`` vagas; quem
+    excede espera na fila em ordem de prioridade e chegada (menor valor
+    primeiro) e é avisado da sua posição. A vaga é sempre liberada ao
+    sair do bloco, mesmo em caso de erro."""
+
+    def __init__(self, reserved: int = DOWNLOAD_RESERVED_CONNECTIONS):
+        self.reserved = reserved
+        self.accounts: Dict[Tuple[str, str], _AccountSlots] = {}
+        self._order = itertools.count()
+
+    @staticmethod
+    def account_key(config: Dict) -> Tuple[str, str]:
+        return config['server'], config['username']
+
+    def capacity_from(self, server_info: Dict) -> int:
+        """Calcula as vagas de download a partir do estado da conta (account_state.server_info)"""
+        try:
+            max_connections = int((server_info or {}).get('max_connections') or 1)
+        except (TypeError, ValueError):
+            max_connections = 1
+        return max(1, max_connections - self.reserved)
+
+    def _slots(self, config: Dict, capacity: int) -> _AccountSlots:
+        key = self.account_key(config)
+        slots = self.accounts.get(key)
+        if slots is None:
+            slots = self.accounts[key] = _AccountSlots(capacity)
+        elif slots.capacity != capacity:
+            slots.capacity = capacity
+            slots.wake()
+        return slots
+
+    @asynccontextmanager
+    async def slot(self, config: Dict, capacity: int, priority: int = 0, on_position=None):
+        """Reserva uma conexão da conta durante o bloco ``async with``"""
+        slots = self._slots(config, capacity)
+
+        if slots.active < slots.capacity and not slots.waiting:
+            slots.active += 1
+        else:
+            future = asyncio.get_running_loop().create_future()
+            heapq.heappush(slots.waiting, (priority, next(self._order), future, on_position))
+            slots.notify_positions()
+            try:
+                await future
+            except asyncio.CancelledError:
+                if future.done() and not future.cancelled():
+                    # A vaga chegou junto com o cancelamento: devolve
+                    slots.active -= 1
+                    slots.wake()
+                else:
+                    slots.positions.pop(future, None)
+                    slots.waiting = [w for w in slots.waiting if w[2] is not future]
+                    heapq.heapify(slots.waiting)
+                    slots.notify_positions()
+                raise
+
+        try:
+            yield
+        finally:
+            slots.active -= 1
+            slots.wake()
+
+    def get_stats(self) -> Dict:
+        """Vagas em uso e fila por conta"""
+        return {
+            f"{server} ({username})": {
+                'active': slots.active,
+                'capacity': slots.capacity,
+                'queued': len(slots.waiting)
+            }
+            for (server, username), slots in self.accounts.items()
+        }
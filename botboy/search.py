@@ -0,0 +1,319 @@
+import asyncio
+import heapq
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict, defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from backend import backend
+from config import CACHE_TTL, SEARCH_MIN_SIMILARITY, SEARCH_BACKGROUND_MIN, SEARCH_MAX_INDEXES
+
+# Ação do painel -> tipo de conteúdo indexado
+LIST_ACTIONS = {'get_live_streams': 'live', 'get_vod_streams': 'movie', 'get_series': 'series'}
+CATEGORY_ACTIONS = {'get_live_categories': 'live', 'get_vod_categories': 'movie', 'get_series_categories': 'series'}
+DEFAULT_CATEGORY = {'live': 'Canais', 'movie': 'Filmes', 'series': 'Séries'}
+DEFAULT_CONTAINER = {'live': 'ts', 'movie': 'mp4', 'series': 'mp4'}
+
+_NON_WORD = re.compile(r'[^a-z0-9]+')
+
+
+def normalize(text: str) -> str:
+    """Minúsculas, sem acentos e só letras/números separados por espaço"""
+    decomposed = unicodedata.normalize('NFKD', str(text or ''))
+    folded = ''.join(ch for ch in decomposed if not unicodedata.combining(ch)).lower()
+    return _NON_WORD.sub(' ', folded).strip()
+
+
+def tokenize(text: str) -> List[str]:
+    return normalize(text).split()
+
+
+def trigrams(token: str) -> Set[str]:
+    padded = f" {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SearchIndex:
+    """Índice invertido de um tipo de conteúdo de uma conta.
+
+    Cada nome vira tokens sem acento (casamento exato e por prefixo) e
+    trigramas desses tokens (casamento aproximado, para erros de
+    digitação). As listas por categoria entram aos poucos; uma lista
+    completa gera um índice novo que substitui este de uma vez. Um índice
+    completo não muda mais e é dividido entre contas que receberam a mesma
+    lista (o mesmo resumo no CatalogStore do backend)."""
+
+    def __init__(self, kind: str):
+        self.kind = kind
+        self.docs: Dict[str, Dict] = {}
+        self.tokens: Dict[str, Set[str]] = defaultdict(set)
+        self.grams: Dict[str, Set[str]] = defaultdict(set)
+        self.complete = False
+        self.digest = None  # resumo da lista completa que gerou o índice
+        self.used = time.monotonic()
+        self.lock = threading.Lock()
+
+    def add(self, items: Iterable[Dict]):
+        id_key = 'series_id' if self.kind == 'series' else 'stream_id'
+        with self.lock:
+            for item in items:
+                if not isinstance(item, dict):
+                    continue
+                item_id = item.get(id_key, item.get('id'))
+                name = item.get('name')
+                if item_id is None or not name:
+                    continue
+                item_id = str(item_id)
+
+                existing = self.docs.get(item_id)
+                if existing is not None:
+                    existing['raw'] = item
+                    if existing['name'] == name:
+                        continue
+                    self._remove(item_id)
+
+                words = set(tokenize(name))
+                self.docs[item_id] = {'kind': self.kind, 'id': item_id, 'name': name,
+                                      'norm': normalize(name), 'words': words, 'raw': item}
+                for word in words:
+                    self.tokens[word].add(item_id)
+                    for gram in trigrams(word):
+                        self.grams[gram].add(item_id)
+
+    def _remove(self, item_id: str):
+        doc = self.docs.pop(item_id)
+        for word in doc['words']:
+            self.tokens[word].discard(item_id)
+            for gram in trigrams(word):
+                self.grams[gram].discard(item_id)
+
+    def _match_word(self, word: str) -> Dict[str, float]:
+        """Pontua os documentos para uma palavra da busca (exata > prefixo > parecida)"""
+        scores: Dict[str, float] = {item_id: 1.0 for item_id in self.tokens.get(word, ())}
+
+        query_grams = trigrams(word)
+        need = max(1, int(len(query_grams) * SEARCH_MIN_SIMILARITY + 0.999))
+        # Um documento com ``need`` trigramas em comum aparece em pelo menos
+        # uma das (total - need + 1) listas mais raras: só elas geram candidatos
+        postings = sorted((self.grams.get(gram, ()) for gram in query_grams), key=len)
+        candidates = set().union(*postings[:len(query_grams) - need + 1])
+
+        for item_id in candidates:
+            if item_id in scores:
+                continue
+            best = 0.0
+            for doc_word in self.docs[item_id]['words']:
+                if doc_word.startswith(word):
+                    best = 0.9
+                    break
+                shared = len(query_grams & trigrams(doc_word))
+                if shared >= need:
+                    best = max(best, 0.8 * shared / len(query_grams))
+            if best:
+                scores[item_id] = best
+        return scores
+
+    def score(self, words: List[str]) -> List[Tuple[tuple, Dict]]:
+        """(chave de ordenação, documento) de tudo que casou com a busca"""
+        norm_query = ' '.join(words)
+        totals: Dict[str, float] = defaultdict(float)
+        with self.lock:
+            for word in words:
+                for item_id, value in self._match_word(word).items():
+                    totals[item_id] += value
+
+            scored = []
+            for item_id, total in totals.items():
+                doc = self.docs[item_id]
+                value = total / len(words)
+                if doc['norm'].startswith(norm_query):
+                    value += 0.5
+                elif norm_query in doc['norm']:
+                    value += 0.25
+                scored.append(((value, -len(doc['norm'])), doc))
+        return scored
+
+
+class SearchEngine:
+    """Índices de busca por conta e tipo, alimentados pelas respostas do backend.
+
+    Os índices ficam em LRU (até ``max_indexes``). Um índice completo sai
+    quando a lista que o gerou sai do cache do backend (ou muda); um
+    parcial, depois de ``idle_ttl`` segundos sem uso."""
+
+    def __init__(self, max_indexes: int = SEARCH_MAX_INDEXES, idle_ttl: float = CACHE_TTL):
+        self.max_indexes = max_indexes
+        self.idle_ttl = idle_ttl
+        self.indexes: 'OrderedDict[tuple, SearchIndex]' = OrderedDict()
+        self.sources: Dict[tuple, tuple] = {}  # índice completo -> (servidor, params) da lista
+        self.categories: Dict[tuple, Dict[str, str]] = {}
+        self.building: Set[tuple] = set()
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def account(config: Dict) -> tuple:
+        return (config['server'], config['username'])
+
+    def on_catalog(self, config: Dict, params: Dict, data):
+        """Ouvinte do backend: indexa listas e categorias assim que chegam"""
+        action = params.get('action')
+        if not isinstance(data, list):
+            return
+        if action in CATEGORY_ACTIONS:
+            key = self.account(config) + (CATEGORY_ACTIONS[action],)
+            categories = {str(cat.get('category_id')): cat.get('category_name')
+                          for cat in data if isinstance(cat, dict)}
+            with self.lock:
+                self.categories[key] = categories
+        elif action in LIST_ACTIONS:
+            key = self.account(config) + (LIST_ACTIONS[action],)
+            if params.get('category_id'):
+                self._add_partial(key, data)
+            else:
+                self._rebuild(key, data, (config['server'], dict(params)))
+
+    def _add_partial(self, key: tuple, items: List[Dict]):
+        with self.lock:
+            index = self.indexes.get(key)
+            if index is None:
+                index = SearchIndex(key[2])
+                self._keep(key, index)
+        if not index.complete:
+            index.add(items)
+            index.used = time.monotonic()
+
+    def _keep(self, key: tuple, index: SearchIndex, source: Optional[tuple] = None):
+        """Registra o índice da chave (chamado com ``lock``), descartando os menos usados"""
+        self.indexes[key] = index
+        self.indexes.move_to_end(key)
+        if source is not None:
+            self.sources[key] = source
+        while len(self.indexes) > self.max_indexes:
+            self._evict(next(iter(self.indexes)))
+
+    def _evict(self, key: tuple):
+        self.indexes.pop(key, None)
+        self.sources.pop(key, None)
+        self.categories.pop(key, None)
+
+    def _rebuild(self, key: tuple, items: List[Dict], source: tuple):
+        """Lista completa: monta um índice novo e troca pelo atual"""
+        digest = backend.store.digest_for(items)
+
+        def build():
+            try:
+                index = self._shared(key[2], digest)
+                if index is None:
+                    index = SearchIndex(key[2])
+                    index.add(items)
+                    index.complete = True
+                    index.digest = digest
+                with self.lock:
+                    self._keep(key, index, source)
+            except Exception as e:
+                print(f"Search index error: {e}")
+            finally:
+                # Sem isso uma falha deixaria a conta marcada "em construção" para sempre
+                self.building.discard(key)
+
+        self.building.add(key)
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        if loop is not None and len(items) >= SEARCH_BACKGROUND_MIN:
+            # Chamado no loop do bot: catálogos grandes são indexados em thread
+            loop.run_in_executor(None, build)
+        else:
+            build()
+
+    def _shared(self, kind: str, digest: Optional[str]) -> Optional[SearchIndex]:
+        """Índice completo de outra conta gerado por esta mesma lista"""
+        if digest is None:
+            return None
+        with self.lock:
+            return next((index for key, index in self.indexes.items()
+                         if key[2] == kind and index.complete and index.digest == digest), None)
+
+    def cleanup(self):
+        """Remove índices de listas que saíram do cache e parciais sem uso"""
+        now = time.monotonic()
+        with self.lock:
+            for key, index in list(self.indexes.items()):
+                source = self.sources.get(key)
+                if source is not None:
+                    stale = backend.cached_at(*source) is None or backend.digest_of(*source) != index.digest
+                else:
+                    stale = now - index.used >= self.idle_ttl
+                if stale:
+                    self._evict(key)
+            for key in [key for key in self.categories if key not in self.indexes and key not in self.building]:
+                del self.categories[key]
+
+    def missing_kinds(self, config: Dict) -> List[str]:
+        """Tipos que ainda não têm a lista completa indexada (nem em construção)"""
+        account = self.account(config)
+        missing = []
+        for kind in LIST_ACTIONS.values():
+            index = self.indexes.get(account + (kind,))
+            if not (index and index.complete) and account + (kind,) not in self.building:
+                missing.append(kind)
+        return missing
+
+    def is_ready(self, config: Dict) -> bool:
+        account = self.account(config)
+        return not self.missing_kinds(config) and not any(key[:2] == account for key in list(self.building))
+
+    def search(self, config: Dict, query: str, kinds: Optional[Iterable[str]] = None,
+               limit: int = 10, offset: int = 0) -> Tuple[List[Dict], int]:
+        """Resultados ordenados por relevância e o total encontrado"""
+        words = tokenize(query)
+        if not words:
+            return [], 0
+        account = self.account(config)
+        scored = []
+        for kind in (kinds or LIST_ACTIONS.values()):
+            with self.lock:
+                index = self.indexes.get(account + (kind,))
+                if index is not None:
+                    self.indexes.move_to_end(account + (kind,))
+            if index is not None:
+                index.used = time.monotonic()
+                scored.extend(index.score(words))
+        best = heapq.nlargest(offset + limit, scored, key=lambda entry: entry[0])
+        return [doc for _, doc in best[offset:]], len(scored)
+
+    def find(self, config: Dict, kind: str, item_id) -> Optional[Dict]:
+        """Documento ``item_id`` do tipo ``kind`` no índice da conta (None se não houver)"""
+        with self.lock:
+            index = self.indexes.get(self.account(config) + (kind,))
+        return index.docs.get(str(item_id)) if index is not None else None
+
+    def item(self, config: Dict, doc: Dict) -> Dict:
+        """Dados do resultado no formato das seleções do M3U"""
+        raw = doc['raw']
+        kind = doc['kind']
+        categories = self.categories.get(self.account(config) + (kind,), {})
+        category = raw.get('category_name') or categories.get(str(raw.get('category_id')))
+        return {
+            'id': raw.get('series_id' if kind == 'series' else 'stream_id', raw.get('id')),
+            'name': doc['name'],
+            'logo': raw.get('cover' if kind == 'series' else 'stream_icon', '') or '',
+            'container': raw.get('container_extension') or DEFAULT_CONTAINER[kind],
+            'category': category or DEFAULT_CATEGORY[kind]
+        }
+
+    def get_stats(self) -> Dict:
+        with self.lock:
+            indexes = list(self.indexes.values())
+        distinct = {id(index): index for index in indexes}.values()
+        return {
+            'indexes': len(indexes),
+            'shared': len(indexes) - len(distinct),
+            'documents': sum(len(index.docs) for index in distinct),
+            'terms': sum(len(index.tokens) for index in distinct)
+        }
+
+
+search_engine = SearchEngine()
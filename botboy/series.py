@@ -1,4 +1,11 @@
 from telethon import Button
+from catalogo import catalog_index, episode_index, find_episode
+from config import PREFETCH_CATEGORIES
+from mirrors import mirrors
+from outbound import outbound
+from prefetch import prefetcher
+from render_cache import render_cache
+from router import router
 
 
 class SerieManager:
@@ -7,50 +14,61 @@ class SerieManager:
         self.backend = backend
         self.frontend = frontend
 
-    def get_categories(self, config):
+    def _params(self, config, action, **extra):
         params = {
             'username': config['username'],
             'password': config['password'],
-            'action': 'get_series_categories'
+            'action': action
         }
-        return self.backend.make_api_request(config, params) or []
+        params.update({key: value for key, value in extra.items() if value})
+        return params
+
+    def get_categories(self, config):
+        return self.backend.make_api_request(config, self._params(config, 'get_series_categories')) or []
 
     def get_series(self, config, category_id=None):
-        params = {
-            'username': config['username'],
-            'password': config['password'],
-            'action': 'get_series'
-        }
-        if category_id:
-            params['category_id'] = category_id
-        return self.backend.make_api_request(config, params) or []
+        return self.backend.make_api_request(config, self._params(config, 'get_series', category_id=category_id)) or []
+
+    def get_episode_index(self, config, series_id):
+        """Índice de temporadas/episódios da série (None se o painel não responder)"""
+        series_info = self.backend.make_api_request(config, self._params(config, 'get_series_info', series_id=series_id))
+        if not isinstance(series_info, dict):
+            return None
+        return episode_index(config, series_id, series_info)
 
     def get_episodes(self, config, series_id, season=None):
-        params = {
-            'username': config['username'],
-            'password': config['password'],
-            'action': 'get_series_info',
-            'series_id': series_id
+        index = self.get_episode_index(config, series_id)
+        if index is None:
+            return []
+        return index.season(season) if season else index.episodes
+
+    def _serie_data(self, serie):
+        """Resumo da série levado no contexto dos botões"""
+        return {
+            'id': serie.get('series_id', serie.get('id')),
+            'name': serie.get('name', 'Série'),
+            'cover': serie.get('cover', ''),
+            'category': serie.get('category_name', 'Séries')
         }
-        series_info = self.backend.make_api_request(config, params) or {}
 
-        if season:
-            return series_info.get('episodes', {}).get(str(season), [])
-
-        all_episodes = []
-        for season_num, episodes in series_info.get('episodes', {}).items():
-            for ep in episodes:
-                ep['season'] = season_num
-            all_episodes.extend(episodes)
-        return all_episodes
+    def _episode_data(self, ep, serie):
+        """Dados do episódio usados no M3U"""
+        return {
+            'id': ep.get('id'),
+            'name': f"{serie.get('name', 'Série')} - S{ep.get('season', '?')}E{ep.get('episode_num', '?')} - {ep.get('title', 'Episódio')}",
+            'logo': serie.get('cover', ''),
+            'container': ep.get('container_extension', 'mp4'),
+            'category': serie.get('category', 'Séries')
+        }
 
     async def show_categories(self, chat_id, message, config):
         try:
+            await self.backend.load(config, [self._params(config, 'get_series_categories')])
             categories = self.get_categories(config)
 
             if not categories:
                 buttons = self.frontend.create_error_buttons("menu_principal")
-                await message.edit("❌ Nenhuma categoria de séries encontrada.", buttons=buttons)
+                await outbound.edit(message, "❌ Nenhuma categoria de séries encontrada.", buttons=buttons)
                 return
 
             buttons = [[Button.inline("📺 Todas as Séries", data=b"serie_list_all_0")]]
@@ -59,8 +77,9 @@ class SerieManager:
                 cat_name = self.frontend.truncate_text(category['category_name'], 25)
                 cat_id = category['category_id']
                 buttons.append([
-                    Button.inline(f"📁 {cat_name}", data=f"serie_list_{cat_id}_0".encode()),
-                    Button.inline("📥➕", data=f"add_full_category_series_{cat_id}".encode()),
+                    Button.inline(f"📁 {cat_name}", data=router.pack("serie_list", category_id=cat_id, page=0)),
+                    Button.inline("📥➕", data=router.pack("add_full_category", category_type="series", category_id=cat_id,
+                                                          category_name=category['category_name'])),
                 ])
 
             buttons.append([Button.inline("🔙 Menu Principal", data=b"menu_principal")])
@@ -79,45 +98,110 @@ class SerieManager:
 Escolha uma categoria:"""
 
             try:
-                await message.edit(text, buttons=buttons, parse_mode='md')
+                await outbound.edit(message, text, buttons=buttons, parse_mode='md')
             except:
-                await self.client.send_message(chat_id, text, buttons=buttons, parse_mode='md')
+                await outbound.send_message(chat_id, text, buttons=buttons, parse_mode='md')
+
+            for category in categories[:PREFETCH_CATEGORIES]:
+                self.prefetch_page(config, category['category_id'], 0)
 
         except Exception as e:
             print(f"Error showing series categories: {e}")
             buttons = self.frontend.create_error_buttons("menu_principal")
-            await message.edit("❌ Erro ao carregar categorias.", buttons=buttons)
+            await outbound.edit(message, "❌ Erro ao carregar categorias.", buttons=buttons)
 
     async def show_series_list(self, chat_id, message, config, category_id, page=0):
         try:
-            series = self.get_series(config) if category_id == "all" else self.get_series(config, category_id)
-
-            if not series:
+            key = render_cache.key(config, "serie_list", category_id, page)
+            sources = self._list_sources(config, None if category_id == "all" else category_id)
+            await self.backend.load(config, sources)
+            rendered = render_cache.get(key, sources)
+            if rendered is None:
+                rendered = self._render_series_list(config, category_id, page)
+
+            if rendered is None:
                 buttons = self.frontend.create_error_buttons("menu_series")
-                await message.edit("❌ Nenhuma série encontrada.", buttons=buttons)
+                await outbound.edit(message, "❌ Nenhuma série encontrada.", buttons=buttons)
                 return
 
-            start_idx = page * self.frontend.items_per_page
-            end_idx = start_idx + self.frontend.items_per_page
-            page_series = series[start_idx:end_idx]
-
-            buttons = []
-            for s in page_series:
-                s_name = self.frontend.truncate_text(s.get('name', 'Sem nome'), 28)
-                sid = s.get('series_id', s.get('id', '0'))
-                buttons.append([
-                    Button.inline(f"📺 {s_name}", data=f"serie_episodes_{sid}".encode()),
-                    Button.inline("📥", data=f"serie_add_{sid}".encode()),
-                ])
+            text, markup = rendered
+            try:
+                await outbound.edit(message, text, buttons=markup, parse_mode='md')
+            except:
+                await outbound.send_message(chat_id, text, buttons=markup, parse_mode='md')
 
-            nav = self.frontend.create_pagination_buttons(page, len(series), "serie_list", category_id)
-            if nav:
-                buttons.append(nav)
+            self.prefetch_page(config, category_id, page + 1)
+            self.prefetch_episodes(config, category_id, page)
 
-            buttons.append([Button.inline("🔙 Categorias", data=b"menu_series")])
+        except Exception as e:
+            print(f"Error showing series: {e}")
+            buttons = self.frontend.create_error_buttons("menu_series")
+            await outbound.edit(message, "❌ Erro ao carregar séries.", buttons=buttons)
+
+    def _list_sources(self, config, list_category):
+        """Requisições de que uma página da lista depende"""
+        return [self._params(config, 'get_series', category_id=list_category)]
+
+    def _info_sources(self, config, series_id):
+        """Requisições de que as telas de temporadas e episódios dependem"""
+        return [self._params(config, 'get_series_info', series_id=series_id)]
+
+    def prefetch_page(self, config, category_id, page):
+        """Aquece a página da lista em segundo plano"""
+        key = render_cache.key(config, "serie_list", category_id, page)
+        list_category = None if category_id == "all" else category_id
+        sources = self._list_sources(config, list_category)
+        if render_cache.has(key, sources):
+            return
 
-            total_pages = (len(series) + self.frontend.items_per_page - 1) // self.frontend.items_per_page
-            text = f"""📺 **SÉRIES**
+        def render():
+            if page * self.frontend.items_per_page < len(self.get_series(config, list_category)):
+                self._render_series_list(config, category_id, page)
+
+        prefetcher.schedule(config, key, sources, render)
+
+    def prefetch_episodes(self, config, category_id, page):
+        """Aquece o ``get_series_info`` e as temporadas das séries visíveis na página"""
+        list_category = None if category_id == "all" else category_id
+        start_idx = page * self.frontend.items_per_page
+        for s in self.get_series(config, list_category)[start_idx:start_idx + self.frontend.items_per_page]:
+            sid = s.get('series_id', s.get('id', '0'))
+            serie = self._serie_data(s)
+            key = self._episodes_key(config, "serie_episodes", sid, None, 0, serie)
+            sources = self._info_sources(config, sid)
+            if render_cache.has(key, sources):
+                continue
+            prefetcher.schedule(config, key, sources, lambda sid=sid, serie=serie: self._render_seasons(config, sid, 0, serie))
+
+    def _render_series_list(self, config, category_id, page):
+        """Monta texto e teclado de uma página de séries (None se vazia)"""
+        list_category = None if category_id == "all" else category_id
+        series = self.get_series(config, list_category)
+        if not series:
+            return None
+
+        start_idx = page * self.frontend.items_per_page
+        end_idx = start_idx + self.frontend.items_per_page
+        page_series = series[start_idx:end_idx]
+
+        buttons = []
+        for s in page_series:
+            s_name = self.frontend.truncate_text(s.get('name', 'Sem nome'), 28)
+            sid = s.get('series_id', s.get('id', '0'))
+            serie = self._serie_data(s)
+            buttons.append([
+                Button.inline(f"📺 {s_name}", data=router.pack("serie_episodes", series_id=sid, page=0, serie=serie)),
+                Button.inline("📥", data=router.pack("serie_add", series_id=sid, serie=serie)),
+            ])
+
+        nav = self.frontend.create_pagination_buttons(page, len(series), "serie_list", category_id=category_id)
+        if nav:
+            buttons.append(nav)
+
+        buttons.append([Button.inline("🔙 Categorias", data=b"menu_series")])
+
+        total_pages = (len(series) + self.frontend.items_per_page - 1) // self.frontend.items_per_page
+        text = f"""📺 **SÉRIES**
 
 📊 **Página {page + 1} de {total_pages}**
 📺 **Total: {len(series)} séries**
@@ -125,51 +209,132 @@ Escolha uma categoria:"""
 
 Escolha uma série:"""
 
-            try:
-                await message.edit(text, buttons=buttons, parse_mode='md')
-            except:
-                await self.client.send_message(chat_id, text, buttons=buttons, parse_mode='md')
+        sources = self._list_sources(config, list_category)
+        key = render_cache.key(config, "serie_list", category_id, page)
+        return render_cache.put(key, sources, text, self.client.build_reply_markup(buttons))
 
-        except Exception as e:
-            print(f"Error showing series: {e}")
+    def _episodes_key(self, config, list_name, series_id, season, page, serie):
+        variant = (series_id, season, tuple(sorted(serie.items())) if serie else None)
+        return render_cache.key(config, list_name, variant, page)
+
+    async def _show_rendered(self, chat_id, message, rendered, empty_text):
+        if rendered is None:
             buttons = self.frontend.create_error_buttons("menu_series")
-            await message.edit("❌ Erro ao carregar séries.", buttons=buttons)
+            await outbound.edit(message, empty_text, buttons=buttons)
+            return
 
-    async def show_episodes(self, chat_id, message, config, series_id, page=0):
+        text, markup = rendered
         try:
-            episodes = self.get_episodes(config, series_id)
+            await outbound.edit(message, text, buttons=markup, parse_mode='md')
+        except:
+            await outbound.send_message(chat_id, text, buttons=markup, parse_mode='md')
 
-            if not episodes:
-                buttons = self.frontend.create_error_buttons("menu_series")
-                await message.edit("❌ Nenhum episódio encontrado.", buttons=buttons)
-                return
-
-            start_idx = page * self.frontend.items_per_page
-            end_idx = start_idx + self.frontend.items_per_page
-            page_episodes = episodes[start_idx:end_idx]
-
-            buttons = []
-            for ep in page_episodes:
-                ep_title = ep.get('title', f"Episódio {ep.get('episode_num', '?')}")
-                season = ep.get('season', '?')
-                ep_num = ep.get('episode_num', '?')
-                btn_text = f"▶️ S{season}E{ep_num} - {self.frontend.truncate_text(ep_title, 25)}"
-                ep_id = ep.get('id', '0')
+    async def show_episodes(self, chat_id, message, config, series_id, page=0, serie=None):
+        """Temporadas da série (ou os episódios direto, se houver só uma)"""
+        try:
+            await self.backend.load(config, self._info_sources(config, series_id))
+            rendered = render_cache.get(self._episodes_key(config, "serie_episodes", series_id, None, page, serie),
+                                        self._info_sources(config, series_id))
+            if rendered is None:
+                rendered = self._render_seasons(config, series_id, page, serie)
+            await self._show_rendered(chat_id, message, rendered, "❌ Nenhum episódio encontrado.")
 
-                buttons.append([
-                    Button.inline(btn_text, data=f"serie_play_{ep_id}".encode()),
-                    Button.inline("📥", data=f"serie_add_episode_{ep_id}".encode()),
-                    Button.inline("💾", data=f"download_options_episode_{ep_id}".encode()),
-                ])
+        except Exception as e:
+            print(f"Error showing episodes: {e}")
+            buttons = self.frontend.create_error_buttons("menu_series")
+            await outbound.edit(message, "❌ Erro ao carregar episódios.", buttons=buttons)
 
-            nav = self.frontend.create_pagination_buttons(page, len(episodes), "serie_episodes", series_id)
-            if nav:
-                buttons.append(nav)
+    async def show_season(self, chat_id, message, config, series_id, season, page=0, serie=None):
+        """Episódios de uma temporada, paginados"""
+        try:
+            await self.backend.load(config, self._info_sources(config, series_id))
+            rendered = render_cache.get(self._episodes_key(config, "serie_season", series_id, season, page, serie),
+                                        self._info_sources(config, series_id))
+            if rendered is None:
+                index = self.get_episode_index(config, series_id)
+                rendered = self._render_season(config, index, season, page, serie) if index else None
+            await self._show_rendered(chat_id, message, rendered, "❌ Nenhum episódio encontrado.")
 
+        except Exception as e:
+            print(f"Error showing season: {e}")
+            buttons = self.frontend.create_error_buttons("menu_series")
+            await outbound.edit(message, "❌ Erro ao carregar episódios.", buttons=buttons)
+
+    def _render_seasons(self, config, series_id, page, serie):
+        """Botões de temporada; com uma só temporada mostra os episódios"""
+        index = self.get_episode_index(config, series_id)
+        if index is None or not index.episodes:
+            return None
+        if len(index.seasons) == 1:
+            season = next(iter(index.seasons))
+            return self._render_season(config, index, season, page, serie, single=True)
+
+        serie = serie or index.summary()
+        buttons = []
+        row = []
+        for season, episodes in index.seasons.items():
+            row.append(Button.inline(f"📂 T{season} ({len(episodes)})",
+                                     data=router.pack("serie_season", series_id=series_id, season=season, page=0, serie=serie)))
+            if len(row) == 3:
+                buttons.append(row)
+                row = []
+        if row:
+            buttons.append(row)
+
+        buttons.append([Button.inline("📥 Adicionar série completa", data=router.pack("serie_add", series_id=series_id, serie=serie))])
+        buttons.append([Button.inline("🔙 Séries", data=b"menu_series")])
+
+        text = f"""📺 **{serie['name']}**
+
+📂 **{len(index.seasons)} temporadas**
+📺 **Total: {len(index.episodes)} episódios**
+
+Escolha uma temporada:"""
+
+        sources = self._info_sources(config, series_id)
+        return render_cache.put(self._episodes_key(config, "serie_episodes", series_id, None, page, serie), sources, text,
+                                self.client.build_reply_markup(buttons))
+
+    def _render_season(self, config, index, season, page, serie, single=False):
+        """Monta texto e teclado de uma página de episódios da temporada (None se vazia)"""
+        episodes = index.season(season)
+        if not episodes:
+            return None
+        serie = serie or index.summary()
+
+        start_idx = page * self.frontend.items_per_page
+        end_idx = start_idx + self.frontend.items_per_page
+        page_episodes = episodes[start_idx:end_idx]
+
+        buttons = []
+        for ep in page_episodes:
+            ep_title = ep.get('title', f"Episódio {ep.get('episode_num', '?')}")
+            btn_text = f"▶️ S{ep['season']}E{ep.get('episode_num', '?')} - {self.frontend.truncate_text(ep_title, 25)}"
+            ep_id = ep.get('id', '0')
+
+            buttons.append([
+                Button.inline(btn_text, data=router.pack("serie_play", episode_id=ep_id, ext=ep['container_extension'])),
+                Button.inline("📥", data=router.pack("serie_add_episode", episode_id=ep_id, item=self._episode_data(ep, serie))),
+                Button.inline("💾", data=router.pack("download_options", content_type="episode", stream_id=ep_id)),
+            ])
+
+        if single:
+            nav = self.frontend.create_pagination_buttons(page, len(episodes), "serie_episodes",
+                                                          series_id=index.series_id, serie=serie)
+        else:
+            nav = self.frontend.create_pagination_buttons(page, len(episodes), "serie_season",
+                                                          series_id=index.series_id, season=season, serie=serie)
+        if nav:
+            buttons.append(nav)
+
+        if single:
             buttons.append([Button.inline("🔙 Séries", data=b"menu_series")])
+        else:
+            buttons.append([Button.inline("🔙 Temporadas", data=router.pack("serie_episodes", series_id=index.series_id,
+                                                                            page=0, serie=serie))])
 
-            total_pages = (len(episodes) + self.frontend.items_per_page - 1) // self.frontend.items_per_page
-            text = f"""📺 **EPISÓDIOS DA SÉRIE**
+        total_pages = (len(episodes) + self.frontend.items_per_page - 1) // self.frontend.items_per_page
+        text = f"""📺 **{serie['name']}** — Temporada {season}
 
 📊 **Página {page + 1} de {total_pages}**
 📺 **Total: {len(episodes)} episódios**
@@ -178,38 +343,32 @@ Escolha uma série:"""
 
 Escolha um episódio:"""
 
-            try:
-                await message.edit(text, buttons=buttons, parse_mode='md')
-            except:
-                await self.client.send_message(chat_id, text, buttons=buttons, parse_mode='md')
-
-        except Exception as e:
-            print(f"Error showing episodes: {e}")
-            buttons = self.frontend.create_error_buttons("menu_series")
-            await message.edit("❌ Erro ao carregar episódios.", buttons=buttons)
+        sources = self._info_sources(config, index.series_id)
+        if single:
+            key = self._episodes_key(config, "serie_episodes", index.series_id, None, page, serie)
+        else:
+            key = self._episodes_key(config, "serie_season", index.series_id, season, page, serie)
+        return render_cache.put(key, sources, text, self.client.build_reply_markup(buttons))
 
-    async def add_to_m3u(self, event, config, series_id):
+    async def add_to_m3u(self, event, config, series_id, serie=None):
         """Adiciona série ao M3U"""
         try:
-            series_list = self.get_series(config)
-            serie = next((s for s in series_list if str(s.get('series_id', s.get('id'))) == str(series_id)), None)
+            if serie is None:
+                await self.backend.load(config, self._list_sources(config, None))
+                series_list = self.get_series(config)
+                found = catalog_index(series_list, ('series_id', 'id')).find(series_id) if isinstance(series_list, list) else None
 
-            if not serie:
-                await event.answer("❌ Série não encontrada!")
-                return
+                if not found:
+                    await event.answer("❌ Série não encontrada!")
+                    return
+                serie = self._serie_data(found)
 
+            await self.backend.load(config, self._info_sources(config, series_id))
             episodes = self.get_episodes(config, series_id)
             added_count = 0
 
             for ep in episodes:
-                ep_data = {
-                    'id': ep.get('id'),
-                    'name': f"{serie.get('name', 'Série')} - S{ep.get('season', '?')}E{ep.get('episode_num', '?')} - {ep.get('title', 'Episódio')}",
-                    'logo': serie.get('cover', ''),
-                    'container': ep.get('container_extension', 'mp4'),
-                    'category': serie.get('category_name', 'Séries')
-                }
-                if self.backend.add_to_selection(event.chat_id, 'series', ep_data):
+                if self.backend.add_to_selection(event.chat_id, 'series', self._episode_data(ep, serie)):
                     added_count += 1
 
             if added_count > 0:
@@ -221,16 +380,24 @@ Escolha um episódio:"""
             print(f"Error adding series to M3U: {e}")
             await event.answer("❌ Erro ao adicionar ao M3U")
 
-    async def add_episode_to_m3u(self, event, config, episode_id):
+    async def add_episode_to_m3u(self, event, config, episode_id, item=None):
         """Adiciona episódio individual ao M3U"""
         try:
-            ep_data = {
-                'id': episode_id,
-                'name': f"Episódio {episode_id}",
-                'logo': '',
-                'container': 'mp4',
-                'category': 'Séries'
-            }
+            found = find_episode(config, episode_id) if item is None else None
+            if item:
+                ep_data = dict(item)
+            elif found:
+                index, episode = found
+                ep_data = self._episode_data(episode, index.summary())
+            else:
+                # Botão antigo de uma série que ainda não foi indexada
+                ep_data = {
+                    'id': episode_id,
+                    'name': f"Episódio {episode_id}",
+                    'logo': '',
+                    'container': 'mp4',
+                    'category': 'Séries'
+                }
             added = self.backend.add_to_selection(event.chat_id, 'series', ep_data)
 
             if added:
@@ -242,51 +409,45 @@ Escolha um episódio:"""
             print(f"Error adding episode: {e}")
             await event.answer("❌ Erro ao adicionar episódio")
 
-    async def handle_callback(self, event, config):
-        if not config:
-            await event.answer("❌ Configure uma playlist primeiro!")
-            return
+    async def play_episode(self, chat_id, message, config, episode_id, ext=None):
+        """Mostra a URL direta do episódio"""
+        if ext is None:
+            found = find_episode(config, episode_id)
+            ext = found[1]['container_extension'] if found else 'mp4'
+        play_url = mirrors.stream_url(config, 'series', episode_id, ext)
+        buttons = [
+            [Button.url("▶️ Reproduzir", play_url)],
+            [Button.inline("🔙 Voltar", data=b"menu_series")],
+        ]
+        text = f"▶️ **Reproduzir Episódio**\n\n🔗 `{play_url}`"
+        try:
+            await outbound.edit(message, text, buttons=buttons, parse_mode='md')
+        except:
+            await outbound.send_message(chat_id, text, buttons=buttons, parse_mode='md')
 
-        data = event.data.decode()
-        chat_id = event.chat_id
-        message = await event.get_message()
+    def register_routes(self, router):
+        """Registra as rotas de callback de séries"""
+        async def list_series(ctx, category_id, page):
+            await self.show_series_list(ctx.chat_id, ctx.message, ctx.config, category_id, page)
 
-        try:
-            if data.startswith("serie_list_"):
-                parts = data.split("_")
-                if len(parts) >= 4:
-                    category_id = parts[2]
-                    page = int(parts[3])
-                    await self.show_series_list(chat_id, message, config, category_id, page)
-
-            elif data.startswith("serie_episodes_"):
-                parts = data.split("_")
-                series_id = parts[2]
-                page = int(parts[3]) if len(parts) > 3 else 0
-                await self.show_episodes(chat_id, message, config, series_id, page)
-
-            elif data.startswith("serie_add_episode_"):
-                episode_id = data.split("_")[3]
-                await self.add_episode_to_m3u(event, config, episode_id)
-
-            elif data.startswith("serie_add_"):
-                series_id = data.split("_")[2]
-                await self.add_to_m3u(event, config, series_id)
-
-            elif data.startswith("serie_play_"):
-                episode_id = data.split("_")[2]
-                # Para episódios, mostra a URL direta
-                play_url = f"{config['server']}/series/{config['username']}/{config['password']}/{episode_id}.mp4"
-                buttons = [
-                    [Button.url("▶️ Reproduzir", play_url)],
-                    [Button.inline("🔙 Voltar", data=b"menu_series")],
-                ]
-                text = f"▶️ **Reproduzir Episódio**\n\n🔗 `{play_url}`"
-                try:
-                    await message.edit(text, buttons=buttons, parse_mode='md')
-                except:
-                    await self.client.send_message(chat_id, text, buttons=buttons, parse_mode='md')
+        async def episodes(ctx, series_id, page, serie=None):
+            await self.show_episodes(ctx.chat_id, ctx.message, ctx.config, series_id, page, serie)
 
-        except Exception as e:
-            print(f"Error in series callback: {e}")
-            await event.answer("❌ Erro interno")
+        async def add_episode(ctx, episode_id, item=None):
+            await self.add_episode_to_m3u(ctx.event, ctx.config, episode_id, item)
+
+        async def add(ctx, series_id, serie=None):
+            await self.add_to_m3u(ctx.event, ctx.config, series_id, serie)
+
+        async def season(ctx, series_id, season, page, serie=None):
+            await self.show_season(ctx.chat_id, ctx.message, ctx.config, series_id, season, page, serie)
+
+        async def play(ctx, episode_id, ext=None):
+            await self.play_episode(ctx.chat_id, ctx.message, ctx.config, episode_id, ext)
+
+        router.add("serie_list_{category_id*}_{page:int}", list_series, requires_config=True)
+        router.add("serie_episodes_{series_id}_{page:int=0}", episodes, requires_config=True)
+        router.add("serie_season_{series_id}_{season}_{page:int=0}", season, requires_config=True)
+        router.add("serie_add_episode_{episode_id}", add_episode, requires_config=True)
+        router.add("serie_add_{series_id}", add, requires_config=True)
+        router.add("serie_play_{episode_id}", play, requires_config=True)
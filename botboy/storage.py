@@ -0,0 +1,206 @@
+import os
+import shutil
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+from config import DOWNLOAD_DIR, DOWNLOAD_QUOTA, DOWNLOAD_MIN_FREE, DOWNLOAD_RESERVE_STEP, DOWNLOAD_MAX_AGE
+
+
+# Marca gravada ao lado de cada arquivo completo, com o tamanho final
+COMPLETE_SUFFIX = '.complete'
+
+
+class StorageFullError(Exception):
+    """Não há espaço (cota ou disco) para o arquivo pedido"""
+
+
+class FileBusyError(Exception):
+    """O arquivo já está sendo gravado por outro download"""
+
+
+class Reservation:
+    """Espaço reservado para um arquivo sendo gravado em DOWNLOAD_DIR"""
+
+    def __init__(self, manager: 'StorageManager', name: str, size: int):
+        self.manager = manager
+        self.name = name
+        self.path = os.path.join(manager.directory, name)
+        self.reserved = size
+        self.written = 0
+
+    def write(self, f, chunk: bytes):
+        """Grava o pedaço, ampliando a reserva em passos quando o tamanho é desconhecido"""
+        if self.written + len(chunk) > self.reserved:
+            self.manager.grow(self, max(DOWNLOAD_RESERVE_STEP, len(chunk)))
+        f.write(chunk)
+        self.written += len(chunk)
+
+    def complete(self):
+        self.manager.complete(self)
+
+    def discard(self):
+        self.manager.release(self.name)
+
+
+class StorageManager:
+    """Controle de espaço do DOWNLOAD_DIR.
+
+    Mantém um registro dos arquivos (em gravação ou completos) em ordem
+    de uso. Antes de gravar, o espaço é reservado contra a cota total e o
+    espaço livre do disco; se faltar, os arquivos completos usados há mais
+    tempo são removidos primeiro (LRU)."""
+
+    def __init__(self, directory: str = DOWNLOAD_DIR, quota: int = DOWNLOAD_QUOTA, min_free: int = DOWNLOAD_MIN_FREE):
+        self.directory = directory
+        self.quota = quota
+        self.min_free = min_free
+        self.files: 'OrderedDict[str, Dict]' = OrderedDict()
+
+        if not os.path.exists(self.directory):
+            os.makedirs(self.directory)
+        self._adopt_existing()
+
+    def _marker_path(self, name: str) -> str:
+        return os.path.join(self.directory, name + COMPLETE_SUFFIX)
+
+    def _marked_size(self, name: str) -> Optional[int]:
+        try:
+            with open(self._marker_path(name), 'r') as f:
+                return int(f.read().strip())
+        except (OSError, ValueError):
+            return None
+
+    def _adopt_existing(self):
+        """Registra arquivos que sobraram de execuções anteriores (varredura única).
+
+        Só entram os que têm a marca de completo com o tamanho igual ao do
+        disco; o resto (gravação interrompida, marca órfã) é apagado."""
+        names = [n for n in os.listdir(self.directory) if os.path.isfile(os.path.join(self.directory, n))]
+        for filename in sorted(names, key=lambda n: os.path.getmtime(os.path.join(self.directory, n))):
+            filepath = os.path.join(self.directory, filename)
+            if filename.endswith(COMPLETE_SUFFIX):
+                if not os.path.isfile(filepath[:-len(COMPLETE_SUFFIX)]):
+                    self._remove(filepath)
+                continue
+            size = os.path.getsize(filepath)
+            if self._marked_size(filename) != size:
+                print(f"Removing incomplete download file: {filename}")
+                self.release(filename)
+                continue
+            self.files[filename] = {
+                'size': size,
+                'complete': True,
+                'last_access': os.path.getmtime(filepath)
+            }
+
+    def used_bytes(self) -> int:
+        return sum(entry['size'] for entry in self.files.values())
+
+    def _disk_free(self) -> int:
+        try:
+            return shutil.disk_usage(self.directory).free
+        except OSError:
+            return 0
+
+    def _pending_bytes(self) -> int:
+        """Bytes reservados que ainda não chegaram ao disco"""
+        pending = 0
+        for name, entry in self.files.items():
+            if not entry['complete']:
+                filepath = os.path.join(self.directory, name)
+                written = os.path.getsize(filepath) if os.path.exists(filepath) else 0
+                pending += max(0, entry['size'] - written)
+        return pending
+
+    def _make_room(self, needed: int, exclude: Optional[str] = None):
+        """Remove arquivos completos (LRU) até caber ``needed`` bytes"""
+        def fits():
+            within_quota = self.used_bytes() + needed <= self.quota
+            return within_quota and self._disk_free() - self._pending_bytes() - needed >= self.min_free
+
+        if needed > self.quota:
+            raise StorageFullError(f"{needed} bytes excedem a cota de {self.quota} bytes")
+
+        for name in list(self.files):
+            if fits():
+                return
+            entry = self.files[name]
+            if entry['complete'] and name != exclude:
+                self.release(name)
+
+        if not fits():
+            raise StorageFullError(f"Sem espaço para {needed} bytes em {self.directory}")
+
+    def reserve(self, name: str, size: int = 0) -> Reservation:
+        """Reserva espaço para ``name``. Com ``size`` 0 a reserva cresce durante a gravação.
+
+        Levanta ``FileBusyError`` se outro download ainda estiver gravando ``name``."""
+        entry = self.files.get(name)
+        if entry is not None and not entry['complete']:
+            raise FileBusyError(f"{name} já está sendo gravado")
+        initial = size if size > 0 else DOWNLOAD_RESERVE_STEP
+        self.release(name)
+        self._make_room(initial)
+        self.files[name] = {'size': initial, 'complete': False, 'last_access': time.time()}
+        return Reservation(self, name, initial)
+
+    def grow(self, reservation: Reservation, extra: int):
+        self._make_room(extra, exclude=reservation.name)
+        reservation.reserved += extra
+        self.files[reservation.name]['size'] = reservation.reserved
+
+    def complete(self, reservation: Reservation):
+        """Marca o arquivo como completo (passa a ser candidato a remoção)"""
+        entry = self.files.get(reservation.name)
+        if entry:
+            try:
+                with open(self._marker_path(reservation.name), 'w') as f:
+                    f.write(str(reservation.written))
+            except OSError as e:
+                print(f"Error marking download file {reservation.name}: {e}")
+            entry.update(size=reservation.written, complete=True, last_access=time.time())
+            self.files.move_to_end(reservation.name)
+
+    def lookup(self, name: str) -> Optional[str]:
+        """Caminho de um arquivo completo, marcando-o como usado recentemente"""
+        entry = self.files.get(name)
+        if not entry or not entry['complete']:
+            return None
+        filepath = os.path.join(self.directory, name)
+        if not os.path.exists(filepath):
+            self.release(name)
+            return None
+        entry['last_access'] = time.time()
+        self.files.move_to_end(name)
+        return filepath
+
+    def release(self, name: str):
+        """Remove o arquivo, a marca de completo e a entrada do registro"""
+        self.files.pop(name, None)
+        self._remove(self._marker_path(name))
+        self._remove(os.path.join(self.directory, name))
+
+    @staticmethod
+    def _remove(filepath: str):
+        try:
+            if os.path.exists(filepath):
+                os.remove(filepath)
+        except OSError as e:
+            print(f"Error removing download file {os.path.basename(filepath)}: {e}")
+
+    def cleanup(self, max_age: int = DOWNLOAD_MAX_AGE) -> int:
+        """Remove arquivos completos sem uso há mais de ``max_age`` segundos"""
+        cutoff = time.time() - max_age
+        expired = [name for name, entry in self.files.items() if entry['complete'] and entry['last_access'] < cutoff]
+        for name in expired:
+            self.release(name)
+            print(f"Removed old download file: {name}")
+        return len(expired)
+
+    def get_stats(self) -> Dict:
+        return {
+            'files': len(self.files),
+            'used_bytes': self.used_bytes(),
+            'quota': self.quota,
+            'disk_free': self._disk_free()
+        }
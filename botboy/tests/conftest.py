@@ -0,0 +1,49 @@
+import json
+import os
+import sys
+import pytest
+
+# Os módulos do bot se importam pelo nome (``from backend import backend``)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class FakeResponse:
+    def __init__(self, data):
+        self.status_code = 200
+        self.content = json.dumps(data).encode()
+        self.text = self.content.decode()
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class FakePanel:
+    """Substitui ``backend._request``: responde ``bodies[(usuário, ação)]`` ou ``bodies[ação]``"""
+
+    def __init__(self):
+        self.bodies = {}
+        self.calls = []
+
+    def __call__(self, config, params):
+        self.calls.append((config['username'], params.get('action')))
+        key = (config['username'], params.get('action'))
+        return FakeResponse(self.bodies.get(key, self.bodies.get(params.get('action'))))
+
+
+@pytest.fixture
+def panel(monkeypatch):
+    from backend import backend
+    fake = FakePanel()
+    monkeypatch.setattr(backend, '_request', fake)
+    monkeypatch.setattr(backend, 'cache_time', backend.cache_time)
+    backend.clear_cache()
+    yield fake
+    backend.clear_cache()
+
+
+def account(username: str, server: str = 'http://painel') -> dict:
+    return {'server': server, 'username': username, 'password': f'{username}-pw'}
+
+
+def params(config: dict, action: str, **extra) -> dict:
+    return dict({'username': config['username'], 'password': config['password'], 'action': action}, **extra)
@@ -0,0 +1,89 @@
+import threading
+import time
+from admission import AdmissionController, INTERACTIVE, BULK, BACKGROUND
+
+SERVER = 'http://painel'
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condição não atingida"
+        time.sleep(0.005)
+
+
+def queue(controller, order, user, priority):
+    """Entra na fila numa thread e anota ``(usuário, prioridade)`` ao ser admitido"""
+    depth = controller._gate(SERVER).depth()
+
+    def run():
+        if controller.acquire(SERVER, user, priority):
+            order.append((user, priority))
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    wait_for(lambda: controller._gate(SERVER).depth() == depth + 1)
+    return thread
+
+
+def test_free_slots_admit_immediately_up_to_capacity():
+    controller = AdmissionController(capacity=2, timeout=0.05)
+    assert controller.acquire(SERVER, 'a')
+    assert controller.acquire(SERVER, 'b')
+    assert not controller.acquire(SERVER, 'c')
+    stats = controller.get_stats()[SERVER]
+    assert stats['active'] == 2 and stats['timeouts'] == 1
+    assert controller.acquire('http://outro', 'c')
+
+
+def test_no_wait_and_background_are_rejected_when_full():
+    controller = AdmissionController(capacity=1)
+    assert controller.acquire(SERVER, 'a', wait=False)
+    started = time.monotonic()
+    assert not controller.acquire(SERVER, 'b', wait=False)
+    assert not controller.acquire(SERVER, 'b', BACKGROUND)
+    assert time.monotonic() - started < 0.5
+    assert controller.get_stats()[SERVER]['rejected'] == 2
+
+
+def test_queue_limits_reject_on_the_spot():
+    controller = AdmissionController(capacity=1, max_queue=3, max_per_user=2)
+    controller.acquire(SERVER, 'a')
+    order = []
+    threads = [queue(controller, order, 'a', INTERACTIVE), queue(controller, order, 'a', INTERACTIVE)]
+    assert not controller.acquire(SERVER, 'a')
+    threads.append(queue(controller, order, 'b', INTERACTIVE))
+    assert not controller.acquire(SERVER, 'c')
+
+    for _ in range(4):
+        controller.release(SERVER)
+    for thread in threads:
+        thread.join(2)
+    assert len(order) == 3
+
+
+def test_priority_first_then_users_in_turn():
+    controller = AdmissionController(capacity=1)
+    controller.acquire(SERVER, 'ocupante')
+    order = []
+    threads = [
+        queue(controller, order, 'a', BULK),
+        queue(controller, order, 'a', INTERACTIVE),
+        queue(controller, order, 'a', INTERACTIVE),
+        queue(controller, order, 'b', INTERACTIVE),
+    ]
+    for expected in range(1, len(threads) + 1):
+        controller.release(SERVER)
+        wait_for(lambda: len(order) == expected)
+    for thread in threads:
+        thread.join(2)
+    assert order == [('a', INTERACTIVE), ('b', INTERACTIVE), ('a', INTERACTIVE), ('a', BULK)]
+
+
+def test_slot_returns_the_place_on_exit():
+    controller = AdmissionController(capacity=1)
+    with controller.slot(SERVER, 'a') as admitted:
+        assert admitted
+        with controller.slot(SERVER, 'b', wait=False) as second:
+            assert not second
+    assert controller.get_stats()[SERVER]['active'] == 0
@@ -0,0 +1,127 @@
+import asyncio
+import threading
+import health
+from backend import backend
+from config import BREAKER_FAILURES, BREAKER_COOLDOWN
+from conftest import FakeResponse, account, params
+from health import ServerHealth
+
+MOVIES = [{'stream_id': 1, 'name': 'Filme'}]
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_event_loop_never_waits_on_the_panel(panel, monkeypatch):
+    config = account('alice')
+    request = params(config, 'get_vod_streams')
+    panel.bodies['get_vod_streams'] = MOVIES
+    threads = []
+    fake = backend._request
+
+    def request_in_thread(config, params):
+        threads.append(threading.current_thread())
+        return fake(config, params)
+
+    monkeypatch.setattr(backend, '_request', request_in_thread)
+
+    async def scenario():
+        assert backend.make_api_request(config, request) is None
+        while backend.cached_at(config['server'], request) is None:
+            await asyncio.sleep(0.01)
+
+    asyncio.run(asyncio.wait_for(scenario(), 2))
+    assert threads and threads[0] is not threading.main_thread()
+    assert backend.make_api_request(config, request) == MOVIES
+    assert not backend.negative_cache
+
+
+def test_load_fetches_missing_sources_off_the_loop(panel):
+    config = account('alice')
+    panel.bodies['get_vod_streams'] = MOVIES
+
+    async def scenario():
+        await backend.load(config, [params(config, 'get_vod_streams')])
+        return backend.make_api_request(config, params(config, 'get_vod_streams'))
+
+    assert asyncio.run(scenario()) == MOVIES
+    assert len(panel.calls) == 1
+
+
+def test_request_never_sent_is_not_negatively_cached(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(health.time, 'monotonic', clock)
+    monkeypatch.setattr(backend, 'health', ServerHealth())
+    monkeypatch.setattr(backend.policy, 'request', lambda url, request_params, host: FakeResponse(MOVIES))
+    backend.clear_cache()
+    config = account('alice')
+    request = params(config, 'get_vod_streams')
+
+    for _ in range(BREAKER_FAILURES):
+        backend.health.failure(config['server'])
+    clock.now += BREAKER_COOLDOWN
+    assert backend.health.allow(config['server'])  # a requisição de teste já saiu
+
+    assert backend.make_api_request(config, request) is None
+    assert not backend.negative_cache
+
+    backend.health.success(config['server'])
+    assert backend.make_api_request(config, request) == MOVIES
+    backend.clear_cache()
+
+
+def test_full_category_is_read_in_thread_and_applied_on_the_loop(panel):
+    config = account('alice')
+    panel.bodies['get_vod_streams'] = MOVIES + [{'stream_id': 2, 'name': 'Outro'}]
+    backend.user_selections.pop(7, None)
+    progress = []
+
+    items = backend.collect_full_category(config, 'movies', '5', 'Minha lista',
+                                          progress_callback=lambda done, total: progress.append((done, total)))
+    assert 7 not in backend.user_selections
+    assert progress == [(1, 2), (2, 2)]
+    assert [data['category'] for _, data in items] == ['Minha lista', 'Minha lista']
+
+    backend.add_to_selection(7, 'movies', dict(items[0][1]))
+    assert backend.add_selections(7, items) == 1
+    assert backend.get_selection_stats(7)['movies'] == 2
+    backend.user_selections.pop(7, None)
+
+
+def test_shared_state_survives_concurrent_threads(panel):
+    config = account('alice')
+    panel.bodies['get_vod_streams'] = MOVIES
+    request = params(config, 'get_vod_streams')
+    backend.make_api_request(config, request)
+    before = backend.get_stats()['total_requests']
+    errors = []
+
+    def reader():
+        try:
+            for _ in range(2000):
+                assert backend.make_api_request(config, request) == MOVIES
+        except Exception as e:
+            errors.append(e)
+
+    def churn():
+        try:
+            for n in range(2000):
+                backend.seed_cache(config['server'], params(config, 'get_vod_streams', category_id=n), MOVIES)
+                backend.clean_expired_cache()
+                backend.clean_negative_cache()
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=reader) for _ in range(4)] + [threading.Thread(target=churn)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    assert backend.get_stats()['total_requests'] - before == 4 * 2000
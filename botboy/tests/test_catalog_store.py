@@ -0,0 +1,78 @@
+from backend import backend
+from catalog_store import CatalogStore
+from conftest import account, params
+
+MOVIES = [{'stream_id': 1, 'name': 'Filme'}, {'stream_id': 2, 'name': 'Outro'}]
+
+
+def test_same_digest_is_kept_once_and_freed_with_the_last_reference():
+    store = CatalogStore()
+    first = store.put('abc', ['a'], size=10)
+    second = store.put('abc', ['a'], size=10)
+    assert second is first
+    assert store.get_stats() == {'reused': 1, 'bytes_saved': 10, 'catalogs': 1, 'refs': 2, 'bytes': 10}
+
+    store.release('abc')
+    assert store.lookup('abc') is first
+    store.release('abc')
+    assert store.lookup('abc') is None
+    store.release('abc')
+    assert store.get_stats()['refs'] == 0
+
+
+def test_derived_structures_live_with_their_content():
+    store = CatalogStore()
+    data = store.put('abc', ['a', 'b'])
+    builds = []
+
+    def build():
+        builds.append(1)
+        return {item: n for n, item in enumerate(data)}
+
+    assert store.derived(data, 'index', build) is store.derived(data, 'index', build)
+    assert len(builds) == 1
+
+    store.release('abc')
+    store.derived(data, 'index', build)
+    assert len(builds) == 2
+    assert store.derived(['solto'], 'index', lambda: 'novo') == 'novo'
+
+
+def test_derive_depends_on_digest_and_part():
+    assert CatalogStore.derive('abc', 1) == CatalogStore.derive('abc', 1)
+    assert CatalogStore.derive('abc', 1) != CatalogStore.derive('abc', 2)
+    assert CatalogStore.derive('abc', 1) != CatalogStore.derive('abd', 1)
+
+
+def test_accounts_with_the_same_catalog_share_one_object(panel):
+    alice, bob = account('alice'), account('bob')
+    panel.bodies['get_vod_streams'] = MOVIES
+    first = backend.make_api_request(alice, params(alice, 'get_vod_streams'))
+    second = backend.make_api_request(bob, params(bob, 'get_vod_streams'))
+
+    assert first == MOVIES
+    assert second is first
+    assert len(panel.calls) == 2
+    stats = backend.store.get_stats()
+    assert stats['catalogs'] == 1 and stats['refs'] == 2 and stats['reused'] == 1
+
+
+def test_different_catalogs_are_not_mixed(panel):
+    alice, bob = account('alice'), account('bob')
+    panel.bodies['get_vod_streams'] = MOVIES
+    panel.bodies[('bob', 'get_vod_streams')] = MOVIES[:1]
+    assert backend.make_api_request(alice, params(alice, 'get_vod_streams')) == MOVIES
+    assert backend.make_api_request(bob, params(bob, 'get_vod_streams')) == MOVIES[:1]
+    assert backend.store.get_stats()['catalogs'] == 2
+
+
+def test_expired_entries_release_the_shared_content(panel):
+    alice, bob = account('alice'), account('bob')
+    panel.bodies['get_vod_streams'] = MOVIES
+    for config in (alice, bob):
+        backend.make_api_request(config, params(config, 'get_vod_streams'))
+
+    backend.cache_time = -1
+    backend.clean_expired_cache()
+    assert backend.store.get_stats()['catalogs'] == 0
+    assert not backend.cache
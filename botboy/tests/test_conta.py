@@ -0,0 +1,99 @@
+import threading
+import conta
+from conftest import account
+from conta import AccountState
+
+GOOD = {'user_info': {'auth': 1, 'status': 'Active', 'exp_date': '1999999999', 'max_connections': '3'},
+        'server_info': {}}
+REFUSED = {'user_info': {'auth': 0}}
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_state(monkeypatch):
+    """Estado com relógio falso e painel que só aceita a senha ``certa``"""
+    clock = Clock()
+    calls = []
+    monkeypatch.setattr(conta.time, 'time', clock)
+
+    def request(config, params, background=False, cached=True, priority=None):
+        calls.append(params['password'])
+        return GOOD if params['password'] == 'certa' else REFUSED
+
+    monkeypatch.setattr(conta.backend, 'make_api_request', request)
+    return AccountState(ttl=60), clock, calls
+
+
+def test_wrong_password_is_not_served_from_the_cache(monkeypatch):
+    state, _, calls = make_state(monkeypatch)
+    right = dict(account('alice'), password='certa')
+    wrong = dict(account('alice'), password='errada')
+
+    assert state.is_valid(right)
+    assert not state.is_valid(wrong)
+    assert state.server_info(wrong)['exp_date'] == 'N/A'
+    assert calls == ['certa', 'errada', 'errada']
+    assert state.server_info(right)['max_connections'] == '3'
+    assert calls == ['certa', 'errada', 'errada']
+
+
+def test_answer_is_reused_until_it_expires(monkeypatch):
+    state, clock, calls = make_state(monkeypatch)
+    right = dict(account('alice'), password='certa')
+    for _ in range(3):
+        assert state.is_valid(right)
+    assert len(calls) == 1
+
+    clock.now += 60
+    assert state.is_valid(right)
+    assert len(calls) == 2
+
+
+def test_refusals_are_not_cached_and_cleanup_drops_old_entries(monkeypatch):
+    state, clock, calls = make_state(monkeypatch)
+    wrong = dict(account('alice'), password='errada')
+    assert not state.is_valid(wrong) and not state.is_valid(wrong)
+    assert len(calls) == 2
+
+    state.is_valid(dict(account('alice'), password='certa'))
+    clock.now += 60
+    state.cleanup()
+    assert not state.entries and not state.locks
+
+
+def test_simultaneous_lookups_share_one_request(monkeypatch):
+    state, _, calls = make_state(monkeypatch)
+    right = dict(account('alice'), password='certa')
+    release = threading.Event()
+
+    def slow(config, params, background=False, cached=True, priority=None):
+        calls.append(params['password'])
+        release.wait(2)
+        return GOOD
+
+    monkeypatch.setattr(conta.backend, 'make_api_request', slow)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(state.is_valid(right))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    release.set()
+    for thread in threads:
+        thread.join(2)
+
+    assert results == [True] * 4
+    assert calls == ['certa']
+
+
+def test_refresh_goes_back_to_the_panel(monkeypatch):
+    state, clock, calls = make_state(monkeypatch)
+    right = dict(account('alice'), password='certa')
+    state.get(right)
+    clock.now += 1
+    state.get(right, refresh=True)
+    assert len(calls) == 2
@@ -0,0 +1,51 @@
+import asyncio
+from backend import backend
+from download import DownloadManager
+from storage import StorageManager
+
+
+class FakeContent:
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    async def iter_chunked(self, size):
+        for chunk in self.chunks:
+            yield chunk
+
+
+class FakeDownload:
+    """Resposta do aiohttp com o corpo em pedaços"""
+
+    def __init__(self, chunks, status=200, sized=True):
+        self.status = status
+        self.content = FakeContent(chunks)
+        self.content_length = sum(len(chunk) for chunk in chunks) if sized else None
+
+
+class FakeClient:
+    def __init__(self):
+        self.sent = []
+
+    async def send_file(self, chat_id, file, **kwargs):
+        data = open(file, 'rb').read() if isinstance(file, str) else file
+        self.sent.append((chat_id, data))
+        return object()
+
+
+def make_manager(tmp_path):
+    manager = DownloadManager(FakeClient(), backend)
+    manager.storage = StorageManager(str(tmp_path), quota=1024 ** 3, min_free=0)
+    return manager
+
+
+def test_staging_without_length_reports_progress_per_chunk(tmp_path):
+    manager = make_manager(tmp_path)
+    chunks = [b'a' * 10, b'b' * 20, b'c' * 5]
+    updates = []
+
+    asyncio.run(manager._stage_and_send(1, FakeDownload(chunks, sized=False), 'arquivo.mp4', 0, '',
+                                        lambda done, total: updates.append((done, total))))
+
+    assert updates == [(10, None), (30, None), (35, None)]
+    assert manager.client.sent == [(1, b''.join(chunks))]
+    assert manager.storage.lookup('arquivo.mp4')
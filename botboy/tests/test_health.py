@@ -0,0 +1,86 @@
+import health
+from config import BREAKER_FAILURES, BREAKER_COOLDOWN, BREAKER_MAX_COOLDOWN
+from health import CircuitBreaker, ServerHealth, CLOSED, OPEN, HALF_OPEN
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_breaker(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(health.time, 'monotonic', clock)
+    return CircuitBreaker(), clock
+
+
+def trip(breaker):
+    for _ in range(BREAKER_FAILURES):
+        breaker.failure()
+
+
+def test_opens_after_consecutive_failures(monkeypatch):
+    breaker, _ = make_breaker(monkeypatch)
+    for _ in range(BREAKER_FAILURES - 1):
+        breaker.failure()
+    assert breaker.allow()
+    breaker.failure()
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+    assert breaker.retry_in() == BREAKER_COOLDOWN
+
+
+def test_success_resets_the_failure_count(monkeypatch):
+    breaker, _ = make_breaker(monkeypatch)
+    for _ in range(BREAKER_FAILURES - 1):
+        breaker.failure()
+    breaker.success()
+    breaker.failure()
+    assert breaker.state == CLOSED
+
+
+def test_half_open_lets_a_single_probe_through(monkeypatch):
+    breaker, clock = make_breaker(monkeypatch)
+    trip(breaker)
+    clock.now += BREAKER_COOLDOWN
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow()
+    breaker.success()
+    assert breaker.state == CLOSED
+    assert breaker.allow() and breaker.allow()
+
+
+def test_failed_probe_doubles_the_cooldown_up_to_the_max(monkeypatch):
+    breaker, clock = make_breaker(monkeypatch)
+    trip(breaker)
+    cooldown = BREAKER_COOLDOWN
+    while cooldown < BREAKER_MAX_COOLDOWN:
+        clock.now += cooldown
+        assert breaker.allow()
+        breaker.failure()
+        cooldown = min(cooldown * 2, BREAKER_MAX_COOLDOWN)
+        assert breaker.state == OPEN
+        assert breaker.cooldown == cooldown
+    clock.now += cooldown
+    breaker.allow()
+    breaker.failure()
+    assert breaker.cooldown == BREAKER_MAX_COOLDOWN
+
+
+def test_server_health_tracks_servers_separately(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(health.time, 'monotonic', clock)
+    servers = ServerHealth()
+    for _ in range(BREAKER_FAILURES):
+        servers.failure('http://fora')
+    assert servers.is_down('http://fora')
+    assert not servers.is_down('http://ok')
+    assert servers.allow('http://ok')
+    assert list(servers.get_stats()) == ['http://fora']
+
+    clock.now += BREAKER_COOLDOWN
+    assert not servers.is_down('http://fora')
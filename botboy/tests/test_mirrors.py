@@ -0,0 +1,108 @@
+import pytest
+import backend as backend_module
+import mirrors as mirrors_module
+from backend import backend
+from conftest import FakeResponse, account, params
+from health import ServerHealth
+from mirrors import MirrorSelector, MirrorSet
+
+PRIMARY, BACKUP = 'http://painel', 'http://espelho'
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_active_host_changes_when_it_goes_down():
+    mirror_set = MirrorSet([PRIMARY, BACKUP], account('alice'))
+    mirror_set.report(PRIMARY, False)
+    assert mirror_set.active == BACKUP
+    mirror_set.report(PRIMARY, True, 0.1)
+    assert mirror_set.active == BACKUP
+    assert mirror_set.switches == 1
+
+
+def test_only_a_clearly_faster_host_takes_over():
+    mirror_set = MirrorSet([PRIMARY, BACKUP], account('alice'))
+    mirror_set.report(PRIMARY, True, 1.0)
+    mirror_set.report(BACKUP, True, 0.9)
+    assert mirror_set.active == PRIMARY
+    for _ in range(10):
+        mirror_set.report(BACKUP, True, 0.1)
+    assert mirror_set.active == BACKUP
+
+
+def test_account_mirrors_stay_in_their_own_account(monkeypatch):
+    monkeypatch.setattr(mirrors_module, 'PANEL_MIRRORS', {PRIMARY: [BACKUP]})
+    selector = MirrorSelector()
+    attacker = dict(account('mallory'), mirrors=['http://malicioso'])
+    victim = account('alice')
+
+    assert selector.candidates(attacker) == [PRIMARY, BACKUP, 'http://malicioso']
+    assert selector.candidates(victim) == [PRIMARY, BACKUP]
+    selector.report(attacker, PRIMARY, False)
+    assert selector.host(victim) == PRIMARY
+    assert set(selector.get_stats()) == {(PRIMARY, 'mallory'), (PRIMARY, 'alice')}
+
+
+def test_single_host_has_no_set():
+    selector = MirrorSelector()
+    assert selector.candidates(account('alice')) == [PRIMARY]
+    assert selector.stream_url(account('alice'), 'movie', 7, 'mp4') == f"{PRIMARY}/movie/alice/alice-pw/7.mp4"
+    assert not selector.sets
+
+
+def unavailable(host):
+    response = FakeResponse(None)
+    response.status_code = 503
+    return response
+
+
+def refused(host):
+    raise backend_module.requests.exceptions.ConnectionError(f"{host} recusou")
+
+
+@pytest.mark.parametrize('failure', [unavailable, refused])
+def test_backend_fails_over_to_the_next_mirror(monkeypatch, failure):
+    selector = MirrorSelector()
+    monkeypatch.setattr(backend_module, 'mirrors', selector)
+    monkeypatch.setattr(backend, 'health', ServerHealth())
+    tried = []
+
+    def request(url, request_params, host):
+        tried.append(host)
+        return failure(host) if host == PRIMARY else FakeResponse([{'stream_id': 1}])
+
+    monkeypatch.setattr(backend.policy, 'request', request)
+    config = dict(account('alice'), mirrors=[BACKUP])
+    response = backend._request(config, params(config, 'get_vod_streams'))
+
+    assert response.json() == [{'stream_id': 1}]
+    assert tried == [PRIMARY, BACKUP]
+    assert selector.host(config) == BACKUP
+    assert selector.candidates(config) == [BACKUP, PRIMARY]
+
+
+def test_idle_and_forgotten_sets_are_dropped(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(mirrors_module.time, 'monotonic', clock)
+    selector = MirrorSelector(idle_ttl=60)
+    alice = dict(account('alice'), mirrors=[BACKUP])
+    bob = dict(account('bob'), mirrors=[BACKUP])
+    selector.host(alice)
+    selector.host(bob)
+
+    clock.now += 40
+    selector.candidates(alice)
+    clock.now += 20
+    assert selector._active_sets() == [selector.sets[(PRIMARY, 'alice')]]
+    assert selector.evict_idle() == 1
+    assert list(selector.sets) == [(PRIMARY, 'alice')]
+
+    selector.forget(alice)
+    assert not selector.sets
+    assert selector.candidates(alice) == [PRIMARY, BACKUP]
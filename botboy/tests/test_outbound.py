@@ -0,0 +1,99 @@
+import asyncio
+import outbound
+from telethon.errors import FloodWaitError
+from outbound import OutboundQueue
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeClient:
+    """Cliente que recusa com FloodWait os envios listados em ``flood``"""
+
+    def __init__(self):
+        self.sent = []
+        self.flood = {}  # chat -> segundos pedidos na próxima tentativa
+
+    async def send_message(self, chat_id, text, **kwargs):
+        if chat_id in self.flood:
+            raise FloodWaitError(None, capture=self.flood.pop(chat_id))
+        self.sent.append((chat_id, text))
+        return text
+
+
+class FakeMessage:
+    def __init__(self, client, chat_id=1, message_id=10):
+        self.client = client
+        self.chat_id = chat_id
+        self.id = message_id
+
+    async def edit(self, text, **kwargs):
+        return await self.client.send_message(self.chat_id, text)
+
+
+async def settle(rounds=20):
+    for _ in range(rounds):
+        await asyncio.sleep(0)
+
+
+def make_queue(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(outbound.time, 'monotonic', clock)
+    queue = OutboundQueue(global_rate=100, chat_interval=0)
+    queue.bind(FakeClient())
+    return queue, clock
+
+
+def test_pending_edits_of_a_message_are_coalesced(monkeypatch):
+    queue, _ = make_queue(monkeypatch)
+    message = FakeMessage(queue.client)
+
+    async def scenario():
+        return await asyncio.gather(*(queue.edit(message, f'{percent}%') for percent in (10, 20, 30)))
+
+    results = asyncio.run(asyncio.wait_for(scenario(), 2))
+    assert queue.client.sent == [(1, '30%')]
+    assert results == ['30%'] * 3
+    assert queue.get_stats()['coalesced'] == 2
+
+
+def test_flood_wait_requeues_the_send_and_keeps_other_chats_moving(monkeypatch):
+    queue, clock = make_queue(monkeypatch)
+    queue.client.flood[1] = 30
+
+    async def scenario():
+        first = asyncio.create_task(queue.send_message(1, 'oi'))
+        await settle()
+        assert not first.done()
+        assert await asyncio.wait_for(queue.send_message(2, 'outro chat'), 1) == 'outro chat'
+
+        clock.now += 30
+        queue._wakeup.set()
+        return await asyncio.wait_for(first, 1)
+
+    assert asyncio.run(scenario()) == 'oi'
+    assert queue.client.sent == [(2, 'outro chat'), (1, 'oi')]
+    assert queue.get_stats()['flood_waits'] == 1
+
+
+def test_edit_requeued_after_flood_wait_takes_the_newer_text(monkeypatch):
+    queue, clock = make_queue(monkeypatch)
+    message = FakeMessage(queue.client)
+    queue.client.flood[1] = 5
+
+    async def scenario():
+        old = asyncio.create_task(queue.edit(message, '10%'))
+        await settle()
+        new = asyncio.create_task(queue.edit(message, '50%'))
+        await settle()
+        clock.now += 5
+        queue._wakeup.set()
+        return await asyncio.wait_for(asyncio.gather(old, new), 1)
+
+    assert asyncio.run(scenario()) == ['50%', '50%']
+    assert queue.client.sent == [(1, '50%')]
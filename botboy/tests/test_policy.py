@@ -0,0 +1,106 @@
+import threading
+from types import SimpleNamespace
+import pytest
+import requests
+import policy
+from policy import RequestPolicy
+
+SERVER = 'http://painel'
+URL = f'{SERVER}/player_api.php'
+
+
+class FakeHttp:
+    """Substitui ``requests.get``/``post``: cada chamada consome a próxima resposta"""
+
+    def __init__(self, monkeypatch, get=(), post=()):
+        self.answers = {'get': list(get), 'post': list(post)}
+        self.calls = []
+        self.lock = threading.Lock()
+        monkeypatch.setattr(policy.requests, 'get', lambda url, **kwargs: self._answer('get'))
+        monkeypatch.setattr(policy.requests, 'post', lambda url, **kwargs: self._answer('post'))
+
+    def _answer(self, method):
+        with self.lock:
+            self.calls.append(method)
+            answer = self.answers[method].pop(0)
+        if callable(answer):
+            answer = answer()
+        if isinstance(answer, Exception):
+            raise answer
+        return SimpleNamespace(status_code=answer)
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    waits = []
+    monkeypatch.setattr(policy.time, 'sleep', waits.append)
+    return waits
+
+
+def fill(request_policy, *samples, action='get_vod_streams'):
+    for seconds in samples:
+        request_policy._tracker(SERVER, action).add(seconds)
+
+
+def test_timeout_follows_the_p95_within_bounds():
+    request_policy = RequestPolicy()
+    assert request_policy.timeout_for(SERVER, 'get_vod_streams') == policy.REQUEST_TIMEOUT_MAX
+
+    fill(request_policy, *[2.0] * policy.LATENCY_MIN_SAMPLES)
+    assert request_policy.timeout_for(SERVER, 'get_vod_streams') == 2.0 * policy.REQUEST_TIMEOUT_FACTOR
+
+    fill(request_policy, *[0.01] * policy.LATENCY_WINDOW)
+    assert request_policy.timeout_for(SERVER, 'get_vod_streams') == policy.REQUEST_TIMEOUT_MIN
+    assert request_policy.timeout_for(SERVER, 'get_series') == policy.REQUEST_TIMEOUT_MAX
+
+
+def test_overloaded_panel_is_retried_with_backoff(monkeypatch, sleeps):
+    http = FakeHttp(monkeypatch, get=[503, 429, 200])
+    request_policy = RequestPolicy()
+
+    assert request_policy.request(URL, {'action': 'get_vod_streams'}, SERVER).status_code == 200
+    assert len(sleeps) == 2 and http.calls == ['get'] * 3
+    assert request_policy.stats['retries'] == 2
+
+
+def test_network_error_is_raised_after_the_last_retry(monkeypatch, sleeps):
+    FakeHttp(monkeypatch, get=[requests.exceptions.ConnectionError('recusado')] * (policy.REQUEST_RETRIES + 1))
+    with pytest.raises(requests.exceptions.ConnectionError):
+        RequestPolicy().request(URL, {'action': 'get_vod_streams'}, SERVER)
+    assert len(sleeps) == policy.REQUEST_RETRIES
+
+
+def test_client_errors_are_not_retried(monkeypatch, sleeps):
+    FakeHttp(monkeypatch, get=[404])
+    assert RequestPolicy().request(URL, {'action': 'get_vod_streams'}, SERVER).status_code == 404
+    assert not sleeps
+
+
+def test_get_refused_switches_the_server_to_post(monkeypatch, sleeps):
+    http = FakeHttp(monkeypatch, get=[405], post=[200, 200])
+    request_policy = RequestPolicy()
+
+    request_policy.request(URL, {'action': 'get_vod_streams'}, SERVER)
+    request_policy.request(URL, {'action': 'get_series'}, SERVER)
+
+    assert http.calls == ['get', 'post', 'post']
+    assert SERVER in request_policy.post_only
+
+
+def test_slow_read_is_hedged_and_the_copy_wins(monkeypatch, sleeps):
+    release = threading.Event()
+
+    def stuck():
+        release.wait(2)
+        return 200
+
+    http = FakeHttp(monkeypatch, get=[stuck, 200])
+    request_policy = RequestPolicy()
+    fill(request_policy, *[0.01] * policy.LATENCY_MIN_SAMPLES)
+
+    try:
+        assert request_policy.request(URL, {'action': 'get_vod_streams'}, SERVER).status_code == 200
+    finally:
+        release.set()
+    assert http.calls == ['get', 'get']
+    assert request_policy.stats['hedges'] == 1 and request_policy.stats['hedge_wins'] == 1
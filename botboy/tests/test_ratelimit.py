@@ -0,0 +1,55 @@
+import ratelimit
+from ratelimit import TokenBucketLimiter
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_limiter(monkeypatch, budgets=None):
+    clock = Clock()
+    monkeypatch.setattr(ratelimit.time, 'monotonic', clock)
+    limiter = TokenBucketLimiter(budgets or {'cheap': (3, 1.0), 'expensive': (1, 0.1)}, idle_ttl=60)
+    return limiter, clock
+
+
+def test_burst_is_limited_to_capacity(monkeypatch):
+    limiter, _ = make_limiter(monkeypatch)
+    assert [limiter.allow(1) for _ in range(4)] == [True, True, True, False]
+
+
+def test_bucket_refills_over_time(monkeypatch):
+    limiter, clock = make_limiter(monkeypatch)
+    for _ in range(3):
+        limiter.allow(1)
+    assert not limiter.allow(1)
+    clock.now += 1.0
+    assert limiter.allow(1)
+    assert not limiter.allow(1)
+
+
+def test_classes_and_users_have_separate_buckets(monkeypatch):
+    limiter, _ = make_limiter(monkeypatch)
+    assert limiter.allow(1, 'expensive')
+    assert not limiter.allow(1, 'expensive')
+    assert limiter.allow(1, 'cheap')
+    assert limiter.allow(2, 'expensive')
+
+
+def test_unknown_class_uses_cheap_budget(monkeypatch):
+    limiter, _ = make_limiter(monkeypatch)
+    assert [limiter.allow(1, 'other') for _ in range(4)] == [True, True, True, False]
+
+
+def test_idle_buckets_are_evicted(monkeypatch):
+    limiter, clock = make_limiter(monkeypatch)
+    limiter.allow(1)
+    clock.now += 30
+    limiter.allow(2)
+    clock.now += 40
+    assert limiter.evict_idle() == 1
+    assert limiter.active_users() == 1
@@ -0,0 +1,69 @@
+from backend import backend
+from conftest import account, params
+from render_cache import RenderCache
+
+MOVIES = [{'stream_id': 1, 'name': 'Filme'}]
+
+
+def render(cache, config, sources):
+    key = cache.key(config, 'filme_list', 'all', 0)
+    return cache.put(key, sources, 'texto', 'teclado')
+
+
+def test_page_is_shared_by_accounts_with_the_same_catalog(panel):
+    cache = RenderCache()
+    alice, bob = account('alice'), account('bob')
+    panel.bodies['get_vod_streams'] = MOVIES
+    for config in (alice, bob):
+        backend.make_api_request(config, params(config, 'get_vod_streams'))
+
+    render(cache, alice, [params(alice, 'get_vod_streams')])
+    key = cache.key(bob, 'filme_list', 'all', 0)
+    assert key == cache.key(alice, 'filme_list', 'all', 0)
+    assert cache.get(key, [params(bob, 'get_vod_streams')]) == ('texto', 'teclado')
+
+
+def test_account_without_the_responses_does_not_see_the_page(panel):
+    cache = RenderCache()
+    alice, bob = account('alice'), account('bob')
+    panel.bodies['get_vod_streams'] = MOVIES
+    backend.make_api_request(alice, params(alice, 'get_vod_streams'))
+    render(cache, alice, [params(alice, 'get_vod_streams')])
+
+    key = cache.key(bob, 'filme_list', 'all', 0)
+    assert cache.get(key, [params(bob, 'get_vod_streams')]) is None
+    assert cache.has(key, [params(alice, 'get_vod_streams')])
+
+
+def test_different_catalog_invalidates_the_page(panel):
+    cache = RenderCache()
+    alice, bob = account('alice'), account('bob')
+    panel.bodies['get_vod_streams'] = MOVIES
+    panel.bodies[('bob', 'get_vod_streams')] = MOVIES + [{'stream_id': 2, 'name': 'Outro'}]
+    for config in (alice, bob):
+        backend.make_api_request(config, params(config, 'get_vod_streams'))
+
+    render(cache, alice, [params(alice, 'get_vod_streams')])
+    key = cache.key(bob, 'filme_list', 'all', 0)
+    assert cache.get(key, [params(bob, 'get_vod_streams')]) is None
+    assert cache.get_stats()['stale'] == 1
+
+
+def test_expired_source_invalidates_the_page(panel):
+    cache = RenderCache()
+    alice = account('alice')
+    panel.bodies['get_vod_streams'] = MOVIES
+    backend.make_api_request(alice, params(alice, 'get_vod_streams'))
+    render(cache, alice, [params(alice, 'get_vod_streams')])
+
+    backend.cache_time = -1
+    key = cache.key(alice, 'filme_list', 'all', 0)
+    assert not cache.has(key, [params(alice, 'get_vod_streams')])
+    assert cache.get(key, [params(alice, 'get_vod_streams')]) is None
+
+
+def test_page_without_cached_sources_is_not_stored(panel):
+    cache = RenderCache()
+    alice = account('alice')
+    render(cache, alice, [params(alice, 'get_vod_streams')])
+    assert cache.get_stats()['pages'] == 0
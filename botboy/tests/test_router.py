@@ -0,0 +1,95 @@
+import pytest
+from router import CallbackRouter, CallbackContextStore, ExpiredCallbackError, MAX_CALLBACK_DATA, PACKED, TOKEN, EXTRA
+
+
+async def handler(ctx, **params):
+    return params
+
+
+def make_router(contexts=None):
+    router = CallbackRouter(contexts or CallbackContextStore(path=None))
+    router.add("canal_list_{category_id*}_{page:int}", handler)
+    router.add("canal_play_{stream_id}", handler)
+    router.add("serie_episodes_{series_id}_{page:int=0}", handler)
+    return router
+
+
+def test_packed_round_trip_keeps_types():
+    router = make_router()
+    data = router.pack("canal_list", category_id="12_a", page=3)
+    assert data[0] == PACKED and len(data) <= MAX_CALLBACK_DATA
+    route, params = router.decode(data)
+    assert route.prefix == "canal_list"
+    assert params == {'category_id': '12_a', 'page': 3}
+
+
+def test_default_parameter_is_packed():
+    router = make_router()
+    route, params = router.decode(router.pack("serie_episodes", series_id=7))
+    assert params == {'series_id': '7', 'page': 0}
+
+
+def test_extra_values_go_to_context_store():
+    router = make_router()
+    item = {'name': 'Canal', 'logo': 'http://x/logo.png'}
+    data = router.pack("canal_play", stream_id=5, item=item)
+    assert data[0] == EXTRA and len(data) <= MAX_CALLBACK_DATA
+    assert router.contexts.get(router.token_of(data)) == {'item': item}
+    route, params = router.decode(data)
+    assert params['stream_id'] == '5' and params['item'] == item
+
+
+def test_lost_extras_still_open_the_route():
+    router = make_router()
+    data = router.pack("canal_play", stream_id=5, item={'name': 'Canal'})
+    router.contexts.entries.clear()
+    route, params = router.decode(data)
+    assert route.prefix == "canal_play"
+    assert params == {'stream_id': '5'}
+
+
+def test_oversized_values_fall_back_to_token():
+    router = make_router()
+    data = router.pack("canal_list", category_id="x" * 100, page=1)
+    assert data[0] == TOKEN and len(data) <= MAX_CALLBACK_DATA
+    assert router.decode(data)[1]['category_id'] == "x" * 100
+
+
+def test_expired_context_raises():
+    router = make_router()
+    data = router.pack("canal_list", category_id="x" * 100, page=1)
+    router.contexts.entries.clear()
+    with pytest.raises(ExpiredCallbackError):
+        router.decode(data)
+
+
+def test_legacy_text_callbacks_still_match():
+    router = make_router()
+    route, params = router.decode(b"canal_list_12_a_3")
+    assert route.prefix == "canal_list"
+    assert params == {'category_id': '12_a', 'page': 3}
+    assert router.decode(b"unknown_1") == (None, None)
+
+
+def test_missing_parameter_is_an_error():
+    router = make_router()
+    with pytest.raises(KeyError):
+        router.pack("canal_list", category_id="1")
+
+
+def test_contexts_survive_a_restart(tmp_path):
+    path = str(tmp_path / 'contexts.json')
+    router = make_router(CallbackContextStore(path=path, save_delay=3600))
+    data = router.pack("canal_play", stream_id=5, item={'name': 'Canal'})
+    router.contexts._flush()
+
+    restarted = make_router(CallbackContextStore(path=path))
+    assert restarted.decode(data)[1] == {'stream_id': '5', 'item': {'name': 'Canal'}}
+
+
+def test_expired_contexts_are_not_reloaded(tmp_path):
+    path = str(tmp_path / 'contexts.json')
+    store = CallbackContextStore(path=path, ttl=-1, save_delay=3600)
+    store.put({'item': 1})
+    store._flush()
+    assert not CallbackContextStore(path=path).entries
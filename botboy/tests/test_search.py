@@ -0,0 +1,179 @@
+import asyncio
+from types import SimpleNamespace
+import busca
+import search
+from backend import backend
+from busca import BuscaManager
+from conftest import account, params
+from search import SearchEngine, SearchIndex, normalize
+
+MOVIES = [
+    {'stream_id': 1, 'name': 'Ação Total'},
+    {'stream_id': 2, 'name': 'O Poderoso Chefão'},
+    {'stream_id': 3, 'name': 'Chefs na Estrada'},
+    {'stream_id': 4, 'name': 'Matrix'},
+]
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def names(results):
+    return [doc['name'] for doc in results]
+
+
+def full_list(engine, config, items):
+    engine.on_catalog(config, {'action': 'get_vod_streams'}, items)
+
+
+def test_normalize_drops_accents_case_and_punctuation():
+    assert normalize('  Ação: TOTAL!! ') == 'acao total'
+
+
+def test_matches_without_accents_by_prefix_and_with_typos():
+    engine = SearchEngine()
+    config = account('alice')
+    full_list(engine, config, MOVIES)
+
+    assert names(engine.search(config, 'acao')[0]) == ['Ação Total']
+    assert names(engine.search(config, 'chef')[0])[0] == 'Chefs na Estrada'
+    assert 'Matrix' in names(engine.search(config, 'matrex')[0])
+    assert engine.search(config, 'zzz') == ([], 0)
+
+
+def test_category_lists_are_added_until_the_full_list_arrives():
+    engine = SearchEngine()
+    config = account('alice')
+    engine.on_catalog(config, {'action': 'get_vod_streams', 'category_id': '1'}, MOVIES[:2])
+    assert engine.missing_kinds(config) == ['live', 'movie', 'series']
+    assert engine.search(config, 'matrix') == ([], 0)
+
+    full_list(engine, config, MOVIES)
+    assert names(engine.search(config, 'matrix')[0]) == ['Matrix']
+    assert 'movie' not in engine.missing_kinds(config)
+
+    # Índice completo não recebe mais listas parciais
+    engine.on_catalog(config, {'action': 'get_vod_streams', 'category_id': '2'}, [{'stream_id': 9, 'name': 'Novo'}])
+    assert engine.search(config, 'novo') == ([], 0)
+
+
+def fetch(config, items, panel):
+    """Lista completa vinda do backend (guardada no CatalogStore)"""
+    panel.bodies['get_vod_streams'] = items
+    request = params(config, 'get_vod_streams')
+    return request, backend.make_api_request(config, request)
+
+
+def test_accounts_with_the_same_list_share_the_index(panel):
+    engine = SearchEngine()
+    for name in ('alice', 'bob'):
+        config = account(name)
+        request, items = fetch(config, MOVIES, panel)
+        engine.on_catalog(config, request, items)
+    engine.on_catalog(account('carol'), {'action': 'get_vod_streams'}, list(MOVIES))
+    assert engine.get_stats()['shared'] == 1
+    assert names(engine.search(account('bob'), 'matrix')[0]) == ['Matrix']
+
+
+def test_index_leaves_with_its_list(panel):
+    engine = SearchEngine()
+    alice, bob = account('alice'), account('bob')
+    for config in (alice, bob):
+        request, items = fetch(config, MOVIES, panel)
+        engine.on_catalog(config, request, items)
+
+    # bob recebeu outra versão do catálogo: o índice antigo dele sai
+    backend._drop(backend._cache_key(bob['server'], params(bob, 'get_vod_streams')))
+    fetch(bob, MOVIES[:1], panel)
+    engine.cleanup()
+    assert engine.missing_kinds(bob) == ['live', 'movie', 'series']
+    assert 'movie' not in engine.missing_kinds(alice)
+
+    backend.cache_time = -1
+    engine.cleanup()
+    assert not engine.indexes and not engine.sources
+
+
+def test_partial_indexes_expire_when_idle_and_count_is_capped(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(search.time, 'monotonic', clock)
+    engine = SearchEngine(max_indexes=2, idle_ttl=60)
+    for name in ('alice', 'bob', 'carol'):
+        engine.on_catalog(account(name), {'action': 'get_vod_streams', 'category_id': '1'}, MOVIES)
+    assert [key[1] for key in engine.indexes] == ['bob', 'carol']
+
+    clock.now += 30
+    engine.search(account('bob'), 'matrix')
+    clock.now += 30
+    engine.cleanup()
+    assert [key[1] for key in engine.indexes] == ['bob']
+
+
+def test_load_catalog_indexes_lists_already_in_cache(panel, monkeypatch):
+    monkeypatch.setattr(busca, 'search_engine', SearchEngine())
+    config = account('alice')
+    panel.bodies['get_vod_categories'] = [{'category_id': '5', 'category_name': 'Ação'}]
+    fetch(config, [dict(movie, category_id='5') for movie in MOVIES], panel)
+    backend.make_api_request(config, params(config, 'get_vod_categories'))
+    calls = len(panel.calls)
+
+    # A lista já está no cache (o ouvinte não vai disparar de novo)
+    BuscaManager(None, backend, None, None, None, None).load_catalog(config, ['movie'])
+    assert len(panel.calls) == calls
+    results, _ = busca.search_engine.search(config, 'matrix')
+    assert busca.search_engine.item(config, results[0])['category'] == 'Ação'
+
+
+def test_failed_build_does_not_stay_marked_as_building(monkeypatch):
+    engine = SearchEngine()
+    config = account('alice')
+
+    def broken(self, items):
+        raise ValueError('lista inválida')
+
+    monkeypatch.setattr(SearchIndex, 'add', broken)
+    full_list(engine, config, MOVIES)
+    assert not engine.building
+    assert 'movie' in engine.missing_kinds(config)
+
+
+def test_large_lists_are_indexed_off_the_loop(monkeypatch):
+    monkeypatch.setattr(search, 'SEARCH_BACKGROUND_MIN', 2)
+    engine = SearchEngine()
+    config = account('alice')
+
+    async def scenario():
+        full_list(engine, config, MOVIES)
+        assert 'movie' not in engine.missing_kinds(config)
+        assert not engine.is_ready(config)
+        while engine.building:
+            await asyncio.sleep(0.01)
+
+    asyncio.run(asyncio.wait_for(scenario(), 2))
+    assert names(engine.search(config, 'matrix')[0]) == ['Matrix']
+
+
+def test_deep_link_without_context_is_rebuilt_from_the_index(panel, monkeypatch):
+    monkeypatch.setattr(busca, 'search_engine', SearchEngine())
+    sent = []
+
+    async def send_message(chat_id, text, **kwargs):
+        sent.append(text)
+
+    monkeypatch.setattr(busca.outbound, 'send_message', send_message)
+    panel.bodies['get_vod_streams'] = MOVIES
+    manager = BuscaManager(None, backend, None, None, None, None)
+    event = SimpleNamespace(chat_id=7)
+    backend.user_selections.pop(7, None)
+
+    asyncio.run(manager.handle_start_payload(event, f"add-{'x' * 12}-movie-4", account('alice')))
+    assert [item['name'] for item in backend.get_user_selections(7)['movies']] == ['Matrix']
+
+    asyncio.run(manager.handle_start_payload(event, f"add-{'x' * 12}", account('alice')))
+    assert 'expirou' in sent[-1]
+    backend.user_selections.pop(7, None)
@@ -0,0 +1,84 @@
+import os
+import pytest
+import storage
+from storage import StorageManager, StorageFullError, FileBusyError, COMPLETE_SUFFIX
+
+
+def make_storage(tmp_path, quota=100):
+    return StorageManager(str(tmp_path), quota=quota, min_free=0)
+
+
+def store(manager, name, data):
+    reservation = manager.reserve(name, len(data))
+    with open(reservation.path, 'wb') as f:
+        reservation.write(f, data)
+    reservation.complete()
+    return reservation
+
+
+def test_least_recently_used_files_make_room(tmp_path):
+    manager = make_storage(tmp_path)
+    store(manager, 'a.mp4', bytes(40))
+    store(manager, 'b.mp4', bytes(40))
+    assert manager.lookup('a.mp4')
+
+    store(manager, 'c.mp4', bytes(40))
+    assert manager.lookup('b.mp4') is None
+    assert manager.lookup('a.mp4') and manager.lookup('c.mp4')
+    assert not os.path.exists(tmp_path / 'b.mp4') and not os.path.exists(tmp_path / ('b.mp4' + COMPLETE_SUFFIX))
+
+
+def test_files_being_written_are_never_evicted(tmp_path):
+    manager = make_storage(tmp_path)
+    manager.reserve('a.mp4', 60)
+    with pytest.raises(StorageFullError):
+        manager.reserve('b.mp4', 60)
+    with pytest.raises(StorageFullError):
+        manager.reserve('c.mp4', 101)
+
+
+def test_busy_name_is_refused_until_the_first_download_ends(tmp_path):
+    manager = make_storage(tmp_path)
+    reservation = manager.reserve('a.mp4', 10)
+    with pytest.raises(FileBusyError):
+        manager.reserve('a.mp4', 10)
+    assert manager.lookup('a.mp4') is None
+
+    reservation.discard()
+    manager.reserve('a.mp4', 10)
+
+
+def test_reservation_without_size_grows_in_steps(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, 'DOWNLOAD_RESERVE_STEP', 16)
+    manager = make_storage(tmp_path)
+    reservation = manager.reserve('a.mp4')
+    with open(reservation.path, 'wb') as f:
+        for _ in range(5):
+            reservation.write(f, bytes(10))
+    assert reservation.reserved == 64
+    reservation.complete()
+    assert manager.used_bytes() == 50
+
+
+def test_restart_adopts_only_marked_files(tmp_path):
+    store(make_storage(tmp_path), 'pronto.mp4', bytes(30))
+    (tmp_path / 'cortado.mp4').write_bytes(bytes(20))
+    (tmp_path / 'mentira.mp4').write_bytes(bytes(20))
+    (tmp_path / ('mentira.mp4' + COMPLETE_SUFFIX)).write_text('99')
+    (tmp_path / ('sumiu.mp4' + COMPLETE_SUFFIX)).write_text('5')
+
+    manager = make_storage(tmp_path)
+    assert list(manager.files) == ['pronto.mp4']
+    assert manager.lookup('pronto.mp4')
+    assert sorted(os.listdir(tmp_path)) == ['pronto.mp4', 'pronto.mp4' + COMPLETE_SUFFIX]
+
+
+def test_cleanup_drops_files_unused_for_too_long(tmp_path, monkeypatch):
+    manager = make_storage(tmp_path)
+    store(manager, 'a.mp4', bytes(10))
+    now = storage.time.time()
+    monkeypatch.setattr(storage.time, 'time', lambda: now + 3600)
+    store(manager, 'b.mp4', bytes(10))
+
+    assert manager.cleanup(max_age=60) == 1
+    assert list(manager.files) == ['b.mp4']
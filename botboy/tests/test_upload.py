@@ -0,0 +1,150 @@
+import asyncio
+import io
+import pytest
+from types import SimpleNamespace
+import upload
+from telethon.errors import FloodWaitError
+from upload import ParallelUploader, ParallelUploadError, StreamPipe, pump_response
+
+
+class FakeTelegram:
+    """Cliente que guarda as partes recebidas e recusa as de ``broken``"""
+
+    def __init__(self, broken=None):
+        self.parts = {}
+        self.calls = []
+        self.broken = dict(broken or {})  # índice -> vezes que ainda falha
+        self.flood = set()  # índices que recebem um FloodWait na primeira vez
+
+    async def __call__(self, request):
+        self.calls.append(request.file_part)
+        if request.file_part in self.flood:
+            self.flood.discard(request.file_part)
+            raise FloodWaitError(request, capture=7)
+        if self.broken.get(request.file_part, 0) > 0:
+            self.broken[request.file_part] -= 1
+            raise ConnectionError('conexão caiu')
+        self.parts[request.file_part] = request.bytes
+        return True
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    sleep = asyncio.sleep
+    waits = []
+
+    async def instant(seconds):
+        waits.append(seconds)
+        await sleep(0)
+
+    monkeypatch.setattr(upload.asyncio, 'sleep', instant)
+    return waits
+
+
+def test_pipe_reads_fixed_sizes_across_chunks_until_eof():
+    async def scenario():
+        pipe = StreamPipe('video.mp4', 7, max_chunks=4)
+        for chunk in (b'ab', b'cde', b'fg'):
+            await pipe.feed(chunk)
+        await pipe.close()
+        return [await pipe.read(3), await pipe.read(3), await pipe.read(3), await pipe.read(3)]
+
+    assert asyncio.run(scenario()) == [b'abc', b'def', b'g', b'']
+
+
+def test_pipe_blocks_the_download_while_the_buffer_is_full():
+    async def scenario():
+        pipe = StreamPipe('video.mp4', 3, max_chunks=1)
+        await pipe.feed(b'a')
+        feeding = asyncio.create_task(pipe.feed(b'b'))
+        await asyncio.sleep(0)
+        blocked = not feeding.done()
+        await pipe.read(1)
+        await asyncio.wait_for(feeding, 1)
+        return blocked
+
+    assert asyncio.run(scenario())
+
+
+class BrokenContent:
+    async def iter_chunked(self, size):
+        yield b'abc'
+        raise ConnectionResetError('painel caiu')
+
+
+def test_download_error_reaches_the_reader():
+    async def scenario():
+        pipe = StreamPipe('video.mp4', 10, max_chunks=4)
+        await pump_response(SimpleNamespace(content=BrokenContent()), pipe, 1024)
+        await pipe.read(10)
+
+    with pytest.raises(ConnectionResetError):
+        asyncio.run(scenario())
+
+
+def run_upload(client, data, stream=None, progress=None, **kwargs):
+    uploader = ParallelUploader(client, workers=3, part_size=4, **kwargs)
+    stream = stream or io.BytesIO(data)
+    return asyncio.run(uploader.upload(stream, len(data), 'video.mp4', progress))
+
+
+def test_only_big_files_take_the_parallel_path():
+    assert ParallelUploader(None, workers=4).should_use(upload.BIG_FILE_THRESHOLD + 1)
+    assert not ParallelUploader(None, workers=4).should_use(upload.BIG_FILE_THRESHOLD)
+    assert not ParallelUploader(None, workers=1).should_use(upload.BIG_FILE_THRESHOLD + 1)
+
+
+def test_all_parts_arrive_and_progress_reaches_the_file_size():
+    data = bytes(range(18))
+    client = FakeTelegram()
+    updates = []
+
+    handle = run_upload(client, data, progress=lambda sent, total: updates.append((sent, total)))
+
+    assert (handle.parts, handle.name) == (5, 'video.mp4')
+    assert b''.join(client.parts[index] for index in range(5)) == data
+    assert sorted(updates) == updates and updates[-1] == (18, 18)
+
+
+def test_flood_wait_is_respected_without_spending_a_retry(no_backoff):
+    client = FakeTelegram()
+    client.flood = {1}
+
+    run_upload(client, bytes(18))
+
+    assert 7 in no_backoff
+    assert sorted(client.parts) == [0, 1, 2, 3, 4]
+
+
+def test_download_errors_are_not_reported_as_upload_failures():
+    async def scenario():
+        pipe = StreamPipe('video.mp4', 18, max_chunks=4)
+        await pipe.feed(bytes(6))
+        await pipe.close(ConnectionResetError('painel caiu'))
+        uploader = ParallelUploader(FakeTelegram(), workers=3, part_size=4)
+        await uploader.upload(pipe, 18, 'video.mp4')
+
+    with pytest.raises(ConnectionResetError):
+        asyncio.run(scenario())
+
+
+def test_short_stream_is_an_upload_failure():
+    with pytest.raises(ParallelUploadError):
+        run_upload(FakeTelegram(), bytes(18), stream=io.BytesIO(bytes(9)))
+
+
+def test_failed_part_is_resent_at_the_end_without_reading_the_stream_again():
+    data = bytes(range(18))
+    client = FakeTelegram(broken={2: upload.UPLOAD_PART_RETRIES})
+
+    handle = run_upload(client, data)
+
+    assert handle.parts == 5
+    assert b''.join(client.parts[index] for index in range(5)) == data
+    assert client.calls[-1] == 2
+
+
+def test_too_many_failed_parts_give_up():
+    client = FakeTelegram(broken={index: 99 for index in range(5)})
+    with pytest.raises(ParallelUploadError):
+        run_upload(client, bytes(18), max_failed=1)
@@ -0,0 +1,65 @@
+import asyncio
+from types import SimpleNamespace
+import warmup
+from backend import backend
+from conftest import account, params
+from outbound import OutboundQueue
+from warmup import CatalogWarmup
+
+MOVIES = [
+    {'stream_id': 1, 'name': 'Matrix', 'category_id': '5'},
+    {'stream_id': 2, 'name': 'Alien', 'category_id': '5'},
+    {'stream_id': 3, 'name': 'Up', 'category_id': '8'},
+]
+
+
+def status_message():
+    edits = []
+
+    async def edit(text, **kwargs):
+        edits.append(text)
+
+    return SimpleNamespace(chat_id=1, id=10, edit=edit), edits
+
+
+def warm(config, message=None):
+    async def scenario():
+        manager = CatalogWarmup()
+        task = manager.start(config, message)
+        assert manager.start(config, message) is task
+        await asyncio.wait_for(task, 2)
+        return manager
+
+    return asyncio.run(scenario())
+
+
+def test_categories_are_served_from_the_full_list(panel):
+    config = account('alice')
+    panel.bodies['get_vod_streams'] = MOVIES
+    panel.bodies['get_vod_categories'] = [{'category_id': '5', 'category_name': 'Ação'}]
+
+    manager = warm(config)
+    calls = len(panel.calls)
+
+    data = backend.make_api_request(config, params(config, 'get_vod_streams', category_id='5'))
+    assert [movie['name'] for movie in data] == ['Matrix', 'Alien']
+    assert len(panel.calls) == calls
+    assert not manager.tasks
+
+
+def test_status_message_shows_each_kind(panel, monkeypatch):
+    monkeypatch.setattr(warmup, 'outbound', OutboundQueue(chat_interval=0))
+    config = account('alice')
+    panel.bodies['get_vod_streams'] = MOVIES
+    panel.bodies['get_vod_categories'] = [{'category_id': '5', 'category_name': 'Ação'}]
+    panel.bodies['get_live_streams'] = []
+    message, edits = status_message()
+
+    warm(config, message)
+
+    assert 'carregando' in edits[0]
+    final = edits[-1]
+    assert 'Catálogo pronto' in final
+    assert '🎬 Filmes: ✅ 3 itens em 1 categorias' in final
+    assert '📺 Canais: ✅ 0 itens em 0 categorias' in final
+    assert '🎞️ Séries: ⚠️ indisponível' in final
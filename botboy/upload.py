@@ -0,0 +1,175 @@
+import asyncio
+import os
+from typing import Optional
+from telethon.errors import FloodWaitError
+from telethon.tl.functions.upload import SaveBigFilePartRequest
+from telethon.tl.types import InputFileBig
+from config import STREAM_BUFFER_CHUNKS, UPLOAD_WORKERS, UPLOAD_PART_SIZE, UPLOAD_PART_RETRIES, UPLOAD_MAX_FAILED_PARTS
+
+# Abaixo disso o Telegram exige o upload "pequeno" (SaveFilePart + MD5)
+BIG_FILE_THRESHOLD = 10 * 1024 * 1024
+
+
+_EOF = object()
+
+
+class StreamPipe:
+    """Buffer limitado entre o download HTTP e o upload do Telegram.
+
+    Expõe um ``read`` assíncrono, aceito pelo upload em partes do Telethon
+    quando o ``file_size`` é informado. A fila limitada faz o download
+    esperar sempre que o upload fica para trás (backpressure)."""
+
+    def __init__(self, name: str, file_size: int, max_chunks: int = STREAM_BUFFER_CHUNKS):
+        self.name = name
+        self.file_size = file_size
+        self.bytes_read = 0
+        self._queue = asyncio.Queue(maxsize=max_chunks)
+        self._buffer = bytearray()
+        self._eof = False
+
+    async def feed(self, chunk: bytes):
+        """Entrega um pedaço baixado (bloqueia se o buffer estiver cheio)"""
+        await self._queue.put(chunk)
+
+    async def close(self, error: Optional[BaseException] = None):
+        """Sinaliza fim do download, opcionalmente com o erro que o interrompeu"""
+        await self._queue.put(error if error is not None else _EOF)
+
+    async def read(self, size: int = -1) -> bytes:
+        """Lê até ``size`` bytes, aguardando o download quando necessário"""
+        while not self._eof and (size < 0 or len(self._buffer) < size):
+            item = await self._queue.get()
+            if item is _EOF:
+                self._eof = True
+            elif isinstance(item, BaseException):
+                self._eof = True
+                raise item
+            else:
+                self._buffer.extend(item)
+
+        if size < 0 or size > len(self._buffer):
+            size = len(self._buffer)
+
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        self.bytes_read += len(data)
+        return data
+
+
+async def pump_response(response, pipe: StreamPipe, chunk_size: int):
+    """Copia o corpo de uma resposta aiohttp para o pipe"""
+    try:
+        async for chunk in response.content.iter_chunked(chunk_size):
+            if chunk:
+                await pipe.feed(chunk)
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        await pipe.close(e)
+        return
+    await pipe.close()
+
+
+class ParallelUploadError(Exception):
+    """Falha no upload paralelo; o chamador pode repetir pelo caminho normal"""
+
+
+class ParallelUploader:
+    """Upload de arquivos grandes com várias partes em voo ao mesmo tempo.
+
+    Um leitor consome o stream em ordem e distribui as partes para
+    ``workers`` tarefas, que enviam ``SaveBigFilePartRequest`` em paralelo
+    (o MTProto multiplexa as requisições na conexão do cliente). Arquivos
+    pequenos ou ``UPLOAD_WORKERS <= 1`` devem usar o ``send_file`` normal.
+    Uma parte que esgota as tentativas fica guardada (até ``max_failed``)
+    e é reenviada no fim, em vez de perder o stream inteiro."""
+
+    def __init__(self, client, workers: int = UPLOAD_WORKERS, part_size: int = UPLOAD_PART_SIZE,
+                 max_failed: int = UPLOAD_MAX_FAILED_PARTS):
+        self.client = client
+        self.workers = workers
+        self.part_size = part_size
+        self.max_failed = max_failed
+
+    def should_use(self, file_size: int) -> bool:
+        """Indica se vale a pena usar o caminho paralelo para este tamanho"""
+        return self.workers > 1 and file_size > BIG_FILE_THRESHOLD
+
+    async def upload(self, stream, file_size: int, file_name: str, progress_callback=None) -> InputFileBig:
+        """Envia o conteúdo de ``stream`` e retorna o handle para ``send_file``"""
+        file_id = int.from_bytes(os.urandom(8), 'little', signed=True)
+        part_count = (file_size + self.part_size - 1) // self.part_size
+        parts = asyncio.Queue(maxsize=self.workers * 2)
+        state = {'sent': 0}
+        failed = {}  # índice -> dados das partes que esgotaram as tentativas
+
+        async def report(size):
+            state['sent'] += size
+            if progress_callback:
+                result = progress_callback(state['sent'], file_size)
+                if asyncio.iscoroutine(result):
+                    await result
+
+        async def reader():
+            for index in range(part_count):
+                data = stream.read(self.part_size)
+                if asyncio.iscoroutine(data):
+                    data = await data
+                if len(data) != self.part_size and index < part_count - 1:
+                    raise ParallelUploadError(f"Parte {index} incompleta ({len(data)} bytes)")
+                await parts.put((index, data))
+            for _ in range(self.workers):
+                await parts.put(None)
+
+        async def worker():
+            while True:
+                item = await parts.get()
+                if item is None:
+                    return
+                index, data = item
+                try:
+                    await self._send_part(file_id, index, part_count, data)
+                except ParallelUploadError:
+                    if len(failed) >= self.max_failed:
+                        raise
+                    failed[index] = data
+                    continue
+                await report(len(data))
+
+        read_task = asyncio.create_task(reader())
+        tasks = [read_task] + [asyncio.create_task(worker()) for _ in range(self.workers)]
+        try:
+            await asyncio.gather(*tasks)
+            # Nova rodada só para as partes que falharam (o resto já está no Telegram)
+            for index in sorted(failed):
+                data = failed.pop(index)
+                await self._send_part(file_id, index, part_count, data)
+                await report(len(data))
+        except ParallelUploadError:
+            raise
+        except Exception as e:
+            # Erros do download (lidos do stream) não são falhas de upload
+            if read_task.done() and not read_task.cancelled() and read_task.exception() is e:
+                raise
+            raise ParallelUploadError(str(e)) from e
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        return InputFileBig(file_id, part_count, file_name)
+
+    async def _send_part(self, file_id, index, part_count, data):
+        """Envia uma parte, respeitando FloodWait e repetindo falhas pontuais"""
+        for attempt in range(UPLOAD_PART_RETRIES):
+            try:
+                if await self.client(SaveBigFilePartRequest(file_id, index, part_count, data)):
+                    return
+            except FloodWaitError as e:
+                await asyncio.sleep(e.seconds)
+                continue
+            except Exception as e:
+                if attempt == UPLOAD_PART_RETRIES - 1:
+                    raise ParallelUploadError(f"Parte {index}: {e}") from e
+            await asyncio.sleep(2 ** attempt)
+        raise ParallelUploadError(f"Parte {index} recusada pelo servidor")
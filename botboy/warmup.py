@@ -0,0 +1,132 @@
+import asyncio
+import functools
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+from admission import BULK
+from backend import backend
+from catalogo import catalog_index
+from outbound import outbound
+from search import LIST_ACTIONS, CATEGORY_ACTIONS
+
+KIND_LABELS = (('live', '📺 Canais'), ('movie', '🎬 Filmes'), ('series', '🎞️ Séries'))
+LIST_ACTION = {kind: action for action, kind in LIST_ACTIONS.items()}
+CATEGORY_ACTION = {kind: action for action, kind in CATEGORY_ACTIONS.items()}
+
+
+class CatalogWarmup:
+    """Carga do catálogo logo após o cadastro da playlist.
+
+    Busca em paralelo as três listas de categorias e as três listas
+    completas; o índice de busca é montado pelo ouvinte do backend. Cada
+    lista completa também é dividida por categoria e guardada no cache com
+    os params que a navegação usa, então abrir uma categoria não vai ao
+    painel. A mensagem de status mostra o andamento de cada tipo."""
+
+    def __init__(self):
+        self.tasks: Dict[tuple, asyncio.Task] = {}
+
+    @staticmethod
+    def account(config: Dict) -> tuple:
+        return (config['server'], config['username'])
+
+    @staticmethod
+    def _params(config: Dict, action: str, category_id=None) -> Dict:
+        params = {
+            'username': config['username'],
+            'password': config['password'],
+            'action': action
+        }
+        if category_id:
+            params['category_id'] = category_id
+        return params
+
+    def start(self, config: Dict, message=None) -> asyncio.Task:
+        """Inicia o aquecimento da conta (reaproveita um que já esteja rodando)"""
+        key = self.account(config)
+        task = self.tasks.get(key)
+        if task is None or task.done():
+            task = self.tasks[key] = asyncio.create_task(self._run(key, config, message))
+        return task
+
+    async def wait(self, config: Dict):
+        """Espera o aquecimento em andamento da conta, se houver"""
+        task = self.tasks.get(self.account(config))
+        if task is not None and not task.done():
+            await asyncio.shield(task)
+
+    async def _run(self, key: tuple, config: Dict, message):
+        started = time.monotonic()
+        progress: Dict[str, Optional[tuple]] = {}
+        try:
+            await self._report(message, progress)
+            await asyncio.gather(*(self._load(config, kind, progress, message) for kind, _ in KIND_LABELS))
+            await self._report(message, progress, time.monotonic() - started)
+        except Exception as e:
+            print(f"Warmup error: {e}")
+        finally:
+            if self.tasks.get(key) is asyncio.current_task():
+                del self.tasks[key]
+
+    async def _load(self, config: Dict, kind: str, progress: Dict, message):
+        loop = asyncio.get_running_loop()
+        categories, items = await asyncio.gather(
+            loop.run_in_executor(None, functools.partial(
+                backend.make_api_request, config, self._params(config, CATEGORY_ACTION[kind]), priority=BULK)),
+            loop.run_in_executor(None, functools.partial(
+                backend.make_api_request, config, self._params(config, LIST_ACTION[kind]), priority=BULK))
+        )
+
+        if not isinstance(items, list):
+            progress[kind] = None
+        else:
+            categories = categories if isinstance(categories, list) else []
+            catalog_index(categories, ('category_id',))
+            parent = backend.digest_of(config['server'], self._params(config, LIST_ACTION[kind]))
+            await loop.run_in_executor(None, self._seed_partitions, config, kind, items, parent)
+            progress[kind] = (len(items), len(categories))
+        await self._report(message, progress)
+
+    def _seed_partitions(self, config: Dict, kind: str, items: List[Dict], parent: Optional[str] = None):
+        """Guarda a lista de cada categoria a partir da lista completa.
+
+        Com o resumo da lista completa, cada partição ganha um resumo
+        derivado e contas com o mesmo catálogo dividem as mesmas listas."""
+        partitions = defaultdict(list)
+        for item in items:
+            if isinstance(item, dict) and item.get('category_id') is not None:
+                partitions[str(item['category_id'])].append(item)
+        for category_id, category_items in partitions.items():
+            params = self._params(config, LIST_ACTION[kind], category_id)
+            if backend.cached_at(config['server'], params) is None:
+                digest = backend.store.derive(parent, category_id) if parent else None
+                backend.seed_cache(config['server'], params, category_items, digest)
+
+    @staticmethod
+    def _report_text(progress: Dict, elapsed: Optional[float] = None) -> str:
+        lines = []
+        for kind, label in KIND_LABELS:
+            if kind not in progress:
+                lines.append(f"{label}: ⏳ carregando...")
+            elif progress[kind] is None:
+                lines.append(f"{label}: ⚠️ indisponível no servidor")
+            else:
+                items, categories = progress[kind]
+                lines.append(f"{label}: ✅ {items} itens em {categories} categorias")
+
+        if elapsed is None:
+            header = "✅ **Playlist configurada!**\n\n⏳ Preparando o catálogo... você já pode usar o menu abaixo."
+        else:
+            header = f"✅ **Catálogo pronto em {elapsed:.1f}s!**\n\n⚡ Navegação e /buscar sem espera."
+        return header + "\n\n" + "\n".join(lines)
+
+    async def _report(self, message, progress: Dict, elapsed: Optional[float] = None):
+        if message is None:
+            return
+        try:
+            await outbound.edit(message, self._report_text(progress, elapsed), parse_mode='md')
+        except Exception as e:
+            print(f"Warmup report error: {e}")
+
+
+warmup = CatalogWarmup()